@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import os
+from contextlib import asynccontextmanager
+
+# Admission control settings
+ADMISSION_MAX_CONCURRENT = int(os.getenv("ADMISSION_MAX_CONCURRENT", "16"))  # Requests processed at once
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "64"))  # Requests waiting for a slot
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "20"))  # Longest wait for a slot
+ADMISSION_MAX_PER_SESSION = int(os.getenv("ADMISSION_MAX_PER_SESSION", "3"))  # In flight or waiting per session
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))  # Seconds suggested to rejected clients
+
+# Priority classes; lower values are admitted first
+PRIORITY_HIGH = 0  # Commands and cheap lookups
+PRIORITY_NORMAL = 1  # General chat
+PRIORITY_LOW = 2  # Analyses and recommendations
+PRIORITY_NAMES = {PRIORITY_HIGH: "high", PRIORITY_NORMAL: "normal", PRIORITY_LOW: "low"}
+
+BUSY_MESSAGE = "⏳ **Busy**: The assistant is handling a lot of requests right now. Please try again in a few seconds."
+
+class AdmissionRejected(Exception):
+    """A request was shed instead of admitted."""
+
+    def __init__(self, reason: str, retry_after: int = ADMISSION_RETRY_AFTER):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """Global concurrency limit with a bounded priority queue and per-session serialization.
+
+    An interactive request first takes its session's lock, so turns of one
+    conversation run one at a time and memory writes stay in order, then
+    waits for a global slot. Background jobs run without the session lock,
+    so a long job never blocks chat on its session, and take it through
+    session_turn only to commit their memory writes. Waiters are admitted by
+    priority, then arrival. When the
+    queue is full a newcomer displaces the lowest-priority waiter if it
+    outranks it, and is rejected otherwise; waiting longer than the queue
+    timeout is also a rejection. Rejections are immediate, so clients can
+    back off instead of timing out.
+    """
+
+    def __init__(self, max_concurrent: int = ADMISSION_MAX_CONCURRENT, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, max_per_session: int = ADMISSION_MAX_PER_SESSION):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_per_session = max_per_session
+        self._active = 0
+        self._waiters = []  # heap of (priority, seq, future)
+        self._seq = itertools.count()
+        self._sessions = {}  # session_id -> [lock, requests in flight or waiting]
+        self.admitted = {name: 0 for name in PRIORITY_NAMES.values()}
+        self.rejected = {"queue_full": 0, "queue_timeout": 0, "displaced": 0, "session_busy": 0}
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason)
+
+    def _remove_waiter(self, entry: tuple):
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    async def _acquire_slot(self, priority: int, timeout: float):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            worst = max(self._waiters, default=None)
+            if worst is None or worst[0] <= priority:
+                raise self._reject("queue_full")
+            self._remove_waiter(worst)
+            worst[2].set_exception(self._reject("displaced"))
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=timeout)
+        except asyncio.TimeoutError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                return  # The slot was handed over just as the wait expired
+            self._remove_waiter(entry)
+            future.cancel()
+            raise self._reject("queue_timeout")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self._release_slot()
+            else:
+                self._remove_waiter(entry)
+                future.cancel()
+            raise
+
+    def _release_slot(self):
+        """Hand the slot to the best waiter, or free it."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def admit(self, session_id: str, priority: int = PRIORITY_NORMAL, timeout: float = None,
+                    serialize: bool = True):
+        """Hold a global slot, and the session's turn if serialize, for the duration of the block.
+
+        timeout bounds the wait and defaults to the queue timeout; background
+        callers may pass a longer one. Raises AdmissionRejected if the
+        request is shed.
+        """
+        timeout = self.queue_timeout if timeout is None else timeout
+        if not serialize:
+            await self._acquire_slot(priority, timeout)
+            self.admitted[PRIORITY_NAMES[priority]] += 1
+            try:
+                yield
+            finally:
+                self._release_slot()
+            return
+
+        session = self._sessions.setdefault(session_id, [asyncio.Lock(), 0])
+        if session[1] >= self.max_per_session:
+            raise self._reject("session_busy")
+        session[1] += 1
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        try:
+            try:
+                await asyncio.wait_for(session[0].acquire(), timeout=timeout)
+            except asyncio.TimeoutError:
+                raise self._reject("queue_timeout")
+            try:
+                await self._acquire_slot(priority, max(timeout - (loop.time() - started), 0))
+                self.admitted[PRIORITY_NAMES[priority]] += 1
+                try:
+                    yield
+                finally:
+                    self._release_slot()
+            finally:
+                session[0].release()
+        finally:
+            session[1] -= 1
+            if session[1] == 0:
+                self._sessions.pop(session_id, None)
+
+    @asynccontextmanager
+    async def session_turn(self, session_id: str):
+        """Hold the session's turn without a global slot, waiting as long as it takes."""
+        session = self._sessions.setdefault(session_id, [asyncio.Lock(), 0])
+        session[1] += 1
+        try:
+            async with session[0]:
+                yield
+        finally:
+            session[1] -= 1
+            if session[1] == 0:
+                self._sessions.pop(session_id, None)
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queued": len(self._waiters),
+            "max_queue": self.max_queue,
+            "sessions_in_flight": len(self._sessions),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,189 @@
+import json
+import os
+import aiohttp
+from dotenv import load_dotenv
+from http_pool import PooledHTTPSession
+from request_builder import STREAM_OPTIONS
+from resilience import CircuitBreaker, CircuitOpen, parse_retry_after
+
+# Load environment variables
+load_dotenv()
+
+# ASI1 API settings
+ASI1_API_KEY = os.getenv("ASI1_API_KEY")
+ASI1_BASE_URL = "https://api.asi1.ai/v1"
+
+if not ASI1_API_KEY:
+    print("⚠️  WARNING: ASI1_API_KEY not found in environment variables!")
+    print("   Please add your ASI1 API key to the .env file:")
+    print("   ASI1_API_KEY=your_api_key_here")
+    print("   The agent will return helpful error messages until configured.")
+
+ASI1_HEADERS = {
+    "Authorization": f"Bearer {ASI1_API_KEY}" if ASI1_API_KEY else "Bearer missing_key",
+    "Content-Type": "application/json"
+}
+
+# Connection pool settings
+ASI1_POOL_SIZE = int(os.getenv("ASI1_POOL_SIZE", "20"))
+ASI1_KEEPALIVE_SECONDS = float(os.getenv("ASI1_KEEPALIVE_SECONDS", "60"))
+ASI1_TIMEOUT = float(os.getenv("ASI1_TIMEOUT", "120"))
+
+# User-facing messages for ASI1 status codes, per call stage
+ASI1_ERROR_MESSAGES = {
+    "initial": {
+        401: ("ASI1 API authentication failed - check API key",
+              "🔑 **Authentication Error**: Invalid or missing ASI1 API key. Please check your API key configuration in the .env file."),
+        403: ("ASI1 API access forbidden",
+              "🚫 **Access Denied**: Your API key doesn't have access to this service. Please check your ASI1 subscription."),
+        429: ("ASI1 API rate limit exceeded",
+              "⏳ **Rate Limited**: Too many requests. Please wait a moment and try again."),
+    },
+    "final": {
+        401: ("ASI1 API authentication failed on final call",
+              "🔑 **Authentication Error**: API key issue during final processing. Please check your configuration."),
+        429: ("ASI1 API rate limit exceeded on final call",
+              "⏳ **Rate Limited**: Please wait a moment and try again."),
+    },
+}
+
+class ASI1Error(Exception):
+    """ASI1 call failed with a status that has a user-facing message."""
+
+    def __init__(self, status: int, log_message: str, user_message: str, retry_after: float = None):
+        super().__init__(log_message)
+        self.status = status
+        self.log_message = log_message
+        self.user_message = user_message
+        self.retry_after = retry_after
+
+ASI1_UNAVAILABLE_MESSAGE = ("⚠️ **Service Unavailable**: The AI service is having trouble right now. "
+                            "Please try again in a minute.")
+
+# Fails fast while ASI1 is unhealthy; completions have no side effects, so they are retried
+asi1_breaker = CircuitBreaker("ASI1")
+
+def _unavailable(e: CircuitOpen) -> ASI1Error:
+    return ASI1Error(503, str(e), ASI1_UNAVAILABLE_MESSAGE, e.retry_after)
+
+# Shared keep-alive session for ASI1 calls
+http_session_pool = PooledHTTPSession(ASI1_HEADERS, ASI1_POOL_SIZE, ASI1_KEEPALIVE_SECONDS)
+
+def _check_status(response: aiohttp.ClientResponse, stage: str):
+    """Raise ASI1Error for mapped statuses, ClientResponseError for the rest."""
+    mapped = ASI1_ERROR_MESSAGES.get(stage, {}).get(response.status)
+    if mapped:
+        raise ASI1Error(response.status, *mapped, parse_retry_after(response.headers.get("Retry-After")))
+    response.raise_for_status()
+
+def _body(payload: dict | bytes) -> dict:
+    """Request keyword for a payload dict or an already serialized JSON body."""
+    return {"data": payload} if isinstance(payload, bytes) else {"json": payload}
+
+async def chat_completion(payload: dict | bytes, stage: str = "initial", timeout: float = ASI1_TIMEOUT) -> dict:
+    """POST a chat completion request to ASI1 and return the JSON response.
+
+    Transient failures are retried within timeout; raises ASI1Error while
+    the ASI1 breaker is open.
+    """
+    http_session = await http_session_pool.get()
+
+    async def attempt(attempt_timeout: float) -> dict:
+        async with http_session.post(
+                f"{ASI1_BASE_URL}/chat/completions",
+                **_body(payload),
+                timeout=aiohttp.ClientTimeout(total=attempt_timeout)) as response:
+            _check_status(response, stage)
+            return await response.json(content_type=None)
+
+    try:
+        return await asi1_breaker.call(attempt, timeout)
+    except CircuitOpen as e:
+        raise _unavailable(e)
+
+async def _stream_deltas(payload: dict | bytes, stage: str, timeout: float, total_timeout: float, on_usage=None):
+    """Stream a chat completion from ASI1, yielding each chunk's delta.
+
+    timeout bounds the wait for each chunk and total_timeout the whole
+    stream. A pre-serialized body must already contain "stream": true and
+    should ask for usage with "stream_options". Opening the stream is
+    retried like chat_completion; once deltas flow, a failure is raised
+    rather than replayed. When the stream completes, on_usage(chunk) gets
+    the chunk that carried usage, or {} if the provider sent none.
+    """
+    http_session = await http_session_pool.get()
+
+    async def open_stream(attempt_timeout: float) -> aiohttp.ClientResponse:
+        response = await http_session.post(
+            f"{ASI1_BASE_URL}/chat/completions",
+            **_body(payload if isinstance(payload, bytes) else {**payload, **STREAM_OPTIONS}),
+            timeout=aiohttp.ClientTimeout(total=attempt_timeout, sock_read=timeout))
+        try:
+            _check_status(response, stage)
+        except Exception:
+            response.release()
+            raise
+        return response
+
+    try:
+        response = await asi1_breaker.call(open_stream, total_timeout)
+    except CircuitOpen as e:
+        raise _unavailable(e)
+    # The attempt's total timeout also bounds reading the stream
+    usage_chunk = {}
+    async with response:
+        async for raw_line in response.content:
+            line = raw_line.decode("utf-8").strip()
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+            chunk = json.loads(data)
+            if chunk.get("usage"):
+                usage_chunk = chunk
+            # The usage chunk has no choices, and some providers send "delta": null
+            if chunk.get("choices"):
+                yield chunk["choices"][0].get("delta") or {}
+    if on_usage is not None:
+        on_usage(usage_chunk)
+
+async def stream_chat_completion(payload: dict | bytes, stage: str = "final", timeout: float = ASI1_TIMEOUT,
+                                 total_timeout: float = None, on_usage=None):
+    """Stream a chat completion from ASI1, yielding content tokens as they arrive."""
+    async for delta in _stream_deltas(payload, stage, timeout, total_timeout, on_usage):
+        token = delta.get("content")
+        if token:
+            yield token
+
+async def stream_chat_message(payload: dict | bytes, on_token, stage: str = "initial", timeout: float = ASI1_TIMEOUT,
+                              total_timeout: float = None, on_usage=None) -> dict:
+    """Stream a completion that may call tools, awaiting on_token(token) for content as it arrives.
+
+    Returns the assembled assistant message, with tool_calls merged from
+    their streamed fragments.
+    """
+    content = []
+    tool_calls = {}  # index -> tool call
+    async for delta in _stream_deltas(payload, stage, timeout, total_timeout, on_usage):
+        token = delta.get("content")
+        if token:
+            content.append(token)
+            await on_token(token)
+        for fragment in delta.get("tool_calls") or []:
+            call = tool_calls.setdefault(fragment.get("index", len(tool_calls)), {
+                "id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+            if fragment.get("id"):
+                call["id"] = fragment["id"]
+            function = fragment.get("function") or {}
+            call["function"]["name"] += function.get("name") or ""
+            call["function"]["arguments"] += function.get("arguments") or ""
+
+    message = {"role": "assistant", "content": "".join(content)}
+    if tool_calls:
+        message["tool_calls"] = [tool_calls[index] for index in sorted(tool_calls)]
+    return message
+
+async def close_asi1_client():
+    """Close the shared HTTP session and release pooled connections."""
+    await http_session_pool.close()
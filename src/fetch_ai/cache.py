@@ -0,0 +1,154 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """In-process TTL cache with single-flight request coalescing.
+
+    Concurrent misses for the same key share one in-flight fetch, so N
+    callers cause a single upstream call. Invalidation also detaches
+    in-flight fetches: their result is returned to the callers already
+    waiting but never stored, and later callers start a fresh fetch.
+    """
+
+    def __init__(self, default_ttl: float, ttls: dict = None):
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self._entries = {}  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Task
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def ttl_for(self, key) -> float:
+        name = key[0] if isinstance(key, tuple) else key
+        return self.ttls.get(name, self.default_ttl)
+
+    def get(self, key):
+        """Return a fresh cached value or None."""
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return None
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl_for(key) if ttl is None else ttl
+        self._entries[key] = (time.monotonic() + ttl, value)
+
+    async def get_or_fetch(self, key, fetch, ttl: float = None):
+        """Return the cached value for key, calling fetch() once on a miss."""
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return await asyncio.shield(task)
+
+        self.misses += 1
+        task = asyncio.create_task(self._fetch(key, fetch, ttl))
+        # Every waiter may have timed out through the shield; mark a failure as retrieved
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._inflight[key] = task
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, fetch, ttl: float = None):
+        task = asyncio.current_task()
+        try:
+            value = await fetch()
+            # Only store if no invalidation detached this fetch while it ran
+            if self._inflight.get(key) is task:
+                self.set(key, value, ttl)
+            return value
+        finally:
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+
+    def invalidate(self, key=None):
+        """Drop one key, or every key when called without arguments."""
+        if key is None:
+            self._entries.clear()
+            self._inflight.clear()
+        else:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        }
+
+class SWRCache(TTLCache):
+    """LRU-bounded TTL cache with stale-while-revalidate.
+
+    Entries past their TTL but within the stale window are returned
+    immediately while a single background refresh replaces them.
+    """
+
+    def __init__(self, default_ttl: float, ttls: dict = None, stale_ttl: float = 120, max_entries: int = 5000):
+        super().__init__(default_ttl, ttls)
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (fresh_until, stale_until, value)
+        self.stale_hits = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[2]
+        return None
+
+    def set(self, key, value, ttl: float = None):
+        ttl = self.ttl_for(key) if ttl is None else ttl
+        now = time.monotonic()
+        self._entries[key] = (now + ttl, now + ttl + self.stale_ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_fetch(self, key, fetch, ttl: float = None):
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry and entry[0] > now:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[2]
+
+        if entry and entry[1] > now:
+            self.stale_hits += 1
+            self._entries.move_to_end(key)
+            if key not in self._inflight:
+                task = asyncio.create_task(self._fetch(key, fetch, ttl))
+                # A failed refresh keeps the stale value; mark the error as retrieved
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._inflight[key] = task
+            return entry[2]
+
+        return await super().get_or_fetch(key, fetch, ttl)
+
+    def invalidate_where(self, predicate):
+        """Drop every key for which predicate(key) is true."""
+        for key in [key for key in self._entries if predicate(key)]:
+            del self._entries[key]
+        for key in [key for key in self._inflight if predicate(key)]:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        lookups = self.hits + self.stale_hits + self.misses + self.coalesced
+        stats.update({
+            "stale_hits": self.stale_hits,
+            "evictions": self.evictions,
+            "max_entries": self.max_entries,
+            "hit_rate": round((self.hits + self.stale_hits + self.coalesced) / lookups, 3) if lookups else 0.0,
+        })
+        return stats
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import aiohttp
+from dotenv import load_dotenv
+from cache import SWRCache, TTLCache
+from http_pool import PooledHTTPSession
+from resilience import CircuitBreaker
+
+# Load environment variables
+load_dotenv()
+
+BASE_URL = os.getenv("VAULT_APP0_BACKEND_URL") or "http://127.0.0.1:4943"
+
+HEADERS = {
+    # Add host in development environment
+    # "Host": f"{CANISTER_ID}.localhost",
+    "Content-Type": "application/json"
+}
+
+# Connection pool settings
+CANISTER_POOL_SIZE = int(os.getenv("CANISTER_POOL_SIZE", "20"))
+CANISTER_KEEPALIVE_SECONDS = float(os.getenv("CANISTER_KEEPALIVE_SECONDS", "30"))
+CANISTER_DEFAULT_TIMEOUT = float(os.getenv("CANISTER_TIMEOUT", "15"))
+
+def _endpoint_timeout(func_name: str, default: float) -> float:
+    """Per-endpoint timeout, overridable with CANISTER_TIMEOUT_<FUNC_NAME>."""
+    value = os.getenv(f"CANISTER_TIMEOUT_{func_name.upper()}")
+    return float(value) if value else default
+
+# Dispatch table: function name -> (path, request body builder, timeout in seconds)
+CANISTER_ENDPOINTS = {
+    # Token and Balance Functions
+    "get_user_balance": (
+        "/balance",
+        lambda args: {"owner": args["user_principal"]},
+        _endpoint_timeout("get_user_balance", CANISTER_DEFAULT_TIMEOUT)),
+
+    # Vault Information Functions
+    "get_vault_info": (
+        "/vault-info",
+        lambda args: {},
+        _endpoint_timeout("get_vault_info", CANISTER_DEFAULT_TIMEOUT)),
+    "get_active_products": (
+        "/products",
+        lambda args: {},
+        _endpoint_timeout("get_active_products", CANISTER_DEFAULT_TIMEOUT)),
+    "get_investment_instruments": (
+        "/get-investment-instruments",
+        lambda args: {},
+        _endpoint_timeout("get_investment_instruments", CANISTER_DEFAULT_TIMEOUT)),
+
+    # User Portfolio Functions
+    "get_user_vault_entries": (
+        "/user-vault-entries",
+        lambda args: {"user": args["user_principal"]},
+        _endpoint_timeout("get_user_vault_entries", CANISTER_DEFAULT_TIMEOUT)),
+    "get_user_investment_report": (
+        "/user-investment-report",
+        lambda args: {"user": args["user_principal"]},
+        _endpoint_timeout("get_user_investment_report", CANISTER_DEFAULT_TIMEOUT * 2)),
+    "get_unclaimed_dividends": (
+        "/unclaimed-dividends",
+        lambda args: {"user": args["user_principal"]},
+        _endpoint_timeout("get_unclaimed_dividends", CANISTER_DEFAULT_TIMEOUT)),
+
+    # Admin Functions
+    "check_admin_status": (
+        "/admin-check",
+        lambda args: {"principal": args["user_principal"]},
+        _endpoint_timeout("check_admin_status", CANISTER_DEFAULT_TIMEOUT)),
+    "get_admin_investment_report": (
+        "/admin-investment-report",
+        lambda args: {"admin_principal": args["admin_principal"]},
+        _endpoint_timeout("get_admin_investment_report", CANISTER_DEFAULT_TIMEOUT * 2)),
+}
+
+# Platform-wide endpoints that return the same data to every user, with cache TTLs in seconds
+VAULT_CACHE_TTLS = {
+    "get_vault_info": float(os.getenv("CACHE_TTL_VAULT_INFO", "30")),
+    "get_active_products": float(os.getenv("CACHE_TTL_ACTIVE_PRODUCTS", "300")),
+    "get_investment_instruments": float(os.getenv("CACHE_TTL_INVESTMENT_INSTRUMENTS", "300")),
+}
+vault_cache = TTLCache(default_ttl=30, ttls=VAULT_CACHE_TTLS)
+
+# User-scoped endpoints, cached per principal with short TTLs and stale-while-revalidate
+PORTFOLIO_CACHE_TTLS = {
+    "get_user_balance": float(os.getenv("CACHE_TTL_USER_BALANCE", "10")),
+    "get_user_vault_entries": float(os.getenv("CACHE_TTL_USER_VAULT_ENTRIES", "15")),
+    "get_user_investment_report": float(os.getenv("CACHE_TTL_USER_INVESTMENT_REPORT", "30")),
+    "get_unclaimed_dividends": float(os.getenv("CACHE_TTL_UNCLAIMED_DIVIDENDS", "15")),
+}
+portfolio_cache = SWRCache(
+    default_ttl=15,
+    ttls=PORTFOLIO_CACHE_TTLS,
+    stale_ttl=float(os.getenv("CACHE_STALE_TTL_PORTFOLIO", "120")),
+    max_entries=int(os.getenv("CACHE_MAX_PORTFOLIO_ENTRIES", "5000")))
+
+# Endpoints that make up a user portfolio snapshot, in prompt order
+PORTFOLIO_SNAPSHOT_FUNCTIONS = [
+    "get_user_balance",
+    "get_user_vault_entries",
+    "get_user_investment_report",
+    "get_unclaimed_dividends",
+]
+
+# Fails fast while the canister gateway is unhealthy; every endpoint is a read, so calls are retried
+canister_breaker = CircuitBreaker("Canister")
+
+# Shared keep-alive session for canister calls
+http_session_pool = PooledHTTPSession(HEADERS, CANISTER_POOL_SIZE, CANISTER_KEEPALIVE_SECONDS)
+
+async def call_canister(func_name: str, args: dict, timeout: float = None):
+    """Call a canister endpoint from the dispatch table and return its JSON body.
+
+    timeout bounds how long this caller waits; a shared cached fetch keeps
+    running for other waiters with the endpoint's own timeout.
+    """
+    if func_name not in CANISTER_ENDPOINTS:
+        raise ValueError(f"Unsupported function call: {func_name}")
+
+    if func_name in VAULT_CACHE_TTLS:
+        fetch = vault_cache.get_or_fetch(func_name, lambda: _post(func_name, args))
+    elif func_name in PORTFOLIO_CACHE_TTLS:
+        key = (func_name, args["user_principal"])
+        fetch = portfolio_cache.get_or_fetch(key, lambda: _post(func_name, args))
+    else:
+        fetch = _post(func_name, args, timeout)
+    if timeout is None:
+        return await fetch
+    return await asyncio.wait_for(fetch, timeout=timeout)
+
+def invalidate_vault_cache(func_name: str = None):
+    """Drop cached platform-wide data, e.g. after an admin changes products."""
+    vault_cache.invalidate(func_name)
+
+def invalidate_user_portfolio(user_principal: str):
+    """Drop cached portfolio data for a user, e.g. after they lock or unlock tokens."""
+    portfolio_cache.invalidate_where(lambda key: key[1] == user_principal)
+
+async def _post(func_name: str, args: dict, timeout: float = None):
+    """Send the request for func_name to the canister over the shared pool, retrying transient failures."""
+    path, build_body, endpoint_timeout = CANISTER_ENDPOINTS[func_name]
+    timeout = min(timeout, endpoint_timeout) if timeout is not None else endpoint_timeout
+    http_session = await http_session_pool.get()
+
+    async def attempt(attempt_timeout: float):
+        async with http_session.post(
+                f"{BASE_URL}{path}",
+                json=build_body(args),
+                timeout=aiohttp.ClientTimeout(total=attempt_timeout)) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    return await canister_breaker.call(attempt, timeout)
+
+async def fetch_user_snapshot(user_principal: str, timeout: float = None) -> list:
+    """Fetch all portfolio endpoints for a user concurrently.
+
+    A failed endpoint is replaced by an error entry so the rest of the
+    snapshot is still usable; only a total failure is raised.
+    """
+    args = {"user_principal": user_principal}
+    results = await asyncio.gather(
+        *[call_canister(func_name, args, timeout) for func_name in PORTFOLIO_SNAPSHOT_FUNCTIONS],
+        return_exceptions=True)
+
+    errors = [result for result in results if isinstance(result, Exception)]
+    if len(errors) == len(results):
+        raise errors[0]
+
+    return [
+        {"error": f"{func_name} unavailable: {str(result)}", "status": "failed"}
+        if isinstance(result, Exception) else result
+        for func_name, result in zip(PORTFOLIO_SNAPSHOT_FUNCTIONS, results)
+    ]
+
+async def close_canister_client():
+    """Close the shared HTTP session and release pooled connections."""
+    await http_session_pool.close()
@@ -0,0 +1,134 @@
+import json
+import os
+from context_builder import count_tokens
+
+# Compaction settings
+TOOL_RESULT_MAX_TOKENS = int(os.getenv("TOOL_RESULT_MAX_TOKENS", "800"))
+TOOL_RESULT_TOP_N = int(os.getenv("TOOL_RESULT_TOP_N", "10"))
+
+# Projection schema per tool:
+#   drop   - top-level fields the LLM does not need (e.g. the principal it already knows)
+#   list   - name of a list field to pre-aggregate into totals plus the top N items
+#   fields - fields kept on each list item
+#   sum    - numeric item field to total
+#   sort   - numeric item field used to pick the top N items
+#   flags  - boolean item fields to count
+PROJECTIONS = {
+    "get_user_balance": {"drop": ["owner"]},
+    "check_admin_status": {"drop": ["principal"]},
+    "get_user_investment_report": {"drop": ["user"]},
+    "get_active_products": {
+        "list": "products",
+        "fields": ["id", "name", "description"],
+    },
+    "get_investment_instruments": {
+        "list": "instruments",
+        "fields": ["id", "name", "type", "expected_apy", "risk_level",
+                   "min_investment", "max_investment", "lock_period_days"],
+        "sum": "total_invested",
+        "sort": "expected_apy",
+    },
+    "get_user_vault_entries": {
+        "drop": ["user"],
+        "list": "entries",
+        "fields": ["id", "amount", "product_id", "duration_minutes", "unlock_time", "can_unlock", "is_flexible"],
+        "sum": "amount",
+        "sort": "amount",
+        "flags": ["can_unlock", "is_flexible"],
+    },
+    "get_unclaimed_dividends": {
+        "drop": ["user"],
+        "list": "unclaimed_dividends",
+        "fields": ["distribution_id", "amount"],
+        "sum": "amount",
+        "sort": "amount",
+    },
+}
+
+# Tools whose results are prose answers; these reach the LLM unchanged
+PASSTHROUGH = {"get_analysis_and_recommendation"}
+
+# Running totals of what compaction saved
+compaction_stats = {"results": 0, "bytes_before": 0, "bytes_after": 0, "tokens_before": 0, "tokens_after": 0}
+
+def _aggregate_list(items: list, projection: dict, top_n: int) -> tuple:
+    """Return (summary, top items) for a list according to its projection."""
+    summary = {"count": len(items)}
+    if projection.get("sum"):
+        summary[f"total_{projection['sum']}"] = sum(item.get(projection["sum"]) or 0 for item in items)
+    for flag in projection.get("flags", []):
+        summary[f"{flag}_count"] = sum(1 for item in items if item.get(flag))
+
+    if projection.get("sort"):
+        items = sorted(items, key=lambda item: item.get(projection["sort"]) or 0, reverse=True)
+    fields = projection.get("fields")
+    top = [{k: v for k, v in item.items() if k in fields} if fields else item for item in items[:top_n]]
+    return summary, top
+
+def _cap_lists(value, top_n: int, depth: int = 0):
+    """Generic compaction for results without a projection: cap nested lists to top_n items."""
+    if depth > 6:
+        return value
+    if isinstance(value, dict):
+        capped = {}
+        for key, item in value.items():
+            capped[key] = _cap_lists(item, top_n, depth + 1)
+            if isinstance(item, list) and len(item) > top_n:
+                capped[f"{key}_total_count"] = len(item)
+        return capped
+    if isinstance(value, list):
+        return [_cap_lists(item, top_n, depth + 1) for item in value[:top_n]]
+    return value
+
+def project(func_name: str, result, top_n: int = TOOL_RESULT_TOP_N):
+    """Apply the tool's projection schema, or generic list capping if it has none."""
+    projection = PROJECTIONS.get(func_name)
+    if projection is None or not isinstance(result, dict) or "error" in result:
+        return _cap_lists(result, top_n)
+
+    compacted = {k: v for k, v in result.items() if k not in projection.get("drop", [])}
+    list_field = projection.get("list")
+    if list_field and isinstance(compacted.get(list_field), list):
+        summary, top = _aggregate_list(compacted[list_field], projection, top_n)
+        compacted[f"{list_field}_summary"] = summary
+        compacted[list_field] = top
+        if summary["count"] > len(top):
+            compacted[f"{list_field}_note"] = f"showing top {len(top)} of {summary['count']}"
+    return compacted
+
+def is_prose(func_name: str, result) -> bool:
+    """Whether a result is free text, which cannot be cut down without damaging it."""
+    if func_name in PASSTHROUGH or isinstance(result, str):
+        return True
+    return isinstance(result, dict) and isinstance(result.get("response"), str)
+
+def compact_result(func_name: str, result, max_tokens: int = TOOL_RESULT_MAX_TOKENS) -> str:
+    """Serialize a tool result for the LLM, projected and capped to max_tokens.
+
+    Prose results pass through unchanged; only structured payloads are compacted.
+    """
+    original = json.dumps(result)
+    if is_prose(func_name, result):
+        return original
+    top_n = TOOL_RESULT_TOP_N
+    compacted = json.dumps(project(func_name, result, top_n), separators=(",", ":"))
+    # Shrink the kept items until the result fits the token cap
+    while count_tokens(compacted) > max_tokens and top_n > 1:
+        top_n //= 2
+        compacted = json.dumps(project(func_name, result, top_n), separators=(",", ":"))
+    if count_tokens(compacted) > max_tokens:
+        compacted = json.dumps({"truncated_result": compacted[:max_tokens * 4]})
+
+    compaction_stats["results"] += 1
+    compaction_stats["bytes_before"] += len(original)
+    compaction_stats["bytes_after"] += len(compacted)
+    compaction_stats["tokens_before"] += count_tokens(original)
+    compaction_stats["tokens_after"] += count_tokens(compacted)
+    return compacted
+
+def get_compaction_stats() -> dict:
+    return {
+        **compaction_stats,
+        "bytes_saved": compaction_stats["bytes_before"] - compaction_stats["bytes_after"],
+        "tokens_saved": compaction_stats["tokens_before"] - compaction_stats["tokens_after"],
+    }
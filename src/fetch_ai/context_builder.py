@@ -0,0 +1,91 @@
+import os
+
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# Context window settings
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000"))  # Tokens for recent history turns
+SUMMARY_TOKEN_BUDGET = int(os.getenv("SUMMARY_TOKEN_BUDGET", "400"))  # Tokens for the rolling summary
+SUMMARY_LINE_CHARS = int(os.getenv("SUMMARY_LINE_CHARS", "200"))  # Characters kept per folded turn
+
+def count_tokens(text: str) -> int:
+    """Count tokens locally, with tiktoken when installed and ~4 chars/token otherwise."""
+    if not text:
+        return 0
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+def _fold_turn(message: dict) -> str:
+    """Compress one turn into a single summary line."""
+    content = " ".join((message["content"] or "").split())
+    if len(content) > SUMMARY_LINE_CHARS:
+        content = content[:SUMMARY_LINE_CHARS].rstrip() + "…"
+    return f"- {message['role']}: {content}"
+
+def _trim_summary(lines: list, budget: int) -> list:
+    """Drop the oldest summary lines until the summary fits the budget."""
+    total = sum(count_tokens(line) for line in lines)
+    start = 0
+    while total > budget and start < len(lines):
+        total -= count_tokens(lines[start])
+        start += 1
+    return lines[start:]
+
+def fold_trimmed_message(store, session_id: str, message: dict, summary_budget: int = SUMMARY_TOKEN_BUDGET):
+    """Fold a message the store dropped into the rolling summary, unless it was already folded.
+
+    Meant as the store's on_trim hook, so turns the store trims before they
+    leave the token window still reach the summary.
+    """
+    summary, summary_until = store.get_summary(session_id)
+    if message["role"] == "system" or message["timestamp"] <= summary_until:
+        return
+    lines = summary.splitlines() + [_fold_turn(message)]
+    store.set_summary(session_id, "\n".join(_trim_summary(lines, summary_budget)), message["timestamp"])
+
+def build_history_context(store, session_id: str, budget: int = CONTEXT_TOKEN_BUDGET,
+                          summary_budget: int = SUMMARY_TOKEN_BUDGET, query_stored: bool = True) -> list:
+    """Build prompt messages for a session's history within a token budget.
+
+    The most recent turns that fit the budget are sent verbatim. Older turns
+    are folded once into a rolling summary stored with the session, so each
+    call only summarizes turns that newly left the window. When
+    query_stored, the last stored message is the current query and is left
+    for the caller to add.
+    """
+    history = store.get_history(session_id)
+    if query_stored:
+        history = history[:-1]
+    history = [msg for msg in history if msg["role"] != "system"]
+
+    # Fill the budget with the newest turns
+    window_start = len(history)
+    used = 0
+    while window_start > 0:
+        cost = count_tokens(history[window_start - 1]["content"])
+        if used + cost > budget:
+            break
+        used += cost
+        window_start -= 1
+
+    # Fold turns that left the window and are not yet in the summary
+    summary, summary_until = store.get_summary(session_id)
+    newly_folded = [msg for msg in history[:window_start] if msg["timestamp"] > summary_until]
+    if newly_folded:
+        lines = summary.splitlines() + [_fold_turn(msg) for msg in newly_folded]
+        summary = "\n".join(_trim_summary(lines, summary_budget))
+        summary_until = newly_folded[-1]["timestamp"]
+        store.set_summary(session_id, summary, summary_until)
+
+    messages = []
+    if summary:
+        messages.append({
+            "role": "system",
+            "content": f"Summary of earlier conversation turns:\n{summary}"
+        })
+    messages.extend({"role": msg["role"], "content": msg["content"]} for msg in history[window_start:])
+    return messages
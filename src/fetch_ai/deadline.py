@@ -0,0 +1,40 @@
+import asyncio
+import os
+import time
+
+# Request latency budgets (seconds)
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "120"))  # End-to-end SLO for interactive chat
+JOB_DEADLINE = float(os.getenv("JOB_DEADLINE", "900"))  # Budget for queued background jobs
+FINAL_ANSWER_RESERVE = float(os.getenv("FINAL_ANSWER_RESERVE", "15"))  # Kept back from tools for the final answer
+DEADLINE_GRACE = 5.0  # Hard stop after the deadline if a stage ignores it
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """The request ran out of its time budget."""
+
+class Deadline:
+    """Absolute point in time by which a request must finish.
+
+    Created once at the entry point and passed down the pipeline; each stage
+    asks for its timeout, which is its own cap limited by what is left.
+    """
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, cap: float = None, reserve: float = 0.0) -> float:
+        """Timeout for the next stage: cap, bounded by the remaining budget minus reserve.
+
+        Raises DeadlineExceeded if nothing is left for the stage.
+        """
+        available = self.remaining() - reserve
+        if available <= 0:
+            raise DeadlineExceeded(f"Request deadline of {self.budget:g}s exceeded")
+        return min(cap, available) if cap is not None else available
@@ -0,0 +1,83 @@
+import os
+import httpx
+from dotenv import load_dotenv
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+# Load environment variables
+load_dotenv()
+
+# GPT Responses API settings
+GPT_MODEL = os.getenv("GPT_MODEL", "gpt-5")
+GPT_REASONING_EFFORT = os.getenv("GPT_REASONING_EFFORT", "medium")  # minimal, low, medium or high
+GPT_VERBOSITY = os.getenv("GPT_VERBOSITY", "medium")
+GPT_TIMEOUT = float(os.getenv("GPT_TIMEOUT", "300"))
+GPT_POOL_SIZE = int(os.getenv("GPT_POOL_SIZE", "20"))
+
+# One shared async client, so every call reuses the same pooled keep-alive connections
+openai_client = AsyncOpenAI(
+    timeout=GPT_TIMEOUT,
+    http_client=DefaultAsyncHttpxClient(
+        limits=httpx.Limits(max_connections=GPT_POOL_SIZE, max_keepalive_connections=GPT_POOL_SIZE)))
+
+def _request(messages: list, effort: str, verbosity: str, model: str) -> dict:
+    return {
+        "model": model,
+        "input": messages,
+        "text": {"format": {"type": "text"}, "verbosity": verbosity},
+        "reasoning": {"effort": effort},
+        "store": True,
+    }
+
+def response_text(response) -> str:
+    """Collect the output text of a Responses API result.
+
+    The output list holds reasoning items, tool calls and messages in no fixed
+    order, so the text is gathered from every message item rather than read
+    from a fixed index.
+    """
+    text = getattr(response, "output_text", None)
+    if text:
+        return text
+    parts = []
+    for item in getattr(response, "output", None) or []:
+        if getattr(item, "type", None) != "message":
+            continue
+        for content in getattr(item, "content", None) or []:
+            if getattr(content, "type", None) == "output_text":
+                parts.append(content.text)
+    return "".join(parts)
+
+async def gpt_response(messages: list, effort: str = GPT_REASONING_EFFORT,
+                       verbosity: str = GPT_VERBOSITY, model: str = GPT_MODEL, timeout: float = None,
+                       on_delta=None) -> str:
+    """Run a Responses API call without blocking the event loop and return its text.
+
+    With on_delta, the output is streamed and on_delta(text) is awaited for
+    each text delta as it arrives.
+    """
+    if on_delta is None:
+        response = await openai_client.responses.create(
+            **_request(messages, effort, verbosity, model), timeout=timeout or GPT_TIMEOUT)
+        return response_text(response)
+
+    parts = []
+    async for delta in stream_gpt_response(messages, effort, verbosity, model, timeout):
+        parts.append(delta)
+        await on_delta(delta)
+    return "".join(parts)
+
+async def stream_gpt_response(messages: list, effort: str = GPT_REASONING_EFFORT,
+                              verbosity: str = GPT_VERBOSITY, model: str = GPT_MODEL, timeout: float = None):
+    """Stream a Responses API call, yielding output text deltas as they arrive."""
+    stream = await openai_client.responses.create(
+        **_request(messages, effort, verbosity, model), stream=True, timeout=timeout or GPT_TIMEOUT)
+    async with stream:
+        async for event in stream:
+            if event.type == "response.output_text.delta":
+                yield event.delta
+            elif event.type in ("response.failed", "error"):
+                raise RuntimeError(f"GPT response stream failed: {event}")
+
+async def close_gpt_client():
+    """Close the shared client and its pooled connections."""
+    await openai_client.close()
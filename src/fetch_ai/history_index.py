@@ -0,0 +1,139 @@
+import os
+import re
+import zlib
+from collections import OrderedDict
+import numpy as np
+from context_builder import count_tokens
+
+# Retrieval index settings
+HISTORY_VECTOR_DIM = int(os.getenv("HISTORY_VECTOR_DIM", "256"))
+# Per session; in retrieval mode the session store retains as many, so old turns stay retrievable
+HISTORY_INDEX_MAX_MESSAGES = int(os.getenv("HISTORY_INDEX_MAX_MESSAGES", "2000"))
+HISTORY_INDEX_MAX_SESSIONS = int(os.getenv("HISTORY_INDEX_MAX_SESSIONS", "200"))
+HISTORY_RETRIEVAL_TOP_K = int(os.getenv("HISTORY_RETRIEVAL_TOP_K", "6"))
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+def embed(text: str, dim: int = HISTORY_VECTOR_DIM) -> np.ndarray:
+    """Embed text offline with a signed hashing vectorizer over unigrams and bigrams."""
+    vector = np.zeros(dim, dtype=np.float32)
+    words = _TOKEN_PATTERN.findall((text or "").lower())
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = zlib.crc32(feature.encode("utf-8"))
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+class SessionVectorIndex:
+    """Compact vector index over the messages a session store retains for one session.
+
+    Vectors are stored as float16 and the buffer never grows past
+    max_messages rows; once full, the oldest tenth is dropped in one step,
+    so appends stay amortized O(1) and the index never holds a message the
+    store has already dropped.
+    """
+
+    def __init__(self, dim: int = HISTORY_VECTOR_DIM, max_messages: int = HISTORY_INDEX_MAX_MESSAGES):
+        self.dim = dim
+        self.max_messages = max_messages
+        self.vectors = np.zeros((min(16, max_messages), dim), dtype=np.float16)
+        self.messages = []
+
+    def add(self, message: dict):
+        if len(self.messages) >= self.max_messages:
+            drop = max(self.max_messages // 10, 1)
+            keep = len(self.messages) - drop
+            self.vectors[:keep] = self.vectors[drop:len(self.messages)]
+            self.messages = self.messages[drop:]
+        elif len(self.messages) == len(self.vectors):
+            grown = np.zeros((min(len(self.vectors) * 2, self.max_messages), self.dim), dtype=np.float16)
+            grown[:len(self.vectors)] = self.vectors
+            self.vectors = grown
+        self.vectors[len(self.messages)] = embed(message["content"], self.dim)
+        self.messages.append(message)
+
+    def search(self, query_vector: np.ndarray, k: int, exclude_last: int = 0) -> list:
+        """Return indices of the k most similar messages, best first."""
+        count = len(self.messages) - exclude_last
+        if count <= 0 or k <= 0:
+            return []
+        scores = self.vectors[:count].astype(np.float32) @ query_vector
+        k = min(k, count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in top[np.argsort(-scores[top])] if scores[i] > 0]
+
+class HistoryIndex:
+    """Per-session vector indexes, bounded by LRU over sessions."""
+
+    def __init__(self, max_sessions: int = HISTORY_INDEX_MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+
+    def _get(self, session_id: str, store=None) -> SessionVectorIndex:
+        index = self._sessions.get(session_id)
+        if index is None:
+            index = SessionVectorIndex()
+            # Seed from the session store, e.g. after a restart with durable memory
+            if store is not None:
+                for message in store.get_history(session_id):
+                    if message["role"] != "system":
+                        index.add(message)
+            self._sessions[session_id] = index
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self._sessions.move_to_end(session_id)
+        return index
+
+    def add_message(self, session_id: str, message: dict):
+        if message["role"] == "system":
+            return
+        index = self._sessions.get(session_id)
+        # Sessions not yet indexed are seeded from the store on first retrieval
+        if index is not None:
+            index.add(message)
+
+    def clear(self, session_id: str):
+        """Drop a session's index, e.g. when memory is cleared or the session store evicts it."""
+        self._sessions.pop(session_id, None)
+
+    def retrieve(self, store, session_id: str, query: str, budget: int,
+                 k: int = HISTORY_RETRIEVAL_TOP_K, recent_turns: int = 2, query_stored: bool = True) -> list:
+        """Select relevant past turns for a query within a token budget.
+
+        The last recent_turns messages before the current query are always
+        kept for conversational continuity; the rest of the budget goes to the
+        top-k most similar older messages. Results are in chronological order.
+        query_stored says whether the current query is already the newest
+        stored message.
+        """
+        index = self._get(session_id, store)
+        current = 1 if query_stored else 0
+        past = len(index.messages) - current
+        recent = list(range(max(past - recent_turns, 0), past))
+
+        selected = []
+        used = 0
+        for i in reversed(recent):
+            cost = count_tokens(index.messages[i]["content"])
+            if used + cost > budget:
+                break
+            selected.append(i)
+            used += cost
+
+        for i in index.search(embed(query), k, exclude_last=current + len(recent)):
+            cost = count_tokens(index.messages[i]["content"])
+            if used + cost <= budget:
+                selected.append(i)
+                used += cost
+
+        return [
+            {"role": index.messages[i]["role"], "content": index.messages[i]["content"]}
+            for i in sorted(selected)
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "messages": sum(len(index.messages) for index in self._sessions.values()),
+            "vector_bytes": sum(index.vectors.nbytes for index in self._sessions.values()),
+        }
@@ -0,0 +1,35 @@
+import asyncio
+import aiohttp
+
+class PooledHTTPSession:
+    """Shared keep-alive aiohttp session, created lazily inside the running event loop.
+
+    One instance per upstream service, so each gets its own connection pool
+    and default headers.
+    """
+
+    def __init__(self, headers: dict, pool_size: int, keepalive_seconds: float):
+        self.headers = headers
+        self.pool_size = pool_size
+        self.keepalive_seconds = keepalive_seconds
+        self._session: aiohttp.ClientSession | None = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on first use or after close."""
+        if self._session is None or self._session.closed:
+            async with self._lock:
+                if self._session is None or self._session.closed:
+                    connector = aiohttp.TCPConnector(
+                        limit=self.pool_size,
+                        keepalive_timeout=self.keepalive_seconds)
+                    self._session = aiohttp.ClientSession(
+                        headers=self.headers,
+                        connector=connector)
+        return self._session
+
+    async def close(self):
+        """Close the session and release pooled connections."""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
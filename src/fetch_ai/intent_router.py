@@ -0,0 +1,155 @@
+import json
+import os
+import re
+
+# Fast path settings
+FAST_PATH_ENABLED = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+FAST_PATH_FORMAT = os.getenv("FAST_PATH_FORMAT", "llm")  # "llm" (one ASI1 call) or "template"
+FAST_PATH_MAX_WORDS = int(os.getenv("FAST_PATH_MAX_WORDS", "12"))
+
+USDX_DECIMALS = 6
+
+# Rules: function name -> (patterns, needs the user's principal)
+INTENT_RULES = {
+    "get_user_balance": ([
+        r"\bmy (usdx |token )?balance\b",
+        r"\bhow (much|many) (usdx|tokens?|money) (do i have|have i got)\b",
+    ], True),
+    "get_user_vault_entries": ([
+        r"\bmy (vault )?(entries|locks|locked tokens|positions|deposits)\b",
+    ], True),
+    "get_user_investment_report": ([
+        r"\bmy (investment |portfolio )?(report|performance|roi)\b",
+    ], True),
+    "get_unclaimed_dividends": ([
+        r"\bmy (unclaimed |pending )?(dividends|rewards)\b",
+        r"\bunclaimed (dividends|rewards)\b",
+    ], True),
+    "get_active_products": ([
+        r"^(list|show)( me)?( the| all)?( active| available)? products$",
+        r"^(what|which) (are the )?(active |available )?products( are (there|available))?$",
+    ], False),
+    "get_investment_instruments": ([
+        r"^(list|show)( me)?( the| all)?( available)? (investment )?instruments$",
+        r"^(what|which) (are the )?(available )?(investment )?instruments( are (there|available))?$",
+    ], False),
+    "get_vault_info": ([
+        r"\bvault (info|information|status|stats|overview)\b",
+        r"\btotal (value )?locked\b",
+        r"\btvl\b",
+    ], False),
+}
+_COMPILED_RULES = {
+    func_name: ([re.compile(pattern) for pattern in patterns], needs_principal)
+    for func_name, (patterns, needs_principal) in INTENT_RULES.items()
+}
+
+# Queries with these markers need reasoning or several tools, so they take the full flow.
+# Temporal markers matter too: the fast-path tools only report the current state.
+_COMPLEX_MARKERS = re.compile(
+    r"\b(and|or|but|compare|versus|vs|why|should|recommend\w*|advice|explain|how does|how do|if|then|after|before"
+    r"|was|were|did|had|last|ago|history|historical|previous\w*|past|since|yesterday|earlier|change[ds]?)\b")
+
+# Router counters; initial_call_avg_ms is the average first ASI1 round trip the fast path skips
+router_stats = {"queries": 0, "routed": 0, "templated": 0, "initial_calls": 0, "initial_call_avg_ms": 0.0}
+
+def _normalize(query: str) -> str:
+    return " ".join(re.sub(r"[^\w\s'-]", " ", query.lower()).replace("what's", "what is").split())
+
+def match_intent(query: str, user_principal: str = None):
+    """Return (function name, arguments) for a high-confidence query, or None.
+
+    A query matches only when it is short, has no compound or reasoning
+    markers, and matches exactly one intent whose requirements are met.
+    """
+    text = _normalize(query)
+    if not text or len(text.split()) > FAST_PATH_MAX_WORDS or _COMPLEX_MARKERS.search(text):
+        return None
+
+    matches = [
+        (func_name, needs_principal)
+        for func_name, (patterns, needs_principal) in _COMPILED_RULES.items()
+        if any(pattern.search(text) for pattern in patterns)
+    ]
+    if len(matches) != 1:
+        return None
+    func_name, needs_principal = matches[0]
+    if needs_principal and not user_principal:
+        return None
+    return func_name, ({"user_principal": user_principal} if needs_principal else {})
+
+def route_query(query: str, user_principal: str = None):
+    """Map a high-confidence query to (function name, arguments), or None to use the full flow."""
+    router_stats["queries"] += 1
+    if not FAST_PATH_ENABLED:
+        return None
+    route = match_intent(query, user_principal)
+    if route:
+        router_stats["routed"] += 1
+    return route
+
+def record_initial_call(seconds: float):
+    """Track the latency of initial ASI1 calls made on the full flow."""
+    router_stats["initial_calls"] += 1
+    average = router_stats["initial_call_avg_ms"]
+    router_stats["initial_call_avg_ms"] = average + (seconds * 1000 - average) / router_stats["initial_calls"]
+
+def _usdx(amount) -> str:
+    return f"{(amount or 0) / 10 ** USDX_DECIMALS:,.2f} USDX"
+
+def _format_balance(result: dict) -> str:
+    return f"💰 Your current balance is **{_usdx(result['balance'])}**."
+
+def _format_vault_info(result: dict) -> str:
+    return (f"📊 **Vault overview**\n"
+            f"- Total locked: {_usdx(result['total_locked'])}\n"
+            f"- Active products: {result['total_products']}\n"
+            f"- Dividend distributions: {result['dividend_count']}")
+
+def _format_products(result: dict) -> str:
+    lines = [f"- **{product['name']}**: {product['description']}" for product in result["products"]]
+    if not lines:
+        return "There are no active products right now."
+    # Compaction keeps only the top products; say so rather than pass a partial list off as complete
+    total = result.get("products_summary", {}).get("count", len(lines))
+    if total > len(lines):
+        lines.append(f"\n_Showing {len(lines)} of {total} products._")
+    return "📦 **Active products**\n" + "\n".join(lines)
+
+def _format_dividends(result: dict) -> str:
+    summary = result.get("unclaimed_dividends_summary", {})
+    count = summary.get("count", len(result["unclaimed_dividends"]))
+    if not count:
+        return "You have no unclaimed dividends at the moment."
+    return f"🎁 You have **{count}** unclaimed dividend(s) totalling **{_usdx(summary.get('total_amount'))}**."
+
+# Deterministic answers for FAST_PATH_FORMAT=template; other intents still use one ASI1 call
+TEMPLATES = {
+    "get_user_balance": _format_balance,
+    "get_vault_info": _format_vault_info,
+    "get_active_products": _format_products,
+    "get_unclaimed_dividends": _format_dividends,
+}
+
+def format_template(func_name: str, content: str):
+    """Render a tool result with its template, or None if it has none or the call failed."""
+    template = TEMPLATES.get(func_name)
+    if FAST_PATH_FORMAT != "template" or template is None:
+        return None
+    try:
+        result = json.loads(content)
+        if "error" in result:
+            return None
+        answer = template(result)
+    except (ValueError, KeyError, TypeError):
+        return None
+    router_stats["templated"] += 1
+    return answer
+
+def get_router_stats() -> dict:
+    queries = router_stats["queries"]
+    return {
+        **router_stats,
+        "hit_rate": round(router_stats["routed"] / queries, 4) if queries else 0.0,
+        "latency_saved_ms": round(router_stats["routed"] * router_stats["initial_call_avg_ms"], 1),
+    }
@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import os
+import time
+from collections import OrderedDict
+from uuid import uuid4
+from deadline import DEADLINE_GRACE, JOB_DEADLINE
+
+# Job queue settings
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "100"))
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "1800"))  # Seconds a finished job stays retrievable
+JOB_DEDUPE_WINDOW = float(os.getenv("JOB_DEDUPE_WINDOW", "60"))  # Seconds a finished job answers duplicates
+JOB_TIMEOUT = JOB_DEADLINE + DEADLINE_GRACE  # Hard stop; jobs themselves honour JOB_DEADLINE
+
+# The job a worker is running, so its work can report partial output
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+def current_job():
+    """Return the job the calling task is running for, or None outside a job."""
+    return _current_job.get()
+
+class Job:
+    """One queued unit of work and its outcome."""
+
+    __slots__ = ("job_id", "key", "run", "status", "result", "partial", "error", "created_at", "started_at",
+                 "finished_at")
+
+    def __init__(self, key, run):
+        self.job_id = uuid4().hex
+        self.key = key
+        self.run = run
+        self.status = "queued"
+        self.result = None
+        self.partial = ""  # Output written so far, for pollers
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict:
+        """Status fields, as returned by the status endpoint."""
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "partial": self.partial if self.status == "running" else None,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+        }
+
+class JobQueue:
+    """In-process job queue with bounded workers, TTL'd results and de-duplication.
+
+    submit() returns immediately with a job; a fixed pool of worker tasks
+    runs queued jobs so long analyses never hold an HTTP request open.
+    Submitting the same key while a job is queued, running or just finished
+    returns that job instead of starting another.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, max_pending: int = JOB_MAX_PENDING,
+                 result_ttl: float = JOB_RESULT_TTL, dedupe_window: float = JOB_DEDUPE_WINDOW,
+                 timeout: float = JOB_TIMEOUT):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.dedupe_window = dedupe_window
+        self.timeout = timeout
+        self._jobs = {}  # job_id -> Job
+        self._finished = OrderedDict()  # job_id -> Job, in the order they finished
+        self._by_key = {}  # dedupe key -> job_id
+        self._queue = None
+        self._workers = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+
+    def _start(self):
+        """Create the queue and workers inside the running event loop."""
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    def _expire(self):
+        # Only finished jobs expire; a long-running job never holds back the ones behind it
+        now = time.time()
+        while self._finished:
+            job = next(iter(self._finished.values()))
+            if now - job.finished_at <= self.result_ttl:
+                break
+            self._finished.popitem(last=False)
+            del self._jobs[job.job_id]
+            if self._by_key.get(job.key) == job.job_id:
+                del self._by_key[job.key]
+
+    def submit(self, key, run) -> tuple:
+        """Queue run() unless an equivalent job exists; return (job, deduplicated).
+
+        Raises asyncio.QueueFull when the queue is at capacity.
+        """
+        self._start()
+        self._expire()
+        existing = self._jobs.get(self._by_key.get(key))
+        if existing is not None and (not existing.finished or time.time() - existing.finished_at <= self.dedupe_window):
+            self.deduplicated += 1
+            return existing, True
+
+        job = Job(key, run)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise
+        self._jobs[job.job_id] = job
+        self._by_key[key] = job.job_id
+        self.submitted += 1
+        return job, False
+
+    def get(self, job_id: str) -> Job:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            _current_job.set(job)
+            try:
+                job.result = await asyncio.wait_for(job.run(), timeout=self.timeout)
+                job.status = "done"
+            except asyncio.CancelledError:
+                job.status = "failed"
+                job.error = "Job cancelled"
+                raise
+            except asyncio.TimeoutError:
+                job.status = "failed"
+                job.error = f"Job timed out after {self.timeout} seconds"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished_at = time.time()
+                job.run = None
+                self._finished[job.job_id] = job
+                self._queue.task_done()
+
+    async def close(self):
+        """Cancel the workers; queued jobs are dropped."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def stats(self) -> dict:
+        self._expire()
+        statuses = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "max_pending": self.max_pending,
+            "jobs": statuses,
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,219 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+# Market snapshot settings
+MARKET_SNAPSHOT_INTERVAL = float(os.getenv("MARKET_SNAPSHOT_INTERVAL", "300"))  # Seconds between refreshes
+MARKET_SNAPSHOT_MAX_AGE = float(os.getenv("MARKET_SNAPSHOT_MAX_AGE", "900"))  # Older data is not used
+MARKET_SNAPSHOT_IDLE_AFTER = float(os.getenv("MARKET_SNAPSHOT_IDLE_AFTER", "1800"))  # Stop refreshing without demand
+MARKET_SNAPSHOT_TIMEOUT = float(os.getenv("MARKET_SNAPSHOT_TIMEOUT", "30"))
+
+# CoinGecko tools refreshed into the snapshot, overridable as JSON with MARKET_SNAPSHOT_TOOLS
+DEFAULT_SNAPSHOT_TOOLS = {
+    "get_simple_price": {
+        "ids": "bitcoin,ethereum,internet-computer,solana,tether,usd-coin",
+        "vs_currencies": "usd",
+        "include_market_cap": True,
+        "include_24hr_change": True,
+    },
+    "get_search_trending": {},
+    "get_global": {},
+}
+MARKET_SNAPSHOT_TOOLS = json.loads(os.getenv("MARKET_SNAPSHOT_TOOLS") or "null") or DEFAULT_SNAPSHOT_TOOLS
+
+# Queries about topics the snapshot does not cover still go through tool selection
+MARKET_ADHOC_PATTERN = re.compile(os.getenv(
+    "MARKET_ADHOC_PATTERN",
+    r"\b(nfts?|exchanges?|derivatives?|futures|perps?|charts?|histor\w*|ohlc|on-?chain|categor\w*"
+    r"|contract|pools?|dex|airdrops?|launch\w*|since|last (week|month|year)|\d+\s*(d|days|weeks|months))\b"),
+    re.I)
+
+# Coins a query may name, by CoinGecko id, with the names and symbols users type.
+# Symbols that are common English words (dot, link, near, ton, uni, atom, apt) are left out.
+COIN_ALIASES = {
+    "bitcoin": ["bitcoin", "btc"],
+    "ethereum": ["ethereum", "ether", "eth"],
+    "internet-computer": ["internet computer", "icp"],
+    "solana": ["solana", "sol"],
+    "tether": ["tether", "usdt"],
+    "usd-coin": ["usd coin", "usdc"],
+    "ripple": ["ripple", "xrp"],
+    "binancecoin": ["binance coin", "bnb"],
+    "cardano": ["cardano", "ada"],
+    "dogecoin": ["dogecoin", "doge"],
+    "tron": ["tron", "trx"],
+    "polkadot": ["polkadot"],
+    "avalanche-2": ["avalanche", "avax"],
+    "chainlink": ["chainlink"],
+    "litecoin": ["litecoin", "ltc"],
+    "bitcoin-cash": ["bitcoin cash", "bch"],
+    "shiba-inu": ["shiba inu", "shib"],
+    "matic-network": ["polygon", "matic"],
+    "stellar": ["stellar", "xlm"],
+    "monero": ["monero", "xmr"],
+    "uniswap": ["uniswap"],
+    "cosmos": ["cosmos"],
+    "aptos": ["aptos"],
+    "arbitrum": ["arbitrum", "arb"],
+    "sui": ["sui"],
+    "pepe": ["pepe"],
+    "the-open-network": ["toncoin"],
+    "near": ["near protocol"],
+    "filecoin": ["filecoin", "fil"],
+    "hedera-hashgraph": ["hedera", "hbar"],
+    "dai": ["dai"],
+    "wrapped-bitcoin": ["wrapped bitcoin", "wbtc"],
+}
+
+# Quote currencies a query may name, by CoinGecko vs_currency
+CURRENCY_ALIASES = {
+    "usd": ["usd", "dollars?", "\\$"],
+    "eur": ["eur", "euros?", "€"],
+    "gbp": ["gbp", "pounds?", "sterling", "£"],
+    "jpy": ["jpy", "yen", "¥"],
+    "cny": ["cny", "yuan", "rmb"],
+    "krw": ["krw"],
+    "inr": ["inr", "rupees?", "₹"],
+    "aud": ["aud"],
+    "cad": ["cad"],
+    "chf": ["chf", "swiss francs?"],
+    "brl": ["brl", "reais"],
+    "sgd": ["sgd"],
+    "hkd": ["hkd"],
+}
+
+def _alias_pattern(aliases: list, boundary: str = r"[\w-]") -> re.Pattern:
+    # Lookarounds instead of \b so currency signs match too
+    return re.compile(rf"(?<!{boundary})(" + "|".join(aliases) + rf")(?!{boundary})", re.I)
+
+_COIN_PATTERNS = {coin: _alias_pattern([re.escape(a) for a in aliases]) for coin, aliases in COIN_ALIASES.items()}
+# Amounts sit right next to currencies, as in "$5" or "10eur"
+_CURRENCY_PATTERNS = {currency: _alias_pattern(aliases, r"[^\W\d_]")
+                      for currency, aliases in CURRENCY_ALIASES.items()}
+
+def mentioned_markets(query: str) -> tuple:
+    """Return the (coin ids, vs_currencies) a query names."""
+    coins = {coin for coin, pattern in _COIN_PATTERNS.items() if pattern.search(query)}
+    currencies = {currency for currency, pattern in _CURRENCY_PATTERNS.items() if pattern.search(query)}
+    # "bitcoin cash" alone does not name bitcoin
+    if "bitcoin-cash" in coins and not re.search(r"\bbitcoin\b(?! cash)", query, re.I):
+        coins.discard("bitcoin")
+    return coins, currencies
+
+def _csv(value) -> set:
+    items = value if isinstance(value, list) else str(value or "").split(",")
+    return {str(item).strip().lower() for item in items if str(item).strip()}
+
+class MarketSnapshot:
+    """Market data refreshed in the background while there is demand for it.
+
+    fetch(name, arguments) is awaited for each configured tool. Refreshes
+    only run while requests have called note_demand() within idle_after, so
+    an idle agent makes no CoinGecko calls; the first request after a quiet
+    period wakes the refresher and uses tool selection meanwhile. A failed
+    refresh keeps the previous value, which is dropped once it is older than
+    max_age.
+    """
+
+    def __init__(self, fetch, tools: dict = MARKET_SNAPSHOT_TOOLS,
+                 interval: float = MARKET_SNAPSHOT_INTERVAL, max_age: float = MARKET_SNAPSHOT_MAX_AGE,
+                 idle_after: float = MARKET_SNAPSHOT_IDLE_AFTER):
+        self.fetch = fetch
+        self.tools = tools
+        self.interval = interval
+        self.max_age = max_age
+        self.idle_after = idle_after
+        price_args = tools.get("get_simple_price", {})
+        self.coins = _csv(price_args.get("ids"))
+        self.currencies = _csv(price_args.get("vs_currencies"))
+        self._entries = {}  # tool name -> (fetched_at, result)
+        self._task = None
+        self._wake = None
+        self.last_demand = 0.0
+        self.refreshes = 0
+        self.failures = 0
+        self.served = 0
+
+    async def _refresh_one(self, name: str, arguments: dict):
+        try:
+            result = await asyncio.wait_for(self.fetch(name, dict(arguments)), timeout=MARKET_SNAPSHOT_TIMEOUT)
+            self._entries[name] = (time.time(), result)
+            self.refreshes += 1
+        except Exception as e:
+            self.failures += 1
+            logger.warning(f"Market snapshot refresh of {name} failed: {str(e)}")
+
+    async def refresh(self):
+        """Refresh every configured tool concurrently."""
+        await asyncio.gather(*[self._refresh_one(name, arguments) for name, arguments in self.tools.items()])
+
+    @property
+    def idle(self) -> bool:
+        return time.time() - self.last_demand > self.idle_after
+
+    def note_demand(self):
+        """Record that a request wanted market data, waking the refresher if it is idle."""
+        self.last_demand = time.time()
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _run(self):
+        while True:
+            if self.idle:
+                self._wake.clear()
+                await self._wake.wait()
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background refresher inside the running event loop."""
+        if self._task is None or self._task.done():
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def get(self) -> dict:
+        """Return {tool: (arguments, fetched_at ISO time, result)} if every tool is fresh, else None."""
+        now = time.time()
+        snapshot = {}
+        for name, arguments in self.tools.items():
+            entry = self._entries.get(name)
+            if entry is None or now - entry[0] > self.max_age:
+                return None
+            snapshot[name] = (arguments, datetime.fromtimestamp(entry[0], timezone.utc).isoformat(), entry[1])
+        self.served += 1
+        return snapshot
+
+    def covers(self, query: str) -> bool:
+        """Whether the snapshot alone is enough market context for a query.
+
+        False for topics the snapshot has no tool for, and for coins or
+        quote currencies outside its get_simple_price arguments.
+        """
+        query = query or ""
+        if MARKET_ADHOC_PATTERN.search(query):
+            return False
+        coins, currencies = mentioned_markets(query)
+        return coins <= self.coins and currencies <= self.currencies
+
+    def stats(self) -> dict:
+        now = time.time()
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "idle": self.idle,
+            "age_seconds": {name: round(now - entry[0], 1) for name, entry in self._entries.items()},
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "served": self.served,
+        }
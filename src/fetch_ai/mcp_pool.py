@@ -0,0 +1,180 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+
+logger = logging.getLogger(__name__)
+
+# Pool settings
+MCP_POOL_SIZE = int(os.getenv("MCP_POOL_SIZE", "4"))
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "20"))
+MCP_PING_INTERVAL = float(os.getenv("MCP_PING_INTERVAL", "30"))  # Idle seconds before a liveness ping
+MCP_PING_TIMEOUT = float(os.getenv("MCP_PING_TIMEOUT", "5"))
+MCP_RECONNECT_ATTEMPTS = int(os.getenv("MCP_RECONNECT_ATTEMPTS", "3"))
+MCP_RECONNECT_BACKOFF = float(os.getenv("MCP_RECONNECT_BACKOFF", "0.5"))
+MCP_RECONNECT_MAX_BACKOFF = float(os.getenv("MCP_RECONNECT_MAX_BACKOFF", "8"))
+
+class PooledSession:
+    """A long-lived MCP session owned by its own background task.
+
+    The SSE transport and ClientSession are entered and exited inside the
+    same task, as anyio requires, so the session can be checked out by any
+    request task in between.
+    """
+
+    def __init__(self, url: str, headers: dict):
+        self.url = url
+        self.headers = headers
+        self.session: ClientSession | None = None
+        self.last_verified = 0.0
+        self._ready = asyncio.Event()
+        self._closing = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._error: BaseException | None = None
+        self.generation = 0  # Pool generation it was checked out in
+
+    async def start(self, timeout: float = MCP_CONNECT_TIMEOUT):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.close()
+            raise
+        if self._error is not None:
+            raise self._error
+        self.last_verified = time.monotonic()
+
+    async def _run(self):
+        try:
+            async with AsyncExitStack() as stack:
+                read, write = await stack.enter_async_context(sse_client(self.url, headers=self.headers))
+                session = await stack.enter_async_context(ClientSession(read, write))
+                await session.initialize()
+                self.session = session
+                self._ready.set()
+                await self._closing.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self.session = None
+            self._ready.set()
+
+    @property
+    def alive(self) -> bool:
+        return self.session is not None and self._task is not None and not self._task.done()
+
+    async def verify(self) -> bool:
+        """Ping the server if the session has been idle long enough to go stale."""
+        if not self.alive:
+            return False
+        if time.monotonic() - self.last_verified < MCP_PING_INTERVAL:
+            return True
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=MCP_PING_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"MCP session failed liveness ping: {str(e)}")
+            return False
+        self.last_verified = time.monotonic()
+        return True
+
+    async def close(self):
+        self._closing.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=MCP_CONNECT_TIMEOUT)
+            except (asyncio.TimeoutError, asyncio.CancelledError):
+                self._task.cancel()
+
+class MCPSessionPool:
+    """Pool of warm MCP sessions with checkout/return semantics."""
+
+    def __init__(self, url: str, headers: dict, size: int = MCP_POOL_SIZE):
+        self.url = url
+        self.headers = headers
+        self.size = size
+        self._idle: deque[PooledSession] = deque()
+        self._slots = asyncio.Semaphore(size)
+        self._generation = 0  # Bumped by close(), so sessions out at the time are not pooled again
+        self.stats = {"created": 0, "reused": 0, "reconnects": 0, "discarded": 0}
+
+    async def _connect(self) -> PooledSession:
+        """Open a new session, retrying with jittered exponential backoff."""
+        delay = MCP_RECONNECT_BACKOFF
+        for attempt in range(1, MCP_RECONNECT_ATTEMPTS + 1):
+            conn = PooledSession(self.url, self.headers)
+            try:
+                await conn.start()
+                self.stats["created"] += 1
+                return conn
+            except Exception as e:
+                logger.warning(f"MCP connect attempt {attempt}/{MCP_RECONNECT_ATTEMPTS} failed: {str(e)}")
+                if attempt == MCP_RECONNECT_ATTEMPTS:
+                    raise
+                self.stats["reconnects"] += 1
+                await asyncio.sleep(delay + random.uniform(0, delay))
+                delay = min(delay * 2, MCP_RECONNECT_MAX_BACKOFF)
+
+    async def checkout(self) -> PooledSession:
+        await self._slots.acquire()
+        try:
+            conn = None
+            while self._idle:
+                candidate = self._idle.pop()
+                if await candidate.verify():
+                    self.stats["reused"] += 1
+                    conn = candidate
+                    break
+                self.stats["discarded"] += 1
+                await candidate.close()
+            if conn is None:
+                conn = await self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+        conn.generation = self._generation
+        return conn
+
+    async def checkin(self, conn: PooledSession, healthy: bool = True):
+        try:
+            if healthy and conn.alive and conn.generation == self._generation:
+                self._idle.append(conn)
+            else:
+                self.stats["discarded"] += 1
+                await conn.close()
+        finally:
+            self._slots.release()
+
+    @asynccontextmanager
+    async def session(self):
+        """Check out a warm ClientSession for the duration of the block."""
+        conn = await self.checkout()
+        try:
+            yield conn.session
+        except Exception:
+            # Force a liveness ping before this session is handed out again
+            conn.last_verified = 0.0
+            await self.checkin(conn, healthy=conn.alive)
+            raise
+        except BaseException:
+            await self.checkin(conn, healthy=False)
+            raise
+        else:
+            await self.checkin(conn)
+
+    async def close(self):
+        """Close every idle session; sessions checked out now are closed when they are returned.
+
+        The slots are left alone: each checked-out session still releases
+        its own slot on checkin, so the pool never exceeds its size.
+        """
+        self._generation += 1
+        while self._idle:
+            await self._idle.pop().close()
+
+    def status(self) -> dict:
+        return {"size": self.size, "idle": len(self._idle), **self.stats}
@@ -1,100 +1,212 @@
-import asyncio
-import nest_asyncio
-from mcp import ClientSession
-from mcp.client.sse import sse_client
-from openai import OpenAI
-nest_asyncio.apply()  
-import asyncio
-import json
-from contextlib import AsyncExitStack
-from typing import Any, Dict, List
-import nest_asyncio
-from dotenv import load_dotenv
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.sse import sse_client
-from openai import AsyncOpenAI
-nest_asyncio.apply()
-
-# Load environment variables
-load_dotenv()
-
-# Global variables to store session state
-session = None
-exit_stack = AsyncExitStack()
-openai_client = AsyncOpenAI()
-gpt_client = OpenAI()
-model = "gpt-5"
-
-
-import asyncio, os
-from contextlib import AsyncExitStack
-from mcp import ClientSession
-from mcp.client.sse import sse_client
-
-URL = "https://mcp.api.coingecko.com/sse"
-HEADERS = {"x-cg-demo-api-key": os.getenv("COINGECKO_API")}
-
-stack = AsyncExitStack()
-session: ClientSession | None = None
-
-async def connect():
-    global session
-    read, write = await stack.enter_async_context(sse_client(URL, headers=HEADERS))
-    session = await stack.enter_async_context(ClientSession(read, write))
-    await session.initialize()
-    return session
-
-async def close():
-    await stack.aclose()
-
-session = None
-tools = None
-async def main():
-    global session, tools
-    session = await connect()
-
-    tools = await session.list_tools()
-
-    price = await session.call_tool(
-        "get_simple_price",
-        {"ids": "bitcoin,ethereum", "vs_currencies": "usd"}
-    )
-
-    # 🔥 You can still reuse `session` later
-    price2 = await session.call_tool(
-        "get_simple_price",
-        {"ids": "dogecoin", "vs_currencies": "usd"}
-    )
-    await close()
-asyncio.run(main())
-
-coingecko_mcp_tools = [
-    {
-        "type": "function",
-        "function": {
-            "name": tool.name,
-            "description": tool.description,
-            "parameters": tool.inputSchema,
-        },
-    }
-    for tool in tools.tools
-]
-
-
-def gpt_response(messages):
-    response = gpt_client.responses.create(
-        model="gpt-5",
-        input=messages,
-        text={
-            "format": {
-            "type": "text"
-            },
-            "verbosity": "medium"
-        },
-        reasoning={
-            "effort": "medium"
-        },
-        tools=[],
-        store=True
-        )
-    return response.output[1].content[0].text
\ No newline at end of file
+import asyncio
+import json
+from typing import Any, Dict, List
+import nest_asyncio
+from dotenv import load_dotenv
+from gpt_client import GPT_MODEL, close_gpt_client, gpt_response, openai_client
+nest_asyncio.apply()
+
+# Load environment variables
+load_dotenv()
+
+# Model for the CoinGecko tool-selection call (shares the pooled openai_client)
+model = GPT_MODEL
+
+
+import logging, os, time
+from mcp_pool import MCP_CONNECT_TIMEOUT, MCPSessionPool
+from cache import SWRCache
+from price_batcher import PriceBatcher
+from market_snapshot import MarketSnapshot
+from resilience import TRANSIENT_STATUSES, CircuitBreaker
+import anyio
+import httpx
+
+logger = logging.getLogger(__name__)
+
+URL = "https://mcp.api.coingecko.com/sse"
+HEADERS = {"x-cg-demo-api-key": os.getenv("COINGECKO_API")}
+
+# Shared pool of warm CoinGecko MCP sessions
+coingecko_pool = MCPSessionPool(URL, HEADERS)
+
+# Transport failures that say CoinGecko is unhealthy: timeouts, connection errors and closed streams
+MCP_TRANSIENT_ERRORS = (asyncio.TimeoutError, ConnectionError, httpx.TransportError,
+                        anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+def is_transient_mcp_error(exc: BaseException) -> bool:
+    """Whether an MCP call failure is worth retrying and counts against CoinGecko's health.
+
+    MCP protocol errors, such as an unknown tool or invalid arguments the LLM
+    chose, and malformed results are the caller's problem, not the server's.
+    """
+    if isinstance(exc, BaseExceptionGroup):
+        return all(is_transient_mcp_error(e) for e in exc.exceptions)
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in TRANSIENT_STATUSES
+    return isinstance(exc, MCP_TRANSIENT_ERRORS)
+
+# Fails fast while CoinGecko is unreachable instead of waiting out connect and call timeouts
+coingecko_breaker = CircuitBreaker("CoinGecko", transient=is_transient_mcp_error)
+
+# Tool discovery cache, so agent start-up never waits on CoinGecko
+MCP_TOOLS_CACHE_PATH = os.getenv(
+    "MCP_TOOLS_CACHE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "coingecko_mcp_tools.json"))
+MCP_TOOLS_CACHE_TTL = float(os.getenv("MCP_TOOLS_CACHE_TTL", "86400"))
+MCP_TOOLS_REFRESH_TIMEOUT = float(os.getenv("MCP_TOOLS_REFRESH_TIMEOUT", str(MCP_CONNECT_TIMEOUT)))
+
+coingecko_mcp_tools = None
+coingecko_mcp_tools_fetched_at = 0.0
+_tools_refresh_task: asyncio.Task | None = None
+
+def _load_tools_cache():
+    """Load cached tool schemas from disk, returning (tools, fetched_at) or (None, 0)."""
+    try:
+        with open(MCP_TOOLS_CACHE_PATH, "r") as f:
+            cached = json.load(f)
+        return cached["tools"], cached["fetched_at"]
+    except (OSError, ValueError, KeyError):
+        return None, 0.0
+
+def _save_tools_cache(tools_: list, fetched_at: float):
+    os.makedirs(os.path.dirname(MCP_TOOLS_CACHE_PATH), exist_ok=True)
+    tmp_path = f"{MCP_TOOLS_CACHE_PATH}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"fetched_at": fetched_at, "tools": tools_}, f)
+    os.replace(tmp_path, MCP_TOOLS_CACHE_PATH)
+
+async def refresh_coingecko_mcp_tools() -> list:
+    """Fetch tool schemas from the CoinGecko MCP server and update both caches."""
+    global coingecko_mcp_tools, coingecko_mcp_tools_fetched_at
+    async def list_tools():
+        async with coingecko_pool.session() as session:
+            return await session.list_tools()
+
+    async def attempt(attempt_timeout: float):
+        # A hung list_tools would otherwise pin _tools_refresh_task and block every later refresh
+        return await asyncio.wait_for(list_tools(), timeout=attempt_timeout)
+
+    tools = await coingecko_breaker.call(attempt, MCP_TOOLS_REFRESH_TIMEOUT, retry=False)
+
+    coingecko_mcp_tools = [
+        {
+            "type": "function",
+            "function": {
+                "name": tool.name,
+                "description": tool.description,
+                "parameters": tool.inputSchema,
+            },
+        }
+        for tool in tools.tools
+    ]
+    coingecko_mcp_tools_fetched_at = time.time()
+    try:
+        _save_tools_cache(coingecko_mcp_tools, coingecko_mcp_tools_fetched_at)
+    except OSError as e:
+        logger.warning(f"Could not write MCP tools cache: {str(e)}")
+    return coingecko_mcp_tools
+
+async def _background_refresh():
+    try:
+        await refresh_coingecko_mcp_tools()
+    except Exception as e:
+        logger.warning(f"Background MCP tools refresh failed: {str(e)}")
+
+def schedule_tools_refresh():
+    """Refresh the tool schemas in the background unless a refresh is running."""
+    global _tools_refresh_task
+    if _tools_refresh_task is None or _tools_refresh_task.done():
+        _tools_refresh_task = asyncio.create_task(_background_refresh())
+
+async def get_coingecko_mcp_tools() -> list:
+    """Return CoinGecko tool schemas, discovering them lazily.
+
+    Uses the in-memory copy, then the on-disk cache, and only waits on the
+    network when neither exists. Stale schemas are served while a background
+    refresh runs.
+    """
+    warm_coingecko_mcp_tools()
+    if coingecko_mcp_tools is None:
+        # First use with no cache: wait for the discovery already in flight
+        await asyncio.shield(_tools_refresh_task)
+        if coingecko_mcp_tools is None:
+            raise RuntimeError("CoinGecko MCP tools are unavailable")
+    return coingecko_mcp_tools
+
+def warm_coingecko_mcp_tools():
+    """Load cached tool schemas and refresh them in the background if missing or stale."""
+    global coingecko_mcp_tools, coingecko_mcp_tools_fetched_at
+    if coingecko_mcp_tools is None:
+        coingecko_mcp_tools, coingecko_mcp_tools_fetched_at = _load_tools_cache()
+    if coingecko_mcp_tools is None or time.time() - coingecko_mcp_tools_fetched_at > MCP_TOOLS_CACHE_TTL:
+        schedule_tools_refresh()
+
+# Tool result cache keyed by tool name plus canonical arguments, TTLs in seconds
+COINGECKO_CACHE_TTLS = {
+    "get_simple_price": float(os.getenv("CACHE_TTL_COINGECKO_PRICE", "30")),
+    "get_coins_markets": float(os.getenv("CACHE_TTL_COINGECKO_MARKETS", "60")),
+    "get_search_trending": float(os.getenv("CACHE_TTL_COINGECKO_TRENDING", "300")),
+    "get_global": float(os.getenv("CACHE_TTL_COINGECKO_GLOBAL", "300")),
+}
+coingecko_cache = SWRCache(
+    default_ttl=float(os.getenv("CACHE_TTL_COINGECKO_DEFAULT", "120")),
+    ttls=COINGECKO_CACHE_TTLS,
+    stale_ttl=0,
+    max_entries=int(os.getenv("CACHE_MAX_COINGECKO_ENTRIES", "1000")))
+
+# Arguments holding comma-separated lists whose order and duplicates don't matter
+LIST_ARGUMENTS = {"ids", "vs_currencies", "symbols", "names", "contract_addresses"}
+
+def normalize_tool_arguments(arguments: dict) -> dict:
+    """Canonicalize list-like arguments: lower-cased, de-duplicated and sorted."""
+    normalized = {}
+    for key, value in arguments.items():
+        if key in LIST_ARGUMENTS and isinstance(value, str):
+            items = {item.strip().lower() for item in value.split(",") if item.strip()}
+            value = ",".join(sorted(items))
+        elif key in LIST_ARGUMENTS and isinstance(value, list):
+            value = sorted({str(item).strip().lower() for item in value})
+        normalized[key] = value
+    return normalized
+
+def coingecko_cache_key(name: str, arguments: dict) -> tuple:
+    return (name, json.dumps(arguments, sort_keys=True))
+
+async def call_coingecko_tool(name: str, arguments: dict, timeout: float = 500):
+    """Call a CoinGecko MCP tool through the result cache and return the parsed result."""
+    arguments = normalize_tool_arguments(arguments)
+    key = coingecko_cache_key(name, arguments)
+
+    async def fetch():
+        if name == "get_simple_price":
+            return await asyncio.wait_for(price_batcher.get_simple_price(arguments, timeout), timeout=timeout)
+        return await _call_mcp_tool(name, arguments, timeout)
+
+    return await coingecko_cache.get_or_fetch(key, fetch)
+
+async def _call_mcp_tool(name: str, arguments: dict, timeout: float = 500):
+    """Call a CoinGecko MCP tool on a pooled session and parse its JSON result, retrying transient failures."""
+    async def call_tool():
+        async with coingecko_pool.session() as session:
+            return await session.call_tool(name, arguments=arguments)
+
+    async def attempt(attempt_timeout: float):
+        # The timeout covers checking out a session too, so a dead server can't hold the call in reconnects
+        return await asyncio.wait_for(call_tool(), timeout=attempt_timeout)
+
+    result = await coingecko_breaker.call(attempt, timeout)
+    return json.loads(result.content[0].text)
+
+# Concurrent get_simple_price calls are merged into one upstream call per window
+price_batcher = PriceBatcher(lambda arguments, timeout: _call_mcp_tool("get_simple_price", arguments, timeout))
+
+async def refresh_coingecko_tool(name: str, arguments: dict):
+    """Fetch a CoinGecko tool fresh and store it in the result cache."""
+    arguments = normalize_tool_arguments(arguments)
+    result = await _call_mcp_tool(name, arguments)
+    coingecko_cache.set(coingecko_cache_key(name, arguments), result)
+    return result
+
+# Market data recommendations use without a tool-selection round trip
+market_snapshot = MarketSnapshot(refresh_coingecko_tool)
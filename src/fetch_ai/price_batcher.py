@@ -0,0 +1,131 @@
+import asyncio
+import json
+import os
+import time
+
+# Batching settings
+PRICE_BATCH_WINDOW = float(os.getenv("PRICE_BATCH_WINDOW_MS", "50")) / 1000
+PRICE_BATCH_MAX_IDS = int(os.getenv("PRICE_BATCH_MAX_IDS", "250"))
+PRICE_BATCH_TIMEOUT = float(os.getenv("PRICE_BATCH_TIMEOUT", "30"))  # Upper bound on one upstream batch call
+
+def _field_currency(field: str, vs_currencies: set):
+    """Currency a price field belongs to ("usd_market_cap" -> "usd"), or None for shared fields."""
+    for vs in vs_currencies:
+        if field == vs or field.startswith(f"{vs}_"):
+            return vs
+    return None
+
+def _split_list(value) -> list:
+    """Items of a list argument given as a comma-separated string or a list."""
+    items = value if isinstance(value, list) else (value or "").split(",")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+class _PendingBatch:
+    def __init__(self, extra_args: dict):
+        self.extra_args = extra_args
+        self.ids = set()
+        self.vs_currencies = set()
+        self.waiters = []  # (ids, vs_currencies, future)
+        self.deadline = 0.0  # Latest monotonic deadline among the waiters
+        self.flush_handle: asyncio.TimerHandle | None = None
+
+class PriceBatcher:
+    """Micro-batches concurrent get_simple_price calls.
+
+    Requests arriving within one window are merged into a single call over
+    the union of ids and vs_currencies; each caller gets back only its own
+    slice. Requests with different extra arguments (e.g. include_market_cap)
+    are batched separately.
+
+    The upstream call is bounded by the latest deadline among its waiters,
+    so it never outlives everyone waiting on it, and by max_timeout.
+    Waiters are always resolved, even if the flush itself is cancelled.
+    """
+
+    def __init__(self, fetch, window: float = PRICE_BATCH_WINDOW, max_ids: int = PRICE_BATCH_MAX_IDS,
+                 max_timeout: float = PRICE_BATCH_TIMEOUT):
+        self.fetch = fetch  # async (arguments: dict, timeout: float) -> dict
+        self.window = window
+        self.max_ids = max_ids
+        self.max_timeout = max_timeout
+        self._pending = {}  # extra args key -> _PendingBatch
+        self._flushes = set()  # Running flush tasks, referenced until they finish
+        self.requests = 0
+        self.upstream_calls = 0
+
+    async def get_simple_price(self, arguments: dict, timeout: float = None) -> dict:
+        """Price the given ids, sharing one upstream call with concurrent callers.
+
+        timeout is how long this caller will wait; the batch call is given at
+        least that long, up to max_timeout.
+        """
+        ids = _split_list(arguments.get("ids"))
+        vs_currencies = _split_list(arguments.get("vs_currencies"))
+        extra_args = {k: v for k, v in arguments.items() if k not in ("ids", "vs_currencies")}
+        batch_key = json.dumps(extra_args, sort_keys=True)
+
+        batch = self._pending.get(batch_key)
+        if batch is None:
+            batch = _PendingBatch(extra_args)
+            self._pending[batch_key] = batch
+            batch.flush_handle = asyncio.get_running_loop().call_later(
+                self.window, self._schedule_flush, batch_key, batch)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.ids.update(ids)
+        batch.vs_currencies.update(vs_currencies)
+        batch.waiters.append((ids, vs_currencies, future))
+        batch.deadline = max(batch.deadline, time.monotonic() + min(timeout or self.max_timeout, self.max_timeout))
+        self.requests += 1
+
+        if len(batch.ids) >= self.max_ids:
+            batch.flush_handle.cancel()
+            self._schedule_flush(batch_key, batch)
+
+        return await future
+
+    def _schedule_flush(self, batch_key: str, batch: _PendingBatch):
+        if self._pending.get(batch_key) is batch:
+            del self._pending[batch_key]
+            task = asyncio.create_task(self._flush(batch))
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self, batch: _PendingBatch):
+        self.upstream_calls += 1
+        arguments = {
+            "ids": ",".join(sorted(batch.ids)),
+            "vs_currencies": ",".join(sorted(batch.vs_currencies)),
+            **batch.extra_args,
+        }
+        try:
+            timeout = max(batch.deadline - time.monotonic(), 0.0)
+            result = await asyncio.wait_for(self.fetch(arguments, timeout), timeout=timeout)
+        except Exception as e:
+            for _, _, future in batch.waiters:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        except BaseException:
+            # Cancelled, e.g. at shutdown: never leave a waiter hanging
+            for _, _, future in batch.waiters:
+                future.cancel()
+            raise
+
+        for ids, vs_currencies, future in batch.waiters:
+            if future.done():
+                continue
+            future.set_result({
+                coin_id: {
+                    field: value for field, value in result[coin_id].items()
+                    if _field_currency(field, batch.vs_currencies) in (None, *vs_currencies)
+                }
+                for coin_id in ids if coin_id in result
+            })
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.upstream_calls,
+            "pending_batches": len(self._pending),
+        }
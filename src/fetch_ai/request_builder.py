@@ -0,0 +1,62 @@
+import json
+
+# Compact, deterministic encoder so identical inputs always produce identical bytes
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+# Streamed requests ask for token usage, sent in a final chunk with no choices
+STREAM_OPTIONS = {"stream": True, "stream_options": {"include_usage": True}}
+
+# Running totals of provider-reported prompt caching
+prompt_cache_stats = {"requests": 0, "requests_with_usage": 0, "prompt_tokens": 0,
+                      "cached_tokens": 0, "cache_hits": 0}
+
+def encode_messages(messages: list) -> bytes:
+    """Serialize messages once into a fragment that RequestTemplate.build can splice in."""
+    return b"".join(b"," + _encode(message).encode("utf-8") for message in messages)
+
+class RequestTemplate:
+    """Chat completion request whose static prefix is serialized once.
+
+    The body always starts with the same bytes: model settings, the tool
+    schemas and the static system message. Per-user context, history and
+    the query are spliced in after it, so the provider sees a byte-stable
+    prompt prefix it can cache across requests and users.
+    """
+
+    def __init__(self, model: str, system_prompt: str, tools: list = None,
+                 temperature: float = 0.7, max_tokens: int = 1024, stream: bool = False):
+        head = {"model": model, "temperature": temperature, "max_tokens": max_tokens}
+        if stream:
+            head.update(STREAM_OPTIONS)
+        if tools:
+            head["tools"] = tools
+        self.tool_names = [tool["function"]["name"] for tool in tools or []]
+        system_message = {"role": "system", "content": system_prompt}
+        self._head = (_encode(head)[:-1] + ',"messages":[' + _encode(system_message)).encode("utf-8")
+        self.prefix_bytes = len(self._head)
+
+    def build(self, *fragments: bytes) -> bytes:
+        """Return the request body with pre-encoded message fragments after the prefix."""
+        return b"".join((self._head, *fragments, b"]}"))
+
+def record_usage(response_json: dict):
+    """Track prompt cache usage when the provider reports it."""
+    prompt_cache_stats["requests"] += 1
+    usage = response_json.get("usage") or {}
+    if not usage:
+        return
+    prompt_cache_stats["requests_with_usage"] += 1
+    prompt_cache_stats["prompt_tokens"] += usage.get("prompt_tokens") or 0
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    prompt_cache_stats["cached_tokens"] += cached
+    if cached:
+        prompt_cache_stats["cache_hits"] += 1
+
+def get_prompt_cache_stats() -> dict:
+    reported = prompt_cache_stats["requests_with_usage"]
+    return {
+        **prompt_cache_stats,
+        "hit_rate": round(prompt_cache_stats["cache_hits"] / reported, 4) if reported else 0.0,
+        "cached_token_rate": round(prompt_cache_stats["cached_tokens"] / prompt_cache_stats["prompt_tokens"], 4)
+        if prompt_cache_stats["prompt_tokens"] else 0.0,
+    }
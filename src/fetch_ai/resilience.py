@@ -0,0 +1,168 @@
+import asyncio
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
+import aiohttp
+
+# Retry settings for idempotent reads
+RETRY_ATTEMPTS = int(os.getenv("RETRY_ATTEMPTS", "3"))  # Total attempts, including the first
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "8"))
+
+# Circuit breaker settings
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))  # Consecutive failures that open it
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))  # Seconds open before a half-open probe
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Statuses worth retrying: throttling and server-side failures
+TRANSIENT_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class CircuitOpen(Exception):
+    """A dependency's breaker is open, so the call failed fast."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is temporarily unavailable (circuit open, retry in {retry_after:.0f}s)")
+        self.name = name
+        self.retry_after = retry_after
+
+def _status(exc: BaseException):
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status
+    return getattr(exc, "status", None)
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether a failure is worth retrying and counts against the dependency's health."""
+    status = _status(exc)
+    if status is not None:
+        return status in TRANSIENT_STATUSES
+    return isinstance(exc, (asyncio.TimeoutError, aiohttp.ClientConnectionError, ConnectionError))
+
+def parse_retry_after(value) -> float:
+    """Seconds from a Retry-After header given as delta-seconds or an HTTP date, or None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+def retry_after_of(exc: BaseException):
+    """Retry-After carried by an HTTP error, in seconds, or None."""
+    retry_after = getattr(exc, "retry_after", None)
+    if retry_after is not None:
+        return retry_after
+    headers = getattr(exc, "headers", None) or {}
+    return parse_retry_after(headers.get("Retry-After"))
+
+class CircuitBreaker:
+    """Per-dependency circuit breaker with retries for idempotent reads.
+
+    Closed: calls pass through and consecutive transient failures are
+    counted. Open: calls fail fast with CircuitOpen until the reset timeout
+    passes. Half-open: a single probe call is let through; success closes
+    the breaker and failure opens it again. Errors that transient(exc)
+    rejects, such as a 400, say nothing about the dependency's health and
+    reset the count.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT, attempts: int = RETRY_ATTEMPTS,
+                 base_delay: float = RETRY_BASE_DELAY, max_delay: float = RETRY_MAX_DELAY,
+                 transient=is_transient):
+        self.name = name
+        self.transient = transient
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.counters = {"calls": 0, "retries": 0, "failures": 0, "short_circuited": 0, "opened": 0}
+
+    @property
+    def available(self) -> bool:
+        """False while open and not yet due for a probe, so callers can skip the dependency."""
+        return self.state != OPEN or time.monotonic() - self.opened_at >= self.reset_timeout
+
+    def _before_call(self):
+        if self.state == OPEN:
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                self.counters["short_circuited"] += 1
+                raise CircuitOpen(self.name, self.reset_timeout - waited)
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.counters["short_circuited"] += 1
+                raise CircuitOpen(self.name, self.reset_timeout)
+            self._probing = True
+
+    def _record(self, exc: BaseException = None):
+        self._probing = False
+        if exc is None or not self.transient(exc):
+            self.state = CLOSED
+            self.failures = 0
+            return
+        self.failures += 1
+        self.counters["failures"] += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.counters["opened"] += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        """Full-jitter exponential delay, or the server's Retry-After capped at the max delay."""
+        retry_after = retry_after_of(exc)
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.base_delay * 2 ** attempt, self.max_delay))
+
+    async def call(self, fn, timeout: float = None, retry: bool = True):
+        """Await fn(attempt_timeout) through the breaker, retrying transient failures.
+
+        timeout is the budget for all attempts together: each attempt gets
+        what is left of it, and a retry is skipped if its backoff would not
+        fit. Only pass retry=True for idempotent reads.
+        """
+        started = time.monotonic()
+        attempts = self.attempts if retry else 1
+        for attempt in range(attempts):
+            remaining = None if timeout is None else timeout - (time.monotonic() - started)
+            self._before_call()
+            self.counters["calls"] += 1
+            try:
+                result = await fn(remaining)
+            except asyncio.CancelledError:
+                self._probing = False
+                raise
+            except Exception as e:
+                self._record(e)
+                if attempt + 1 >= attempts or not self.transient(e) or self.state == OPEN:
+                    raise
+                delay = self._backoff(attempt, e)
+                if timeout is not None and time.monotonic() - started + delay >= timeout:
+                    raise
+                self.counters["retries"] += 1
+                await asyncio.sleep(delay)
+            else:
+                self._record()
+                return result
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.failures,
+            **self.counters,
+        }
@@ -0,0 +1,152 @@
+import os
+import time
+from collections import OrderedDict, deque
+from itertools import islice
+
+# Session store settings
+MAX_SESSIONS = int(os.getenv("MAX_SESSIONS", "10000"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "21600"))  # Seconds before an idle session is evicted
+MAX_MEMORY_MESSAGES = int(os.getenv("MAX_MEMORY_MESSAGES", "50"))  # Maximum messages to keep in memory per session
+MAX_MEMORY_TOTAL_MESSAGES = int(os.getenv("MAX_MEMORY_TOTAL_MESSAGES", "500000"))  # Across all in-memory sessions
+
+class Session:
+    """Conversation state for one chat session."""
+
+    __slots__ = ("history", "principal", "last_access", "content_bytes", "summary", "summary_until")
+
+    def __init__(self, max_messages: int):
+        self.history = deque(maxlen=max_messages)  # Ring buffer, O(1) append and trim
+        self.principal = None
+        self.last_access = time.monotonic()
+        self.content_bytes = 0
+        self.summary = ""  # Rolling summary of turns folded out of the prompt window
+        self.summary_until = ""  # Timestamp of the newest message folded into the summary
+
+class SessionStore:
+    """Bounded session store with LRU and idle-TTL eviction.
+
+    on_evict(session_id), if given, is called for every evicted session so
+    state derived from it can be dropped too. retain(session_id), if given,
+    keeps a session that would be evicted, e.g. while its writes are still
+    being persisted elsewhere. on_trim(session_id, message), if given, is
+    called with each message dropped to keep a session within max_messages.
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_ttl: float = SESSION_IDLE_TTL,
+                 max_messages: int = MAX_MEMORY_MESSAGES, on_evict=None, retain=None, on_trim=None):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_messages = max_messages
+        self.on_evict = on_evict
+        self.retain = retain
+        self.on_trim = on_trim
+        self._sessions = OrderedDict()  # session_id -> Session, least recently used first
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    def _evict(self):
+        now = time.monotonic()
+        candidates = len(self._sessions)  # Bounds the scan when retained sessions are skipped
+        while self._sessions and candidates > 0:
+            session_id, oldest = next(iter(self._sessions.items()))
+            idle = now - oldest.last_access > self.idle_ttl
+            if not idle and len(self._sessions) <= self.max_sessions:
+                break
+            candidates -= 1
+            if self.retain is not None and self.retain(session_id):
+                self._sessions.move_to_end(session_id)
+                continue
+            del self._sessions[session_id]
+            self._evicted(session_id)
+            if idle:
+                self.evicted_idle += 1
+            else:
+                self.evicted_lru += 1
+
+    def _evicted(self, session_id: str):
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def get(self, session_id: str, create: bool = False) -> Session:
+        """Return the session, refreshing its LRU position, or None if absent."""
+        session = self._sessions.get(session_id)
+        if session is None and create:
+            session = Session(self.max_messages)
+            self._sessions[session_id] = session
+        if session is not None:
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        self._evict()
+        return session
+
+    def discard(self, session_id: str):
+        """Forget a session without counting it as an eviction."""
+        self._sessions.pop(session_id, None)
+
+    def add_message(self, session_id: str, message: dict):
+        session = self.get(session_id, create=True)
+        trimmed = None
+        if len(session.history) == session.history.maxlen:
+            trimmed = session.history[0]
+            session.content_bytes -= len(trimmed["content"] or "")
+        session.history.append(message)
+        session.content_bytes += len(message["content"] or "")
+        if trimmed is not None and self.on_trim is not None:
+            self.on_trim(session_id, trimmed)
+
+    def get_history(self, session_id: str, limit: int = None) -> list:
+        session = self.get(session_id)
+        if session is None:
+            return []
+        if not limit:
+            return list(session.history)
+        return list(islice(session.history, max(len(session.history) - limit, 0), None))
+
+    def clear_history(self, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or not session.history:
+            return False
+        session.history.clear()
+        session.content_bytes = 0
+        session.summary = ""
+        session.summary_until = ""
+        return True
+
+    def get_principal(self, session_id: str) -> str:
+        session = self.get(session_id)
+        return session.principal if session is not None else None
+
+    def set_principal(self, session_id: str, user_principal: str):
+        self.get(session_id, create=True).principal = user_principal
+
+    def clear_principal(self, session_id: str) -> bool:
+        session = self._sessions.get(session_id)
+        if session is None or session.principal is None:
+            return False
+        session.principal = None
+        return True
+
+    def get_summary(self, session_id: str) -> tuple:
+        """Return (summary, summary_until) for the session."""
+        session = self.get(session_id)
+        return (session.summary, session.summary_until) if session is not None else ("", "")
+
+    def set_summary(self, session_id: str, summary: str, summary_until: str):
+        session = self.get(session_id, create=True)
+        session.summary = summary
+        session.summary_until = summary_until
+
+    def close(self):
+        """Nothing to flush for the in-memory store."""
+
+    def stats(self) -> dict:
+        self._evict()
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "messages": sum(len(session.history) for session in self._sessions.values()),
+            "content_bytes": sum(session.content_bytes for session in self._sessions.values()),
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+        }
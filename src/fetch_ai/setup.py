@@ -1,4 +1,3 @@
-import requests
 import json
 import os
 from dotenv import load_dotenv
@@ -14,6 +13,31 @@ from datetime import datetime, timezone
 from uuid import uuid4
 from mcp_setup import *
 from prompt_template import *
+from canister_client import (
+    call_canister, canister_breaker, close_canister_client, fetch_user_snapshot,
+    invalidate_user_portfolio, invalidate_vault_cache, portfolio_cache, vault_cache, PORTFOLIO_SNAPSHOT_FUNCTIONS)
+from compaction import compact_result, get_compaction_stats
+from cache import SWRCache
+from session_store import MAX_MEMORY_MESSAGES, MAX_MEMORY_TOTAL_MESSAGES, MAX_SESSIONS, SessionStore
+from context_builder import CONTEXT_TOKEN_BUDGET, build_history_context, fold_trimmed_message
+from history_index import HISTORY_INDEX_MAX_MESSAGES, HistoryIndex
+from sqlite_store import MEMORY_HOT_SESSIONS, SQLiteSessionStore
+from asi1_client import (
+    ASI1_API_KEY, ASI1_TIMEOUT, ASI1Error, asi1_breaker, chat_completion, close_asi1_client, stream_chat_completion,
+    stream_chat_message,
+)
+from resilience import CircuitOpen
+from stream_server import CHAT_STREAM_PORT, start_stream_server
+from job_queue import JobQueue, current_job
+from admission import (
+    BUSY_MESSAGE, PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, AdmissionController, AdmissionRejected,
+)
+from deadline import CHAT_DEADLINE, DEADLINE_GRACE, FINAL_ANSWER_RESERVE, JOB_DEADLINE, Deadline
+from request_builder import RequestTemplate, encode_messages, get_prompt_cache_stats, record_usage
+from intent_router import format_template, get_router_stats, match_intent, record_initial_call, route_query
+from tool_selection import (
+    ADMIN_GROUPS, INTENT_PATTERNS, PUBLIC_GROUPS, USER_GROUPS,
+    get_tool_selection_stats, select_tool_groups, tools_for_groups)
 import logging
 import time
 import asyncio
@@ -32,6 +56,8 @@ class ChatResponse(Model):
     response: str
     timestamp: str
     session_id: str
+    status: str = "ok"  # "busy" when the request was shed by admission control
+    retry_after: int = None
 
 class ClearMemoryRequest(Model):
     session_id: str = "web_session"
@@ -41,40 +67,86 @@ class ClearMemoryResponse(Model):
     message: str
     timestamp: str
 
+class InvalidatePortfolioRequest(Model):
+    session_id: str  # Chat session the principal is bound to
+    user_principal: str
+
+class InvalidatePortfolioResponse(Model):
+    success: bool
+    message: str
+    timestamp: str
+
+class InvalidateVaultRequest(Model):
+    session_id: str  # Chat session bound to an admin principal
+    func_name: str = None  # e.g. "get_active_products"; every vault entry when omitted
+
+class InvalidateVaultResponse(Model):
+    success: bool
+    message: str
+    timestamp: str
+
+class JobSubmitRequest(Model):
+    message: str
+    session_id: str = "web_session"
+    user_principal: str = None
+
+class JobSubmitResponse(Model):
+    success: bool
+    job_id: str = None
+    status: str
+    deduplicated: bool = False
+    message: str
+    timestamp: str
+
+class JobRequest(Model):
+    job_id: str
+
+class JobStatusResponse(Model):
+    job_id: str
+    status: str
+    partial: str = None  # Recommendation text written so far, while the job runs
+    error: str = None
+    created_at: float = None
+    started_at: float = None
+    finished_at: float = None
+    timestamp: str
+
+class JobResultResponse(Model):
+    job_id: str
+    status: str
+    response: str = None
+    error: str = None
+    timestamp: str
+
 class HealthResponse(Model):
     status: str
     service: str
     timestamp: str
 
+class StatsResponse(Model):
+    stats: dict
+    timestamp: str
+
 class InfoResponse(Model):
     name: str
     port: int
     endpoints: list
     description: str
 
-# ASI1 API settings
-ASI1_API_KEY = os.getenv("ASI1_API_KEY")
-ASI1_BASE_URL = "https://api.asi1.ai/v1"
-
-if not ASI1_API_KEY:
-    print("⚠️  WARNING: ASI1_API_KEY not found in environment variables!")
-    print("   Please add your ASI1 API key to the .env file:")
-    print("   ASI1_API_KEY=your_api_key_here")
-    print("   The agent will return helpful error messages until configured.")
+CANISTER_ID = os.getenv("CANISTER_ID_VAULT_APP0_BACKEND")
 
-ASI1_HEADERS = {
-    "Authorization": f"Bearer {ASI1_API_KEY}" if ASI1_API_KEY else "Bearer missing_key",
-    "Content-Type": "application/json"
+# Tool execution settings
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))  # Max tool calls running at once per LLM turn
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "60"))
+TOOL_TIMEOUTS = {
+    "get_analysis_and_recommendation": float(os.getenv("TOOL_TIMEOUT_RECOMMENDATION", "500")),
 }
 
-CANISTER_ID = os.getenv("CANISTER_ID_VAULT_APP0_BACKEND")
-BASE_URL = os.getenv("VAULT_APP0_BACKEND_URL") or "http://127.0.0.1:4943"
+# Reasoning effort for the GPT recommendation response
+RECOMMENDATION_REASONING_EFFORT = os.getenv("RECOMMENDATION_REASONING_EFFORT", "medium")
 
-HEADERS = {
-    # Add host in development environment
-    # "Host": f"{CANISTER_ID}.localhost",
-    "Content-Type": "application/json"
-}
+# Token cap for each CoinGecko result passed to the recommendation model
+COINGECKO_RESULT_MAX_TOKENS = int(os.getenv("COINGECKO_RESULT_MAX_TOKENS", "1500"))
 
 # Function definitions for ASI1 function calling
 tools = [
@@ -270,83 +342,114 @@ tools = [
     }
 ]
 
-async def call_icp_endpoint(func_name: str, args: dict):
-    # ========== VAULT FUNCTIONS ==========
-    
-    # Token and Balance Functions
-    if func_name == "get_user_balance":
-        url = f"{BASE_URL}/balance"
-        response = requests.post(url, headers=HEADERS, json={"owner": args["user_principal"]})
-    
-    # Vault Information Functions
-    elif func_name == "get_vault_info":
-        url = f"{BASE_URL}/vault-info"
-        response = requests.post(url, headers=HEADERS, json={})
-    elif func_name == "get_active_products":
-        url = f"{BASE_URL}/products"
-        response = requests.post(url, headers=HEADERS, json={})
-    elif func_name == "get_investment_instruments":
-        url = f"{BASE_URL}/get-investment-instruments"
-        response = requests.post(url, headers=HEADERS, json={})
-    
-    # User Portfolio Functions
-    elif func_name == "get_user_vault_entries":
-        url = f"{BASE_URL}/user-vault-entries"
-        response = requests.post(url, headers=HEADERS, json={"user": args["user_principal"]})
-    elif func_name == "get_user_investment_report":
-        url = f"{BASE_URL}/user-investment-report"
-        response = requests.post(url, headers=HEADERS, json={"user": args["user_principal"]})
-    elif func_name == "get_unclaimed_dividends":
-        url = f"{BASE_URL}/unclaimed-dividends"
-        response = requests.post(url, headers=HEADERS, json={"user": args["user_principal"]})
+# Static system prompt; per-user context is sent as a separate message after it
+SYSTEM_PROMPT = """You are a helpful AI assistant for an ICP vault system that manages USDX token investments. 
+            
+You can help users with:
+- 📊 Vault information (vault status, investment products, available instruments)
+- 💰 User portfolio management (balances, vault entries, investment reports, dividends)
+- 👑 Admin functions (for authorized administrators only)
+
+When users ask for specific data, use the available tools to fetch real information from the vault system.
+When users ask general questions or need help understanding the system, provide helpful explanations without using tools.
+
+You have access to previous conversation history to maintain context. Reference past interactions when relevant to provide better, more personalized responses.
+
+Special commands:
+- '/clear', '/clear memory', '/reset', or '/new session' - Clear conversation memory
+- '/set principal <principal-id>' - Set your ICP principal for personalized queries
+- '/clear principal' or '/remove principal' - Remove your stored principal
+- '/show principal' or '/my principal' - Display your current stored principal
+
+Always be friendly, helpful, and clear in your responses."""
+
+# ASI1 request prefixes, serialized once per tool set
+INITIAL_REQUESTS = {}
+FINAL_REQUEST = RequestTemplate("asi1-mini", SYSTEM_PROMPT)
+FINAL_STREAM_REQUEST = RequestTemplate("asi1-mini", SYSTEM_PROMPT, stream=True)
+
+def get_initial_request(groups: tuple, stream: bool = False) -> RequestTemplate:
+    """Return the pre-serialized initial request for a tool set."""
+    template = INITIAL_REQUESTS.get((groups, stream))
+    if template is None:
+        template = RequestTemplate("asi1-mini", SYSTEM_PROMPT, tools_for_groups(tools, groups), stream=stream)
+        INITIAL_REQUESTS[(groups, stream)] = template
+    return template
+
+for _groups in (PUBLIC_GROUPS, USER_GROUPS, ADMIN_GROUPS):
+    get_initial_request(_groups)
+    get_initial_request(_groups, stream=True)
+
+async def call_icp_endpoint(func_name: str, args: dict, deadline: Deadline = None, on_delta=None):
+    """Run one tool; on_delta(text), if given, receives the recommendation text as GPT writes it."""
+    deadline = deadline or Deadline(TOOL_TIMEOUTS.get(func_name, TOOL_TIMEOUT))
 
     # Recommendation Functions
-    elif func_name == "get_analysis_and_recommendation":
-        # GET USER DATA
-        payload_user_data = []
-        url = f"{BASE_URL}/balance"
-        payload_user_data.append(requests.post(url, headers=HEADERS, json={"owner": args["user_principal"]}).json())
-        url = f"{BASE_URL}/user-vault-entries"
-        payload_user_data.append(requests.post(url, headers=HEADERS, json={"user": args["user_principal"]}).json())
-        url = f"{BASE_URL}/user-investment-report"
-        payload_user_data.append(requests.post(url, headers=HEADERS, json={"user": args["user_principal"]}).json())
-        url = f"{BASE_URL}/unclaimed-dividends"
-        payload_user_data.append(requests.post(url, headers=HEADERS, json={"user": args["user_principal"]}).json())
-
-        # CHOOSE FUNCTION CALL
-        user_prompt = f"""
+    if func_name == "get_analysis_and_recommendation":
+        # GET USER DATA (portfolio snapshot, fetched concurrently)
+        payload_user_data = await fetch_user_snapshot(
+            args["user_principal"], timeout=deadline.timeout(reserve=FINAL_ANSWER_RESERVE))
+        payload_user_data = [
+            json.loads(compact_result(snapshot_func, snapshot_result))
+            for snapshot_func, snapshot_result in zip(PORTFOLIO_SNAPSHOT_FUNCTIONS, payload_user_data)
+        ]
+
+        # USE THE BACKGROUND MARKET SNAPSHOT when it is fresh and covers the query
+        payload_response = {}
+        market_snapshot.note_demand()
+        snapshot = market_snapshot.get() if market_snapshot.covers(args["user_query"]) else None
+        if snapshot:
+            for i, (tool_name, (tool_args, fetched_at, tool_result)) in enumerate(snapshot.items(), start=1):
+                payload_response[f"tool call - {i}"] = {
+                    **tool_args,
+                    "function_name": tool_name,
+                    "fetched_at": fetched_at,
+                    "tool_call_result": json.loads(compact_result(
+                        tool_name, tool_result, max_tokens=COINGECKO_RESULT_MAX_TOKENS)),
+                }
+        elif not coingecko_breaker.available:
+            # CoinGecko is down: answer from the portfolio alone rather than wait on it
+            payload_response["market data"] = {"error": "Market data is temporarily unavailable", "status": "unavailable"}
+        else:
+            # CHOOSE FUNCTION CALL
+            user_prompt = f"""
         ==> USER DATA:
         {payload_user_data}
 
         ==> USER QUERY:
         {args["user_query"]}"""
-        response = await openai_client.chat.completions.create(
-                model=model,
-                messages=[
-                        {"role": "system","content": system_prompt_coingecko_calling},
-                        {"role": "user", "content": user_prompt}],
-                tools=coingecko_mcp_tools,
-                tool_choice="auto")
-        assistant_message = response.choices[0].message
-
-        # EXECUTE FUNCTION CALL
-        i = 1
-        payload_response = {}
-        session = None
-        session = await connect()
-        for tool_call_ in assistant_message.tool_calls:
-            args_ = json.loads(tool_call_.function.arguments)
-            result = await asyncio.wait_for(session.call_tool(
-                tool_call_.function.name, arguments=args_),
-                timeout=500)
-            args_["function_name"] = tool_call_.function.name
-            args_["tool_call_result"] = json.loads(result.content[0].text)
-            payload_response[f"tool call - {i}"]=args_
-            i += 1
-        await close()
+            response = await asyncio.wait_for(openai_client.chat.completions.create(
+                    model=model,
+                    messages=[
+                            {"role": "system","content": system_prompt_coingecko_calling},
+                            {"role": "user", "content": user_prompt}],
+                    tools=await get_coingecko_mcp_tools(),
+                    tool_choice="auto"), timeout=deadline.timeout(reserve=FINAL_ANSWER_RESERVE))
+            assistant_message = response.choices[0].message
+
+            # EXECUTE FUNCTION CALL; a call that runs out of time becomes an error entry
+            i = 1
+            for tool_call_ in assistant_message.tool_calls or []:
+                args_ = json.loads(tool_call_.function.arguments)
+                try:
+                    timeout = deadline.timeout(500, reserve=FINAL_ANSWER_RESERVE)
+                    tool_call_result = await asyncio.wait_for(call_coingecko_tool(
+                        tool_call_.function.name, args_, timeout=timeout), timeout=timeout)
+                except asyncio.TimeoutError:
+                    tool_call_result = {"error": "Market data call timed out", "status": "timeout"}
+                except CircuitOpen:
+                    tool_call_result = {"error": "Market data is temporarily unavailable", "status": "unavailable"}
+                except Exception as e:
+                    tool_call_result = {"error": f"Market data call failed: {str(e)}", "status": "failed"}
+                args_["function_name"] = tool_call_.function.name
+                args_["tool_call_result"] = json.loads(compact_result(
+                    tool_call_.function.name, tool_call_result, max_tokens=COINGECKO_RESULT_MAX_TOKENS))
+                payload_response[f"tool call - {i}"]=args_
+                i += 1
         
         # GPT RESPONSE
-        gpt_response_result = gpt_response([
+        gpt_timeout = deadline.timeout()
+        gpt_response_result = await asyncio.wait_for(gpt_response([
             {
                 "role":"system",
                 "content":system_prompt_coingecko_response
@@ -363,31 +466,50 @@ async def call_icp_endpoint(func_name: str, args: dict):
                 ==> USER QUERY:
                 {args["user_query"]}"""
             }
-        ])
+        ], effort=RECOMMENDATION_REASONING_EFFORT, timeout=gpt_timeout, on_delta=on_delta), timeout=gpt_timeout)
         return {"response":gpt_response_result}
-    # Admin Functions
-    elif func_name == "check_admin_status":
-        url = f"{BASE_URL}/admin-check"
-        response = requests.post(url, headers=HEADERS, json={"principal": args["user_principal"]})
-    elif func_name == "get_admin_investment_report":
-        url = f"{BASE_URL}/admin-investment-report"
-        response = requests.post(url, headers=HEADERS, json={"admin_principal": args["admin_principal"]})
-    
-    else:
-        raise ValueError(f"Unsupported function call: {func_name}")
-    
-    response.raise_for_status()
-    return response.json()
-
-# Global variable to store admin principals for session-based auth
-USER_ADMIN_STATUS = {}
-
-# Storage for user principals associated with chat sessions
-CHAT_USER_PRINCIPALS = {}  # Maps session_id -> user_principal
 
-# Memory management for conversation context
-CONVERSATION_MEMORY = {}
-MAX_MEMORY_MESSAGES = 50  # Maximum messages to keep in memory per session
+    # Vault, User Portfolio and Admin Functions go through the pooled canister client
+    return await call_canister(func_name, args, timeout=deadline.timeout())
+
+# Cached admin status per principal for session-based auth, bounded with LRU eviction
+USER_ADMIN_STATUS = SWRCache(
+    default_ttl=float(os.getenv("ADMIN_STATUS_TTL", "3600")),
+    stale_ttl=0,
+    max_entries=int(os.getenv("MAX_ADMIN_STATUS_ENTRIES", "10000")))
+
+# How past turns are chosen for the prompt: "recent" (token-budgeted window plus
+# rolling summary) or "retrieval" (relevant turns from a local vector index)
+HISTORY_MODE = os.getenv("HISTORY_MODE", "recent")
+HISTORY_INDEX = HistoryIndex()
+
+# Retrieval searches long sessions, so the store keeps as many messages as the index does
+MEMORY_RETENTION = HISTORY_INDEX_MAX_MESSAGES if HISTORY_MODE == "retrieval" else MAX_MEMORY_MESSAGES
+
+# Conversation memory and user principals per chat session.
+# "memory" keeps them in-process with LRU and idle-TTL eviction; "sqlite" persists them across restarts and workers.
+# Evicted sessions are dropped from the history index too, and in recent mode
+# messages trimmed from a full session are folded into its rolling summary.
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "memory")
+
+# Fewer sessions stay in memory when each keeps more messages, so sessions x
+# messages never exceeds MAX_MEMORY_TOTAL_MESSAGES. With retrieval, only the
+# sqlite backend keeps the sessions that no longer fit.
+MEMORY_SESSIONS = max(MAX_MEMORY_TOTAL_MESSAGES // MEMORY_RETENTION, 1)
+
+def fold_trimmed(session_id: str, message: dict):
+    fold_trimmed_message(SESSION_STORE, session_id, message)
+
+MEMORY_ON_TRIM = fold_trimmed if HISTORY_MODE != "retrieval" else None
+SESSION_STORE = (SQLiteSessionStore(max_messages=MEMORY_RETENTION, on_evict=HISTORY_INDEX.clear,
+                                    hot_sessions=min(MEMORY_HOT_SESSIONS, MEMORY_SESSIONS), on_trim=MEMORY_ON_TRIM)
+                 if MEMORY_BACKEND == "sqlite"
+                 else SessionStore(max_sessions=min(MAX_SESSIONS, MEMORY_SESSIONS), max_messages=MEMORY_RETENTION,
+                                   on_evict=HISTORY_INDEX.clear, on_trim=MEMORY_ON_TRIM))
+if HISTORY_MODE == "retrieval" and MEMORY_BACKEND != "sqlite":
+    logger.warning(
+        f"HISTORY_MODE=retrieval keeps only {SESSION_STORE.max_sessions} sessions in memory; "
+        "set MEMORY_BACKEND=sqlite to keep the rest")
 
 def get_session_id(sender: str) -> str:
     """Generate a consistent session ID from sender address."""
@@ -395,33 +517,26 @@ def get_session_id(sender: str) -> str:
 
 def add_to_memory(session_id: str, role: str, content: str, ctx: Context):
     """Add a message to conversation memory."""
-    if session_id not in CONVERSATION_MEMORY:
-        CONVERSATION_MEMORY[session_id] = []
-    
-    CONVERSATION_MEMORY[session_id].append({
+    message = {
         "role": role,
         "content": content,
         "timestamp": datetime.now(timezone.utc).isoformat()
-    })
-    
-    # Limit memory size
-    if len(CONVERSATION_MEMORY[session_id]) > MAX_MEMORY_MESSAGES:
-        CONVERSATION_MEMORY[session_id] = CONVERSATION_MEMORY[session_id][-MAX_MEMORY_MESSAGES:]
+    }
+    SESSION_STORE.add_message(session_id, message)
+    if HISTORY_MODE == "retrieval":
+        HISTORY_INDEX.add_message(session_id, message)
     
     ctx.logger.info(f"Added to memory for {session_id}: {role} message")
 
 def get_conversation_history(session_id: str, limit: int = 10) -> list:
     """Get recent conversation history for context."""
-    if session_id not in CONVERSATION_MEMORY:
-        return []
-    
-    return CONVERSATION_MEMORY[session_id][-limit:] if limit else CONVERSATION_MEMORY[session_id]
+    return SESSION_STORE.get_history(session_id, limit)
 
 def clear_memory(session_id: str, ctx: Context) -> bool:
     """Clear conversation memory for a session."""
     try:
-        if session_id in CONVERSATION_MEMORY:
-            del CONVERSATION_MEMORY[session_id]
+        HISTORY_INDEX.clear(session_id)
+        if SESSION_STORE.clear_history(session_id):
             ctx.logger.info(f"Cleared memory for session {session_id}")
             return True
         return False
@@ -438,11 +553,11 @@ def set_user_principal(session_id: str, user_principal: str, ctx: Context) -> bo
             return False
         
         # Check if session already has a different principal (potential security issue)
-        existing_principal = CHAT_USER_PRINCIPALS.get(session_id)
+        existing_principal = SESSION_STORE.get_principal(session_id)
         if existing_principal and existing_principal != user_principal:
             ctx.logger.warning(f"Session {session_id} already has principal {existing_principal}, replacing with {user_principal}")
         
-        CHAT_USER_PRINCIPALS[session_id] = user_principal
+        SESSION_STORE.set_principal(session_id, user_principal)
         ctx.logger.info(f"Set principal for session {session_id}: {user_principal}")
         return True
     except Exception as e:
@@ -451,12 +566,12 @@ def set_user_principal(session_id: str, user_principal: str, ctx: Context) -> bo
 
 def get_user_principal(session_id: str) -> str:
     """Get user principal for a chat session."""
-    return CHAT_USER_PRINCIPALS.get(session_id, None)
+    return SESSION_STORE.get_principal(session_id)
 
 def validate_session_principal(session_id: str, expected_principal: str, ctx: Context) -> bool:
     """Validate that the session belongs to the expected user principal."""
     try:
-        stored_principal = CHAT_USER_PRINCIPALS.get(session_id)
+        stored_principal = SESSION_STORE.get_principal(session_id)
         if stored_principal and stored_principal != expected_principal:
             ctx.logger.warning(f"Session {session_id} principal mismatch: stored={stored_principal}, expected={expected_principal}")
             return False
@@ -468,8 +583,7 @@ def validate_session_principal(session_id: str, expected_principal: str, ctx: Co
 def clear_user_principal(session_id: str, ctx: Context) -> bool:
     """Clear user principal for a chat session."""
     try:
-        if session_id in CHAT_USER_PRINCIPALS:
-            del CHAT_USER_PRINCIPALS[session_id]
+        if SESSION_STORE.clear_principal(session_id):
             ctx.logger.info(f"Cleared principal for session {session_id}")
             return True
         return False
@@ -485,19 +599,20 @@ def extract_principal_from_message(message: str) -> str:
     match = re.search(principal_pattern, message)
     return match.group(0) if match else None
 
-async def check_user_admin_status(user_principal: str, ctx: Context) -> bool:
-    """Check if a user has admin privileges and cache the result."""
+async def check_user_admin_status(user_principal: str, ctx: Context, deadline: Deadline = None) -> bool:
+    """Check if a user has admin privileges and cache the result, within the request deadline if given."""
     try:
         # Check cache first
-        if user_principal in USER_ADMIN_STATUS:
-            return USER_ADMIN_STATUS[user_principal]
+        cached_status = USER_ADMIN_STATUS.get(user_principal)
+        if cached_status is not None:
+            return cached_status
         
         # Call the admin check endpoint
-        result = await call_icp_endpoint("check_admin_status", {"user_principal": user_principal})
+        result = await call_icp_endpoint("check_admin_status", {"user_principal": user_principal}, deadline)
         is_admin = result.get("is_admin", False)
         
         # Cache the result
-        USER_ADMIN_STATUS[user_principal] = is_admin
+        USER_ADMIN_STATUS.set(user_principal, is_admin)
         
         ctx.logger.info(f"User {user_principal} admin status: {is_admin}")
         return is_admin
@@ -506,7 +621,133 @@ async def check_user_admin_status(user_principal: str, ctx: Context) -> bool:
         ctx.logger.error(f"Error checking admin status for {user_principal}: {str(e)}")
         return False
 
-async def process_query(query: str, ctx: Context, session_id: str = "default", user_principal: str = None) -> str:
+# Background admin checks in flight, one per principal
+ADMIN_CHECKS = {}
+
+def schedule_admin_check(user_principal: str, ctx: Context):
+    """Start a background admin status check unless one is already running."""
+    if user_principal in ADMIN_CHECKS:
+        return
+    task = asyncio.create_task(check_user_admin_status(user_principal, ctx))
+    ADMIN_CHECKS[user_principal] = task
+    task.add_done_callback(lambda _: ADMIN_CHECKS.pop(user_principal, None))
+
+DEADLINE_CUT_NOTE = "\n\n⏳ _This answer was cut short because the request ran out of time._"
+
+def degraded_answer(assistant_message: dict, tool_result_messages: list) -> str:
+    """Answer from the raw tool results when there is no time left for the final LLM call."""
+    lines = ["⏳ **Partial Answer**: I ran out of time before I could write a full answer. Here is the data I retrieved:"]
+    for tool_call, tool_message in zip(assistant_message.get("tool_calls") or [], tool_result_messages):
+        content = tool_message["content"]
+        if len(content) > 600:
+            content = content[:600] + "…"
+        lines.append(f"- **{tool_call['function']['name']}**: `{content}`")
+    return "\n".join(lines)
+
+async def emit_event(on_event, event: str, data: dict):
+    """Forward a progress or token event to a streaming client, if there is one."""
+    if on_event is not None:
+        await on_event(event, data)
+
+async def execute_tool_call(tool_call: dict, query: str, ctx: Context, semaphore: asyncio.Semaphore,
+                            on_event=None, deadline: Deadline = None, on_draft=None) -> dict:
+    """Execute a single LLM tool call and return its tool result message.
+
+    The tool gets its own timeout, bounded by the request deadline minus the
+    time kept back for the final answer. A recommendation's text goes to
+    on_draft(tool, token) as GPT writes it, or to on_event as "draft" events.
+    """
+    func_name = tool_call["function"]["name"]
+    arguments = json.loads(tool_call["function"]["arguments"])
+    arguments["user_query"] = query
+    tool_call_id = tool_call["id"]
+    timeout = TOOL_TIMEOUTS.get(func_name, TOOL_TIMEOUT)
+    # A recommendation's text is streamed as a draft while GPT writes it
+    if on_draft is None and on_event is not None:
+        on_draft = lambda tool, token: on_event("draft", {"tool": tool, "token": token})
+    on_delta = (lambda token: on_draft(func_name, token)) if on_draft is not None else None
+
+    async with semaphore:
+        ctx.logger.info(f"Executing {func_name} with arguments: {arguments}")
+        await emit_event(on_event, "progress", {"stage": "tool_start", "tool": func_name})
+
+        try:
+            if deadline is not None:
+                timeout = deadline.timeout(timeout, reserve=FINAL_ANSWER_RESERVE)
+            tool_deadline = Deadline(timeout)
+
+            # Check if this is an admin function that requires authentication
+            admin_functions = ["get_admin_investment_report"]
+            
+            if func_name in admin_functions:
+                # Get admin principal from arguments
+                admin_principal = arguments.get("admin_principal")
+                if not admin_principal:
+                    error_content = {
+                        "error": "Admin functions require admin_principal parameter",
+                        "status": "authentication_required"
+                    }
+                    content_to_send = json.dumps(error_content)
+                else:
+                    # Check admin status
+                    is_admin = await check_user_admin_status(admin_principal, ctx, tool_deadline)
+                    if not is_admin:
+                        error_content = {
+                            "error": f"Access denied: {admin_principal} does not have admin privileges",
+                            "status": "unauthorized",
+                            "required_role": "admin"
+                        }
+                        content_to_send = json.dumps(error_content)
+                    else:
+                        # User is admin, proceed with function call
+                        result = await asyncio.wait_for(
+                            call_icp_endpoint(func_name, arguments, tool_deadline, on_delta), timeout=timeout)
+                        content_to_send = compact_result(func_name, result)
+            else:
+                # Regular function call
+                result = await asyncio.wait_for(
+                    call_icp_endpoint(func_name, arguments, tool_deadline, on_delta), timeout=timeout)
+                content_to_send = compact_result(func_name, result)
+
+        except asyncio.TimeoutError:
+            error_content = {
+                "error": f"Tool execution timed out after {timeout:.0f} seconds",
+                "status": "timeout"
+            }
+            content_to_send = json.dumps(error_content)
+        except Exception as e:
+            error_content = {
+                "error": f"Tool execution failed: {str(e)}",
+                "status": "failed"
+            }
+            content_to_send = json.dumps(error_content)
+
+    await emit_event(on_event, "progress", {"stage": "tool_done", "tool": func_name})
+    return {
+        "role": "tool",
+        "tool_call_id": tool_call_id,
+        "content": content_to_send
+    }
+
+async def process_query(query: str, ctx: Context, session_id: str = "default", user_principal: str = None,
+                        on_event=None, deadline: Deadline = None, deferred: list = None, on_draft=None) -> str:
+    """Answer a chat query; with on_event, progress, recommendation drafts and answer tokens are streamed as they happen.
+
+    Every stage gets what is left of the request deadline. When time runs
+    out, tool calls report timeouts and the answer is cut short or built
+    from the data already fetched. With deferred, memory writes are
+    collected there as (role, content) for the caller to commit instead of
+    being written as they happen. on_draft(tool, token) receives only the
+    recommendation drafts, so a caller can collect them while ASI1 is still
+    called without streaming.
+    """
+    deadline = deadline or Deadline(CHAT_DEADLINE)
+
+    def remember(role: str, content: str):
+        if deferred is None:
+            add_to_memory(session_id, role, content, ctx)
+        else:
+            deferred.append((role, content))
     try:
         # Check for missing API key
         if not ASI1_API_KEY or ASI1_API_KEY == "your_asi1_api_key_here":
@@ -549,10 +790,7 @@ Until then, I can help with general information about the vault system, but I wo
                 return "ℹ️ No principal detected. The system will automatically use your authenticated principal when available."
         
         # Add user message to memory
-        add_to_memory(session_id, "user", query, ctx)
-        
-        # Get conversation history for context
-        conversation_history = get_conversation_history(session_id, limit=10)
+        remember("user", query)
         
         # Determine user principal - priority order:
         # 1. Explicitly passed user_principal (from REST API)
@@ -569,44 +807,24 @@ Until then, I can help with general information about the vault system, but I wo
                 final_user_principal = extracted_principal
                 ctx.logger.info(f"Auto-extracted and set principal: {extracted_principal}")
         
-        # Step 1: Initial call to ASI1 with user query, tools, and conversation history
-        user_context = ""
+        # Step 1: Initial call to ASI1 with user query, tools, and conversation history.
+        # The static system prompt and tools come first and are pre-serialized;
+        # per-user context follows so the prompt prefix stays cacheable
+        messages = []
         if final_user_principal:
-            user_context = f"\n\nIMPORTANT: The user's principal ID is: {final_user_principal}. When they ask about 'my balance', 'my investments', or other personal queries, automatically use this principal ID to fetch their data without asking them to provide it."
-        
-        system_message = {
-            "role": "system",
-            "content": f"""You are a helpful AI assistant for an ICP vault system that manages USDX token investments. 
-            
-You can help users with:
-- 📊 Vault information (vault status, investment products, available instruments)
-- 💰 User portfolio management (balances, vault entries, investment reports, dividends)
-- 👑 Admin functions (for authorized administrators only)
-
-When users ask for specific data, use the available tools to fetch real information from the vault system.
-When users ask general questions or need help understanding the system, provide helpful explanations without using tools.
-
-You have access to previous conversation history to maintain context. Reference past interactions when relevant to provide better, more personalized responses.
-
-Special commands:
-- '/clear', '/clear memory', '/reset', or '/new session' - Clear conversation memory
-- '/set principal <principal-id>' - Set your ICP principal for personalized queries
-- '/clear principal' or '/remove principal' - Remove your stored principal
-- '/show principal' or '/my principal' - Display your current stored principal
-
-Always be friendly, helpful, and clear in your responses.{user_context}"""
-        }
-        
-        # Build messages with conversation history
-        messages = [system_message]
+            messages.append({
+                "role": "system",
+                "content": f"IMPORTANT: The user's principal ID is: {final_user_principal}. When they ask about 'my balance', 'my investments', or other personal queries, automatically use this principal ID to fetch their data without asking them to provide it."
+            })
         
-        # Add conversation history (excluding system messages to avoid duplication)
-        for msg in conversation_history[:-1]:  # Exclude the last message (current query) as it's added separately
-            if msg["role"] != "system":
-                messages.append({
-                    "role": msg["role"],
-                    "content": msg["content"]
-                })
+        # Build messages with conversation history: either the past turns most
+        # relevant to this query, or a rolling summary of older turns plus the
+        # most recent turns, always within the token budget
+        if HISTORY_MODE == "retrieval":
+            messages.extend(HISTORY_INDEX.retrieve(SESSION_STORE, session_id, query, CONTEXT_TOKEN_BUDGET,
+                                                   query_stored=deferred is None))
+        else:
+            messages.extend(build_history_context(SESSION_STORE, session_id, query_stored=deferred is None))
         
         # Add current user message
         initial_message = {
@@ -614,127 +832,120 @@ Always be friendly, helpful, and clear in your responses.{user_context}"""
             "content": query
         }
         messages.append(initial_message)
-        payload = {
-            "model": "asi1-mini",
-            "messages": messages,
-            "tools": tools,
-            "temperature": 0.7,
-            "max_tokens": 1024
-        }
-        response = requests.post(
-            f"{ASI1_BASE_URL}/chat/completions",
-            headers=ASI1_HEADERS,
-            json=payload
-        )
-        
-        if response.status_code == 401:
-            ctx.logger.error("ASI1 API authentication failed - check API key")
-            return "🔑 **Authentication Error**: Invalid or missing ASI1 API key. Please check your API key configuration in the .env file."
-        elif response.status_code == 403:
-            ctx.logger.error("ASI1 API access forbidden")
-            return "🚫 **Access Denied**: Your API key doesn't have access to this service. Please check your ASI1 subscription."
-        elif response.status_code == 429:
-            ctx.logger.error("ASI1 API rate limit exceeded")
-            return "⏳ **Rate Limited**: Too many requests. Please wait a moment and try again."
-        
-        response.raise_for_status()
-        response_json = response.json()
-
-        # Step 2: Parse tool calls from response
-        tool_calls = response_json["choices"][0]["message"].get("tool_calls", [])
-        messages_history = messages + [response_json["choices"][0]["message"]]
-
-        if not tool_calls:
-            # Handle general questions without tool calls - let AI respond naturally
-            ai_response = response_json["choices"][0]["message"]["content"]
-            # Add AI response to memory
-            add_to_memory(session_id, "assistant", ai_response, ctx)
-            return ai_response
-
-        # Step 3: Execute tools and format results
-        for tool_call in tool_calls:
-            func_name = tool_call["function"]["name"]
-            arguments = json.loads(tool_call["function"]["arguments"])
-            arguments["user_query"] = query
-            tool_call_id = tool_call["id"]
-
-            ctx.logger.info(f"Executing {func_name} with arguments: {arguments}")
-
-            try:
-                # Check if this is an admin function that requires authentication
-                admin_functions = ["get_admin_investment_report"]
-                
-                if func_name in admin_functions:
-                    # Get admin principal from arguments
-                    admin_principal = arguments.get("admin_principal")
-                    if not admin_principal:
-                        error_content = {
-                            "error": "Admin functions require admin_principal parameter",
-                            "status": "authentication_required"
-                        }
-                        content_to_send = json.dumps(error_content)
+        context_fragment = encode_messages(messages)
+
+        route = route_query(query, final_user_principal)
+        if route:
+            # Fast path: call the routed function directly, skipping the initial ASI1 round trip
+            func_name, arguments = route
+            ctx.logger.info(f"Fast path: routed query to {func_name}")
+            tool_call = {
+                "id": f"call_{uuid4().hex[:24]}",
+                "type": "function",
+                "function": {"name": func_name, "arguments": json.dumps(arguments)}
+            }
+            assistant_message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+            tool_result_messages = [
+                await execute_tool_call(tool_call, query, ctx, asyncio.Semaphore(1), on_event, deadline, on_draft)]
+
+            templated_response = format_template(func_name, tool_result_messages[0]["content"])
+            if templated_response:
+                await emit_event(on_event, "token", {"token": templated_response})
+                remember("assistant", templated_response)
+                return templated_response
+        else:
+            # Offer only the tools this session can use
+            is_admin = False
+            if final_user_principal:
+                is_admin = USER_ADMIN_STATUS.get(final_user_principal)
+                if is_admin is None:
+                    if INTENT_PATTERNS["admin"].search(query):
+                        is_admin = await check_user_admin_status(final_user_principal, ctx, deadline)
                     else:
-                        # Check admin status
-                        is_admin = await check_user_admin_status(admin_principal, ctx)
-                        if not is_admin:
-                            error_content = {
-                                "error": f"Access denied: {admin_principal} does not have admin privileges",
-                                "status": "unauthorized",
-                                "required_role": "admin"
-                            }
-                            content_to_send = json.dumps(error_content)
-                        else:
-                            # User is admin, proceed with function call
-                            result = await call_icp_endpoint(func_name, arguments)
-                            content_to_send = json.dumps(result)
+                        # Verify in the background so later turns can offer admin tools
+                        schedule_admin_check(final_user_principal, ctx)
+                        is_admin = False
+            tool_groups = select_tool_groups(bool(final_user_principal), is_admin, query)
+            await emit_event(on_event, "progress", {"stage": "thinking"})
+            try:
+                initial_timeout = deadline.timeout(ASI1_TIMEOUT, reserve=FINAL_ANSWER_RESERVE)
+                started = time.monotonic()
+                if on_event is None:
+                    response_json = await chat_completion(
+                        get_initial_request(tool_groups).build(context_fragment), stage="initial",
+                        timeout=initial_timeout)
+                    record_usage(response_json)
+                    assistant_message = response_json["choices"][0]["message"]
                 else:
-                    # Regular function call
-                    result = await asyncio.wait_for(call_icp_endpoint(func_name, arguments),timeout=500)
-                    content_to_send = json.dumps(result)
-                    
-            except Exception as e:
-                error_content = {
-                    "error": f"Tool execution failed: {str(e)}",
-                    "status": "failed"
-                }
-                content_to_send = json.dumps(error_content)
-
-            tool_result_message = {
-                "role": "tool",
-                "tool_call_id": tool_call_id,
-                "content": content_to_send
-            }
-            messages_history.append(tool_result_message)
-
-        # Step 4: Send results back to ASI1 for final answer
-        final_payload = {
-            "model": "asi1-mini",
-            "messages": messages_history,
-            "temperature": 0.7,
-            "max_tokens": 1024
-        }
-        final_response = requests.post(
-            f"{ASI1_BASE_URL}/chat/completions",
-            headers=ASI1_HEADERS,
-            json=final_payload
-        )
-        
-        if final_response.status_code == 401:
-            ctx.logger.error("ASI1 API authentication failed on final call")
-            return "🔑 **Authentication Error**: API key issue during final processing. Please check your configuration."
-        elif final_response.status_code == 429:
-            ctx.logger.error("ASI1 API rate limit exceeded on final call")
-            return "⏳ **Rate Limited**: Please wait a moment and try again."
-            
-        final_response.raise_for_status()
-        final_response_json = final_response.json()
+                    # Streaming: an answer that needs no tools reaches the client token by token
+                    assistant_message = await stream_chat_message(
+                        get_initial_request(tool_groups, stream=True).build(context_fragment),
+                        lambda token: on_event("token", {"token": token}), stage="initial",
+                        timeout=initial_timeout, total_timeout=initial_timeout, on_usage=record_usage)
+                record_initial_call(time.monotonic() - started)
+            except ASI1Error as e:
+                ctx.logger.error(e.log_message)
+                return e.user_message
+
+            # Step 2: Parse tool calls from response
+            tool_calls = assistant_message.get("tool_calls", [])
+
+            if not tool_calls:
+                # Handle general questions without tool calls - let AI respond naturally
+                ai_response = assistant_message["content"]
+                # Add AI response to memory
+                remember("assistant", ai_response)
+                return ai_response
+
+            # Step 3: Execute tools concurrently, keeping results in tool_call_id order
+            semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
+            tool_result_messages = await asyncio.gather(*[
+                execute_tool_call(tool_call, query, ctx, semaphore, on_event, deadline, on_draft)
+                for tool_call in tool_calls
+            ])
+
+        # Step 4: Send results back to ASI1 for final answer, reusing the
+        # already encoded context instead of re-serializing it
+        results_fragment = encode_messages([assistant_message, *tool_result_messages])
+        await emit_event(on_event, "progress", {"stage": "answering"})
+        tokens = []
+        try:
+            final_timeout = deadline.timeout(ASI1_TIMEOUT)
+            if on_event is None:
+                final_response_json = await chat_completion(
+                    FINAL_REQUEST.build(context_fragment, results_fragment), stage="final",
+                    timeout=final_timeout)
+                record_usage(final_response_json)
+                final_ai_response = final_response_json["choices"][0]["message"]["content"]
+            else:
+                # Step 5 (streaming): forward tokens as ASI1 produces them
+                async for token in stream_chat_completion(
+                        FINAL_STREAM_REQUEST.build(context_fragment, results_fragment), stage="final",
+                        timeout=final_timeout, total_timeout=final_timeout, on_usage=record_usage):
+                    tokens.append(token)
+                    await on_event("token", {"token": token})
+                final_ai_response = "".join(tokens)
+        except ASI1Error as e:
+            ctx.logger.error(e.log_message)
+            return e.user_message
+        except asyncio.TimeoutError:
+            # Out of time: keep what was streamed, or fall back to the fetched data
+            ctx.logger.warning(f"Deadline reached while writing the final answer (session: {session_id})")
+            if tokens:
+                final_ai_response = "".join(tokens) + DEADLINE_CUT_NOTE
+                await emit_event(on_event, "token", {"token": DEADLINE_CUT_NOTE})
+            else:
+                final_ai_response = degraded_answer(assistant_message, tool_result_messages)
+                await emit_event(on_event, "token", {"token": final_ai_response})
 
         # Step 5: Return the model's final answer
-        final_ai_response = final_response_json["choices"][0]["message"]["content"]
         # Add final AI response to memory
-        add_to_memory(session_id, "assistant", final_ai_response, ctx)
+        remember("assistant", final_ai_response)
         return final_ai_response
 
+    except asyncio.TimeoutError:
+        ctx.logger.warning(f"Request deadline reached (session: {session_id})")
+        return "⏳ **Timed Out**: This request took longer than expected. Please try again in a moment, or ask a narrower question."
     except Exception as e:
         ctx.logger.error(f"Error processing query: {str(e)}")
         return f"An error occurred while processing your request: {str(e)}"
@@ -765,9 +976,15 @@ async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
                 ctx.logger.info(f"Got a message from {sender}: {item.text}")
                 # Get stored user principal for this session
                 user_principal = get_user_principal(session_id)
-                response_text = await asyncio.wait_for(
-                    process_query(item.text, ctx, session_id, user_principal),
-                    timeout=500)
+                deadline = Deadline(CHAT_DEADLINE)
+                try:
+                    async with ADMISSION.admit(session_id, request_priority(item.text, user_principal)):
+                        response_text = await asyncio.wait_for(
+                            process_query(item.text, ctx, session_id, user_principal, deadline=deadline),
+                            timeout=deadline.remaining() + DEADLINE_GRACE)
+                except AdmissionRejected as e:
+                    ctx.logger.warning(f"Shed chat message from {sender}: {e.reason}")
+                    response_text = BUSY_MESSAGE
                 ctx.logger.info(f"Response text: {response_text}")
                 response = ChatMessage(
                     timestamp=datetime.now(timezone.utc),
@@ -794,6 +1011,67 @@ async def handle_chat_acknowledgement(ctx: Context, sender: str, msg: ChatAcknow
 
 agent.include(chat_proto)
 
+def bind_session_principal(session_id: str, user_principal: str, ctx: Context):
+    """Tie an authenticated frontend principal to its chat session."""
+    if user_principal:
+        # Validate that this session belongs to this user principal
+        if not validate_session_principal(session_id, user_principal, ctx):
+            # If validation fails, clear any existing invalid session data and set the correct one
+            clear_user_principal(session_id, ctx)
+        
+        # Always ensure the session has the correct user principal
+        set_user_principal(session_id, user_principal, ctx)
+
+# Background queue for long-running requests such as analyses and recommendations
+JOB_QUEUE = JobQueue()
+
+# Global concurrency limit shared by chat, streaming and job requests
+ADMISSION = AdmissionController()
+
+def request_priority(query: str, user_principal: str = None) -> int:
+    """Admission priority: commands and direct lookups first, recommendations last."""
+    if query.strip().startswith("/") or match_intent(query, user_principal):
+        return PRIORITY_HIGH
+    if INTENT_PATTERNS["recommendation"].search(query):
+        return PRIORITY_LOW
+    return PRIORITY_NORMAL
+
+# Runner for the streaming chat server, started with the agent
+STREAM_RUNNER = None
+
+@agent.on_event("startup")
+async def handle_startup(ctx: Context):
+    """Warm the CoinGecko tool schemas, start the market snapshot refresher and the streaming chat server."""
+    global STREAM_RUNNER
+    warm_coingecko_mcp_tools()
+    market_snapshot.start()
+
+    async def process_streaming(message: str, session_id: str, user_principal: str, on_event,
+                                deadline: Deadline) -> str:
+        bind_session_principal(session_id, user_principal, ctx)
+        return await process_query(message, ctx, session_id, user_principal, on_event, deadline)
+
+    def admit_streaming(message: str, session_id: str, user_principal: str):
+        return ADMISSION.admit(session_id, request_priority(message, user_principal))
+
+    try:
+        STREAM_RUNNER = await start_stream_server(process_streaming, ctx.logger, admit_streaming)
+    except OSError as e:
+        ctx.logger.error(f"Streaming chat server could not start on port {CHAT_STREAM_PORT}: {e}")
+
+@agent.on_event("shutdown")
+async def handle_shutdown(ctx: Context):
+    """Release pooled connections when the agent stops."""
+    await close_canister_client()
+    await close_asi1_client()
+    await close_gpt_client()
+    await market_snapshot.close()
+    await coingecko_pool.close()
+    if STREAM_RUNNER is not None:
+        await STREAM_RUNNER.cleanup()
+    await JOB_QUEUE.close()
+    SESSION_STORE.close()
+
 # Native Agent REST Endpoints
 @agent.on_rest_post("/api/chat", ChatRequest, ChatResponse)
 async def handle_chat_rest(ctx: Context, req: ChatRequest) -> ChatResponse:
@@ -803,23 +1081,27 @@ async def handle_chat_rest(ctx: Context, req: ChatRequest) -> ChatResponse:
         user_principal = req.user_principal
         
         # Validate and store user principal for this session
-        if user_principal:
-            # Validate that this session belongs to this user principal
-            if not validate_session_principal(req.session_id, user_principal, ctx):
-                # If validation fails, clear any existing invalid session data and set the correct one
-                clear_user_principal(req.session_id, ctx)
-            
-            # Always ensure the session has the correct user principal
-            set_user_principal(req.session_id, user_principal, ctx)
+        bind_session_principal(req.session_id, user_principal, ctx)
         
-        response_text = await asyncio.wait_for(
-            process_query(req.message, ctx, req.session_id, user_principal),
-            timeout=500)
+        deadline = Deadline(CHAT_DEADLINE)
+        async with ADMISSION.admit(req.session_id, request_priority(req.message, user_principal)):
+            response_text = await asyncio.wait_for(
+                process_query(req.message, ctx, req.session_id, user_principal, deadline=deadline),
+                timeout=deadline.remaining() + DEADLINE_GRACE)
         return ChatResponse(
             response=response_text,
             timestamp=datetime.now().isoformat(),
             session_id=req.session_id
         )
+    except AdmissionRejected as e:
+        ctx.logger.warning(f"Shed REST chat message (session: {req.session_id}): {e.reason}")
+        return ChatResponse(
+            response=BUSY_MESSAGE,
+            timestamp=datetime.now().isoformat(),
+            session_id=req.session_id,
+            status="busy",
+            retry_after=e.retry_after
+        )
     except Exception as e:
         ctx.logger.error(f"Error in REST chat endpoint: {e}")
         return ChatResponse(
@@ -847,6 +1129,146 @@ async def handle_clear_memory_rest(ctx: Context, req: ClearMemoryRequest) -> Cle
             timestamp=datetime.now().isoformat()
         )
 
+@agent.on_rest_post("/api/invalidate-portfolio", InvalidatePortfolioRequest, InvalidatePortfolioResponse)
+async def handle_invalidate_portfolio_rest(ctx: Context, req: InvalidatePortfolioRequest) -> InvalidatePortfolioResponse:
+    """REST endpoint to drop cached portfolio data after a lock, unlock or claim"""
+    try:
+        # Only the session the principal is bound to may flush its portfolio
+        if not req.user_principal or get_user_principal(req.session_id) != req.user_principal:
+            ctx.logger.warning(f"Rejected portfolio invalidation for {req.user_principal} from session {req.session_id}")
+            return InvalidatePortfolioResponse(
+                success=False,
+                message="Access denied: session is not bound to this principal",
+                timestamp=datetime.now().isoformat()
+            )
+        ctx.logger.info(f"Invalidating cached portfolio for: {req.user_principal}")
+        invalidate_user_portfolio(req.user_principal)
+        return InvalidatePortfolioResponse(
+            success=True,
+            message="Portfolio cache invalidated",
+            timestamp=datetime.now().isoformat()
+        )
+    except Exception as e:
+        ctx.logger.error(f"Error in invalidate portfolio endpoint: {e}")
+        return InvalidatePortfolioResponse(
+            success=False,
+            message=f"Error invalidating portfolio cache: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+@agent.on_rest_post("/api/invalidate-vault", InvalidateVaultRequest, InvalidateVaultResponse)
+async def handle_invalidate_vault_rest(ctx: Context, req: InvalidateVaultRequest) -> InvalidateVaultResponse:
+    """REST endpoint to drop cached vault-wide data after an admin changes products, dividends or settings"""
+    try:
+        # Only a session bound to an admin principal may flush vault-wide data
+        user_principal = get_user_principal(req.session_id)
+        if not user_principal or not await check_user_admin_status(user_principal, ctx):
+            ctx.logger.warning(f"Rejected vault invalidation from session {req.session_id} ({user_principal})")
+            return InvalidateVaultResponse(
+                success=False,
+                message="Access denied: admin privileges required",
+                timestamp=datetime.now().isoformat()
+            )
+        ctx.logger.info(f"Invalidating cached vault data: {req.func_name or 'all'} (admin: {user_principal})")
+        invalidate_vault_cache(req.func_name)
+        return InvalidateVaultResponse(
+            success=True,
+            message="Vault cache invalidated",
+            timestamp=datetime.now().isoformat()
+        )
+    except Exception as e:
+        ctx.logger.error(f"Error in invalidate vault endpoint: {e}")
+        return InvalidateVaultResponse(
+            success=False,
+            message=f"Error invalidating vault cache: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+async def run_job(req: JobSubmitRequest, ctx: Context) -> str:
+    """Run a queued chat request at low priority, waiting as long as the job deadline allows.
+
+    A long analysis runs without the session's turn so it never blocks chat
+    on its session; its question and answer are committed to memory
+    together afterwards, under the session's turn, so they never interleave
+    with a chat turn's writes. A recommendation's text is published on the
+    job as GPT writes it.
+    """
+    deadline = Deadline(JOB_DEADLINE)
+    deferred = []
+    job = current_job()
+
+    async def on_draft(tool: str, token: str):
+        # Pollers see the recommendation as it is written
+        if job is not None:
+            job.partial += token
+
+    try:
+        async with ADMISSION.admit(req.session_id, PRIORITY_LOW, timeout=deadline.remaining(), serialize=False):
+            # Nobody reads a job's answer tokens, so ASI1 is called without streaming
+            return await process_query(req.message, ctx, req.session_id, req.user_principal,
+                                       deadline=deadline, deferred=deferred, on_draft=on_draft)
+    finally:
+        if deferred:
+            async with ADMISSION.session_turn(req.session_id):
+                for role, content in deferred:
+                    add_to_memory(req.session_id, role, content, ctx)
+
+@agent.on_rest_post("/api/jobs", JobSubmitRequest, JobSubmitResponse)
+async def handle_job_submit_rest(ctx: Context, req: JobSubmitRequest) -> JobSubmitResponse:
+    """Queue a chat request, e.g. an analysis and recommendation, and return its job ID"""
+    try:
+        ctx.logger.info(f"Received job: {req.message} (session: {req.session_id})")
+        bind_session_principal(req.session_id, req.user_principal, ctx)
+
+        # The same request from the same session is only run once at a time
+        key = (req.session_id, req.user_principal, " ".join(req.message.lower().split()))
+        job, deduplicated = JOB_QUEUE.submit(key, lambda: run_job(req, ctx))
+        return JobSubmitResponse(
+            success=True,
+            job_id=job.job_id,
+            status=job.status,
+            deduplicated=deduplicated,
+            message="Job already submitted" if deduplicated else "Job queued",
+            timestamp=datetime.now().isoformat()
+        )
+    except asyncio.QueueFull:
+        return JobSubmitResponse(
+            success=False,
+            status="rejected",
+            message="⏳ The agent is busy with other long-running requests. Please try again shortly.",
+            timestamp=datetime.now().isoformat()
+        )
+    except Exception as e:
+        ctx.logger.error(f"Error in job submit endpoint: {e}")
+        return JobSubmitResponse(
+            success=False,
+            status="failed",
+            message=f"Error submitting job: {str(e)}",
+            timestamp=datetime.now().isoformat()
+        )
+
+@agent.on_rest_post("/api/jobs/status", JobRequest, JobStatusResponse)
+async def handle_job_status_rest(ctx: Context, req: JobRequest) -> JobStatusResponse:
+    """Poll the state of a queued job"""
+    job = JOB_QUEUE.get(req.job_id)
+    if job is None:
+        return JobStatusResponse(job_id=req.job_id, status="not_found", timestamp=datetime.now().isoformat())
+    return JobStatusResponse(**job.to_dict(), timestamp=datetime.now().isoformat())
+
+@agent.on_rest_post("/api/jobs/result", JobRequest, JobResultResponse)
+async def handle_job_result_rest(ctx: Context, req: JobRequest) -> JobResultResponse:
+    """Fetch the response of a finished job"""
+    job = JOB_QUEUE.get(req.job_id)
+    if job is None:
+        return JobResultResponse(job_id=req.job_id, status="not_found", timestamp=datetime.now().isoformat())
+    return JobResultResponse(
+        job_id=job.job_id,
+        status=job.status,
+        response=job.result,
+        error=job.error,
+        timestamp=datetime.now().isoformat()
+    )
+
 @agent.on_rest_get("/health", HealthResponse)
 async def handle_health(ctx: Context) -> HealthResponse:
     """Health check endpoint"""
@@ -856,20 +1278,53 @@ async def handle_health(ctx: Context) -> HealthResponse:
         timestamp=datetime.now().isoformat()
     )
 
+@agent.on_rest_get("/api/stats", StatsResponse)
+async def handle_stats(ctx: Context) -> StatsResponse:
+    """Cache and connection pool counters for monitoring"""
+    return StatsResponse(
+        stats={
+            "vault_cache": vault_cache.stats(),
+            "portfolio_cache": portfolio_cache.stats(),
+            "coingecko_cache": coingecko_cache.stats(),
+            "price_batcher": price_batcher.stats(),
+            "sessions": SESSION_STORE.stats(),
+            "history_index": HISTORY_INDEX.stats(),
+            "compaction": get_compaction_stats(),
+            "prompt_cache": get_prompt_cache_stats(),
+            "tool_selection": get_tool_selection_stats(),
+            "intent_router": get_router_stats(),
+            "jobs": JOB_QUEUE.stats(),
+            "admission": ADMISSION.stats(),
+            "market_snapshot": market_snapshot.stats(),
+            "mcp_pool": coingecko_pool.status(),
+            "circuit_breakers": {
+                "asi1": asi1_breaker.stats(),
+                "canister": canister_breaker.stats(),
+                "coingecko": coingecko_breaker.stats(),
+            },
+        },
+        timestamp=datetime.now().isoformat()
+    )
+
 @agent.on_rest_get("/", InfoResponse)
 async def handle_info(ctx: Context) -> InfoResponse:
     """Agent information endpoint"""
     return InfoResponse(
         name="Fetch.AI ICP Vault Agent",
         port=8001,
-        endpoints=["/api/chat", "/api/clear-memory", "/health", "/"],
+        endpoints=["/api/chat", f"http://localhost:{CHAT_STREAM_PORT}/api/chat/stream", "/api/clear-memory", "/api/invalidate-portfolio", "/api/invalidate-vault", "/api/jobs", "/api/jobs/status", "/api/jobs/result", "/api/stats", "/health", "/"],
         description="AI agent for ICP vault operations and investment management. Supports user portfolio tracking, admin functions, comprehensive investment reporting, and persistent conversation memory."
     )
 
 if __name__ == "__main__":
     print("Starting Fetch.AI ICP Vault Agent with integrated REST endpoints on port 8001...")
     print("Chat endpoint: http://localhost:8001/api/chat")
+    print(f"Streaming chat endpoint (SSE): http://localhost:{CHAT_STREAM_PORT}/api/chat/stream")
     print("Clear memory endpoint: http://localhost:8001/api/clear-memory")
+    print("Invalidate portfolio endpoint: http://localhost:8001/api/invalidate-portfolio")
+    print("Invalidate vault endpoint: http://localhost:8001/api/invalidate-vault")
+    print("Job endpoints: http://localhost:8001/api/jobs, /api/jobs/status, /api/jobs/result")
+    print("Stats endpoint: http://localhost:8001/api/stats")
     print("Health endpoint: http://localhost:8001/health")
     print("Info endpoint: http://localhost:8001/")
     print("")
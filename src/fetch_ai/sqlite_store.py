@@ -0,0 +1,313 @@
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from session_store import MAX_MEMORY_MESSAGES, SessionStore
+
+logger = logging.getLogger(__name__)
+
+# SQLite backend settings
+MEMORY_DB_PATH = os.getenv(
+    "MEMORY_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "memory.sqlite3"))
+MEMORY_HOT_TTL = float(os.getenv("MEMORY_HOT_TTL", "300"))  # Idle seconds before a session leaves the hot tier
+MEMORY_HOT_SESSIONS = int(os.getenv("MEMORY_HOT_SESSIONS", "2000"))
+MEMORY_WRITE_BATCH = int(os.getenv("MEMORY_WRITE_BATCH", "100"))
+MEMORY_WRITE_INTERVAL = float(os.getenv("MEMORY_WRITE_INTERVAL_MS", "50")) / 1000
+MEMORY_REVALIDATE_INTERVAL = float(os.getenv("MEMORY_REVALIDATE_INTERVAL", "1"))  # Seconds between version checks per session
+MEMORY_READ_BUSY_TIMEOUT = int(os.getenv("MEMORY_READ_BUSY_TIMEOUT_MS", "50"))  # Longest a read on the event loop waits for a lock
+MEMORY_WRITE_BUSY_TIMEOUT = int(os.getenv("MEMORY_WRITE_BUSY_TIMEOUT_MS", "5000"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT,
+    timestamp TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id);
+CREATE TABLE IF NOT EXISTS sessions (
+    session_id TEXT PRIMARY KEY,
+    principal TEXT,
+    summary TEXT NOT NULL DEFAULT '',
+    summary_until TEXT NOT NULL DEFAULT '',
+    updated_at REAL NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+# Columns added after the first release of the sessions table
+SESSION_COLUMN_MIGRATIONS = {
+    "summary": "ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''",
+    "summary_until": "ALTER TABLE sessions ADD COLUMN summary_until TEXT NOT NULL DEFAULT ''",
+    "version": "ALTER TABLE sessions ADD COLUMN version INTEGER NOT NULL DEFAULT 0",
+}
+
+def _connect(path: str, busy_timeout: int = MEMORY_WRITE_BUSY_TIMEOUT) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=busy_timeout / 1000, check_same_thread=False)
+    conn.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+class SQLiteSessionStore:
+    """Durable session store: SQLite in WAL mode behind an in-memory hot tier.
+
+    Reads are served from the hot tier and fall through to SQLite on a miss.
+    Writes update the hot tier immediately and are persisted in batches by a
+    background writer thread, so the event loop never waits on a write.
+    Cold loads and version checks do read SQLite on the calling thread; in
+    WAL mode they do not wait for writers, and the read connection's short
+    busy timeout bounds the rare wait for a checkpoint or recovery lock. A
+    version check that hits that bound serves the hot tier as it is and is
+    retried on a later read.
+
+    Several local worker processes can share one database file. Every
+    persisted batch bumps a per-session version; a worker compares that
+    version with the one it last saw, at most once per revalidate interval
+    so a turn's several reads share one check, and reloads the session if
+    another worker has written to it since. A session with this worker's own
+    writes still queued is served from, and kept in, the hot tier.
+    """
+
+    def __init__(self, path: str = MEMORY_DB_PATH, max_messages: int = MAX_MEMORY_MESSAGES, on_evict=None,
+                 hot_sessions: int = MEMORY_HOT_SESSIONS, on_trim=None):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.max_messages = max_messages
+        # on_evict fires when a session leaves the hot tier; it reloads from SQLite on next use
+        self.on_evict = on_evict
+        # on_trim fires for each message dropped to keep a session within max_messages
+        self.hot = SessionStore(max_sessions=hot_sessions, idle_ttl=MEMORY_HOT_TTL,
+                                max_messages=max_messages, on_evict=self._evicted, retain=self._has_pending,
+                                on_trim=on_trim)
+        self._versions = {}  # session_id -> version the hot tier reflects
+        self._checked = {}  # session_id -> when its version was last checked
+        self._pending = {}  # session_id -> queued writes not yet persisted
+        self._state_lock = threading.Lock()  # Guards _versions and _pending across the writer thread
+        self.reloads = 0
+        # Create and migrate the schema with the writer's patience, then read with a short busy timeout
+        self._read_conn = _connect(path)
+        self._read_conn.executescript(SCHEMA)
+        self._migrate()
+        self._read_conn.execute(f"PRAGMA busy_timeout={MEMORY_READ_BUSY_TIMEOUT}")
+        self._writes = queue.Queue()
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-memory-writer", daemon=True)
+        self._writer.start()
+        self.batches_written = 0
+
+    def _migrate(self):
+        columns = {row[1] for row in self._read_conn.execute("PRAGMA table_info(sessions)")}
+        with self._read_conn:
+            for column, statement in SESSION_COLUMN_MIGRATIONS.items():
+                if column not in columns:
+                    self._read_conn.execute(statement)
+
+    # ---------- Read-through hot tier ----------
+
+    def _has_pending(self, session_id: str) -> bool:
+        with self._state_lock:
+            return session_id in self._pending
+
+    def _evicted(self, session_id: str):
+        self._checked.pop(session_id, None)
+        with self._state_lock:
+            self._versions.pop(session_id, None)
+        if self.on_evict is not None:
+            self.on_evict(session_id)
+
+    def _db_version(self, session_id: str) -> int:
+        row = self._read_conn.execute(
+            "SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else 0
+
+    def _load(self, session_id: str):
+        """Make sure the session is in the hot tier and current, loading it from SQLite if needed."""
+        session = self.hot.get(session_id)
+        now = time.monotonic()
+        if session is not None:
+            if now - self._checked.get(session_id, 0.0) < MEMORY_REVALIDATE_INTERVAL:
+                return session
+            with self._state_lock:
+                pending = self._pending.get(session_id, 0)
+                known = self._versions.get(session_id, 0)
+            if pending:
+                self._checked[session_id] = now
+                return session
+            try:
+                current = self._db_version(session_id) == known
+            except sqlite3.OperationalError as e:
+                # The database is locked past the read busy timeout; keep serving the hot tier
+                logger.warning(f"Skipped memory revalidation for {session_id}: {str(e)}")
+                return session
+            if current:
+                self._checked[session_id] = now
+                return session
+            # Another worker wrote to this session since it was loaded
+            self.hot.discard(session_id)
+            if self.on_evict is not None:
+                self.on_evict(session_id)
+            self.reloads += 1
+
+        version = self._db_version(session_id)
+        rows = self._read_conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, self.max_messages)).fetchall()
+        session_row = self._read_conn.execute(
+            "SELECT principal, summary, summary_until FROM sessions WHERE session_id = ?",
+            (session_id,)).fetchone()
+
+        session = self.hot.get(session_id, create=True)
+        for role, content, timestamp in reversed(rows):
+            self.hot.add_message(session_id, {"role": role, "content": content, "timestamp": timestamp})
+        if session_row:
+            session.principal, session.summary, session.summary_until = session_row
+        with self._state_lock:
+            self._versions[session_id] = version
+        self._checked[session_id] = now
+        return session
+
+    def _enqueue(self, op: str, session_id: str, value):
+        with self._state_lock:
+            self._pending[session_id] = self._pending.get(session_id, 0) + 1
+        self._writes.put((op, session_id, value))
+
+    def add_message(self, session_id: str, message: dict):
+        self._load(session_id)
+        self.hot.add_message(session_id, message)
+        self._enqueue("add_message", session_id, message)
+
+    def get_history(self, session_id: str, limit: int = None) -> list:
+        self._load(session_id)
+        return self.hot.get_history(session_id, limit)
+
+    def clear_history(self, session_id: str) -> bool:
+        self._load(session_id)
+        cleared = self.hot.clear_history(session_id)
+        if cleared:
+            self._enqueue("clear_history", session_id, None)
+        return cleared
+
+    def get_principal(self, session_id: str) -> str:
+        return self._load(session_id).principal
+
+    def set_principal(self, session_id: str, user_principal: str):
+        self._load(session_id)
+        self.hot.set_principal(session_id, user_principal)
+        self._enqueue("set_principal", session_id, user_principal)
+
+    def get_summary(self, session_id: str) -> tuple:
+        session = self._load(session_id)
+        return session.summary, session.summary_until
+
+    def set_summary(self, session_id: str, summary: str, summary_until: str):
+        self._load(session_id)
+        self.hot.set_summary(session_id, summary, summary_until)
+        self._enqueue("set_summary", session_id, (summary, summary_until))
+
+    def clear_principal(self, session_id: str) -> bool:
+        self._load(session_id)
+        cleared = self.hot.clear_principal(session_id)
+        if cleared:
+            self._enqueue("set_principal", session_id, None)
+        return cleared
+
+    # ---------- Batched background writer ----------
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        while not (self._closed.is_set() and self._writes.empty()):
+            try:
+                batch = [self._writes.get(timeout=MEMORY_WRITE_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < MEMORY_WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(conn, batch)
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist {len(batch)} memory writes: {str(e)}")
+            finally:
+                with self._state_lock:
+                    for _, session_id, _ in batch:
+                        remaining = self._pending.get(session_id, 0) - 1
+                        if remaining > 0:
+                            self._pending[session_id] = remaining
+                        else:
+                            self._pending.pop(session_id, None)
+        conn.close()
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: list):
+        touched = set()
+        versions = {}
+        now = time.time()
+        with conn:
+            for op, session_id, value in batch:
+                if op == "add_message":
+                    conn.execute(
+                        "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                        (session_id, value["role"], value["content"], value["timestamp"]))
+                    touched.add(session_id)
+                elif op == "clear_history":
+                    conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+                    conn.execute(
+                        "UPDATE sessions SET summary = '', summary_until = '', updated_at = ? WHERE session_id = ?",
+                        (now, session_id))
+                elif op == "set_principal":
+                    conn.execute(
+                        "INSERT INTO sessions (session_id, principal, updated_at) VALUES (?, ?, ?) "
+                        "ON CONFLICT(session_id) DO UPDATE SET principal = excluded.principal, updated_at = excluded.updated_at",
+                        (session_id, value, now))
+                elif op == "set_summary":
+                    conn.execute(
+                        "INSERT INTO sessions (session_id, summary, summary_until, updated_at) VALUES (?, ?, ?, ?) "
+                        "ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary, "
+                        "summary_until = excluded.summary_until, updated_at = excluded.updated_at",
+                        (session_id, value[0], value[1], now))
+
+            # Keep only the newest max_messages per session, as the hot tier does
+            for session_id in touched:
+                conn.execute(
+                    "DELETE FROM messages WHERE session_id = ? AND id <= ("
+                    "SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                    (session_id, session_id, self.max_messages))
+
+            # Bump each session's version so other workers reload it
+            for session_id in {session_id for _, session_id, _ in batch}:
+                row = conn.execute("SELECT version FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+                before = row[0] if row else 0
+                conn.execute(
+                    "INSERT INTO sessions (session_id, updated_at, version) VALUES (?, ?, ?) "
+                    "ON CONFLICT(session_id) DO UPDATE SET version = excluded.version, updated_at = excluded.updated_at",
+                    (session_id, now, before + 1))
+                versions[session_id] = (before, before + 1)
+
+        # Our own writes keep the hot tier current, unless another worker wrote in between
+        with self._state_lock:
+            for session_id, (before, after) in versions.items():
+                if self._versions.get(session_id, 0) == before:
+                    self._versions[session_id] = after
+        self.batches_written += 1
+
+    def close(self):
+        """Flush pending writes and stop the writer thread."""
+        self._closed.set()
+        self._writer.join(timeout=10)
+        self._read_conn.close()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "pending_writes": self._writes.qsize(),
+            "batches_written": self.batches_written,
+            "reloads": self.reloads,
+            "hot_tier": self.hot.stats(),
+        }
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import os
+from aiohttp import web
+from admission import BUSY_MESSAGE, AdmissionRejected
+from deadline import CHAT_DEADLINE, DEADLINE_GRACE, Deadline
+
+# Streaming endpoint settings (served next to the agent's REST port)
+CHAT_STREAM_HOST = os.getenv("CHAT_STREAM_HOST", "0.0.0.0")
+CHAT_STREAM_PORT = int(os.getenv("CHAT_STREAM_PORT", "8002"))
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Access-Control-Allow-Methods": "POST, OPTIONS",
+    "Access-Control-Allow-Headers": "*",
+}
+
+class SSEWriter:
+    """Writes Server-Sent Events, and keeps the pipeline running if the client goes away."""
+
+    def __init__(self, response: web.StreamResponse):
+        self.response = response
+        self.connected = True
+        self._lock = asyncio.Lock()
+
+    async def send(self, event: str, data: dict):
+        if not self.connected:
+            return
+        payload = f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8")
+        async with self._lock:
+            try:
+                await self.response.write(payload)
+            except (ConnectionResetError, RuntimeError):
+                self.connected = False
+
+def create_stream_app(process, logger, admit=None) -> web.Application:
+    """Build the aiohttp app for POST /api/chat/stream.
+
+    process(message, session_id, user_principal, on_event, deadline) runs
+    the chat pipeline within deadline, awaiting on_event(event, data) for
+    progress and answer tokens, and returns the final response text.
+    admit(message, session_id, user_principal), if given, returns an async
+    context manager that holds an admission slot and raises
+    AdmissionRejected when the request is shed. The deadline starts before
+    admission, so time spent queued comes out of the request's budget.
+    """
+
+    async def handle_options(request: web.Request) -> web.Response:
+        return web.Response(headers=CORS_HEADERS)
+
+    async def handle_stream(request: web.Request) -> web.StreamResponse:
+        try:
+            body = await request.json()
+            message = body["message"]
+        except (ValueError, KeyError):
+            return web.json_response({"error": "Expected JSON body with a message field"},
+                                     status=400, headers=CORS_HEADERS)
+        session_id = body.get("session_id") or "web_session"
+        user_principal = body.get("user_principal")
+        deadline = Deadline(CHAT_DEADLINE)
+
+        if admit is None:
+            return await run_stream(request, message, session_id, user_principal, deadline)
+        try:
+            async with admit(message, session_id, user_principal):
+                return await run_stream(request, message, session_id, user_principal, deadline)
+        except AdmissionRejected as e:
+            # Shed before the stream is prepared, so the client sees a real 429
+            logger.warning(f"Shed streaming chat message (session: {session_id}): {e.reason}")
+            return web.json_response(
+                {"error": BUSY_MESSAGE, "reason": e.reason, "retry_after": e.retry_after}, status=429,
+                headers={**CORS_HEADERS, "Retry-After": str(e.retry_after)})
+
+    async def run_stream(request: web.Request, message: str, session_id: str, user_principal: str,
+                         deadline: Deadline) -> web.StreamResponse:
+        response = web.StreamResponse(headers={
+            **CORS_HEADERS,
+            "Content-Type": "text/event-stream",
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        })
+        await response.prepare(request)
+        writer = SSEWriter(response)
+        logger.info(f"Received streaming chat message: {message} (session: {session_id})")
+
+        try:
+            # Hard stop shortly after the deadline, in case a stage ignores it
+            response_text = await asyncio.wait_for(
+                process(message, session_id, user_principal, writer.send, deadline),
+                timeout=deadline.remaining() + DEADLINE_GRACE)
+            await writer.send("done", {"response": response_text, "session_id": session_id})
+        except Exception as e:
+            logger.error(f"Error in streaming chat endpoint: {e}")
+            await writer.send("error", {"error": f"An error occurred: {str(e)}"})
+
+        if writer.connected:
+            await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/chat/stream", handle_stream)
+    app.router.add_route("OPTIONS", "/api/chat/stream", handle_options)
+    return app
+
+async def start_stream_server(process, logger, admit=None) -> web.AppRunner:
+    """Start the streaming chat server and return its runner for shutdown."""
+    runner = web.AppRunner(create_stream_app(process, logger, admit))
+    await runner.setup()
+    await web.TCPSite(runner, CHAT_STREAM_HOST, CHAT_STREAM_PORT).start()
+    return runner
@@ -0,0 +1,16 @@
+import asyncio
+import os
+import sys
+import time
+
+# The agent's modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def run(coro):
+    """Run a test scenario coroutine on a fresh event loop."""
+    return asyncio.run(coro)
+
+def message(role: str, content: str, i: int = None) -> dict:
+    """A stored chat message; i gives it an ordered timestamp, otherwise the current time is used."""
+    timestamp = f"{i:08d}" if i is not None else f"{time.time():.6f}"
+    return {"role": role, "content": content, "timestamp": timestamp}
@@ -0,0 +1,184 @@
+import asyncio
+import pytest
+from admission import PRIORITY_HIGH, PRIORITY_LOW, PRIORITY_NORMAL, AdmissionController, AdmissionRejected
+from conftest import run
+
+async def hold(controller, session_id, priority, release, log=None, **kwargs):
+    """Hold an admission until release is set, recording when it was admitted."""
+    async with controller.admit(session_id, priority, **kwargs):
+        if log is not None:
+            log.append(session_id)
+        await release.wait()
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+def test_waiters_are_admitted_by_priority_then_arrival():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=8)
+        release = asyncio.Event()
+        log = []
+        first = asyncio.create_task(hold(controller, "a", PRIORITY_NORMAL, release, log))
+        await settle()
+        waiters = [asyncio.create_task(hold(controller, session_id, priority, release, log))
+                   for session_id, priority in [("low", PRIORITY_LOW), ("normal", PRIORITY_NORMAL),
+                                                ("high", PRIORITY_HIGH), ("high2", PRIORITY_HIGH)]]
+        await settle()
+        assert controller.stats()["queued"] == 4
+        release.set()
+        await asyncio.gather(first, *waiters)
+        return log
+
+    assert run(scenario()) == ["a", "high", "high2", "normal", "low"]
+
+def test_full_queue_displaces_a_lower_priority_waiter():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+        log = []
+        first = asyncio.create_task(hold(controller, "a", PRIORITY_NORMAL, release, log))
+        await settle()
+        low = asyncio.create_task(hold(controller, "low", PRIORITY_LOW, release, log))
+        await settle()
+        high = asyncio.create_task(hold(controller, "high", PRIORITY_HIGH, release, log))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            await low
+        release.set()
+        await asyncio.gather(first, high)
+        return rejected.value.reason, log, controller.stats()
+
+    reason, log, stats = run(scenario())
+    assert reason == "displaced"
+    assert log == ["a", "high"]
+    assert stats["rejected"]["displaced"] == 1
+    assert stats["active"] == 0
+
+def test_full_queue_rejects_a_newcomer_that_does_not_outrank_it():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=1)
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(controller, "a", PRIORITY_NORMAL, release))
+        await settle()
+        waiter = asyncio.create_task(hold(controller, "b", PRIORITY_NORMAL, release))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit("c", PRIORITY_NORMAL):
+                pass
+        release.set()
+        await asyncio.gather(first, waiter)
+        return rejected.value.reason, controller.stats()
+
+    reason, stats = run(scenario())
+    assert reason == "queue_full"
+    assert stats["rejected"]["queue_full"] == 1
+    assert stats["admitted"]["normal"] == 2
+
+def test_zero_length_queue_rejects_when_busy():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, max_queue=0)
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(controller, "a", PRIORITY_NORMAL, release))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit("b", PRIORITY_HIGH):
+                pass
+        release.set()
+        await first
+        return rejected.value.reason
+
+    assert run(scenario()) == "queue_full"
+
+def test_waiting_past_the_timeout_is_a_rejection():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=1, queue_timeout=0.05)
+        release = asyncio.Event()
+        first = asyncio.create_task(hold(controller, "a", PRIORITY_NORMAL, release))
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit("b"):
+                pass
+        stats = controller.stats()
+        release.set()
+        await first
+        return rejected.value.reason, stats
+
+    reason, stats = run(scenario())
+    assert reason == "queue_timeout"
+    assert stats["queued"] == 0
+
+def test_turns_of_one_session_run_one_at_a_time():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=4)
+        running = {"same": 0, "max_same": 0, "other": 0}
+
+        async def turn(session_id):
+            async with controller.admit(session_id):
+                key = "same" if session_id == "s" else "other"
+                running[key] += 1
+                running["max_same"] = max(running["max_same"], running["same"])
+                await asyncio.sleep(0.01)
+                running[key] -= 1
+
+        await asyncio.gather(turn("s"), turn("s"), turn("s"), turn("t"))
+        return running["max_same"], controller.stats()
+
+    max_same, stats = run(scenario())
+    assert max_same == 1
+    assert stats["sessions_in_flight"] == 0
+    assert stats["admitted"]["normal"] == 4
+
+def test_a_session_with_too_many_requests_is_rejected():
+    async def scenario():
+        controller = AdmissionController(max_per_session=2)
+        release = asyncio.Event()
+        held = [asyncio.create_task(hold(controller, "s", PRIORITY_NORMAL, release)) for _ in range(2)]
+        await settle()
+        with pytest.raises(AdmissionRejected) as rejected:
+            async with controller.admit("s"):
+                pass
+        release.set()
+        await asyncio.gather(*held)
+        return rejected.value.reason
+
+    assert run(scenario()) == "session_busy"
+
+def test_unserialized_admission_does_not_wait_for_the_session():
+    async def scenario():
+        controller = AdmissionController(max_concurrent=2)
+        release = asyncio.Event()
+        log = []
+        chat = asyncio.create_task(hold(controller, "s", PRIORITY_NORMAL, release, log))
+        await settle()
+        job = asyncio.create_task(hold(controller, "s", PRIORITY_LOW, release, log, serialize=False))
+        await settle()
+        admitted = list(log)
+        release.set()
+        await asyncio.gather(chat, job)
+        return admitted
+
+    assert run(scenario()) == ["s", "s"]
+
+def test_session_turn_waits_for_a_running_turn():
+    async def scenario():
+        controller = AdmissionController()
+        release = asyncio.Event()
+        log = []
+        chat = asyncio.create_task(hold(controller, "s", PRIORITY_NORMAL, release, log))
+        await settle()
+
+        async def commit():
+            async with controller.session_turn("s"):
+                log.append("commit")
+
+        committing = asyncio.create_task(commit())
+        await settle()
+        before_release = list(log)
+        release.set()
+        await asyncio.gather(chat, committing)
+        return before_release, log
+
+    before_release, log = run(scenario())
+    assert before_release == ["s"]
+    assert log == ["s", "commit"]
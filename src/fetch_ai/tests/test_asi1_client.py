@@ -0,0 +1,101 @@
+import json
+import pytest
+import asi1_client
+from request_builder import RequestTemplate
+from conftest import run
+
+class FakeResponse:
+    status = 200
+    headers = {}
+
+    def __init__(self, chunks):
+        self.content = self._lines(chunks)
+
+    async def _lines(self, chunks):
+        for chunk in chunks:
+            yield f"data: {json.dumps(chunk)}\n".encode("utf-8")
+            yield b"\n"
+        yield b"data: [DONE]\n"
+
+    def raise_for_status(self):
+        pass
+
+    def release(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        pass
+
+@pytest.fixture
+def asi1_stream(monkeypatch):
+    sent = []
+
+    def install(chunks):
+        class FakeSession:
+            async def post(self, url, **kwargs):
+                sent.append(kwargs)
+                return FakeResponse(chunks)
+
+        async def get():
+            return FakeSession()
+
+        monkeypatch.setattr(asi1_client.http_session_pool, "get", get)
+        return sent
+
+    return install
+
+def choice(**delta):
+    return {"choices": [{"index": 0, "delta": delta}]}
+
+USAGE = {"prompt_tokens": 900, "prompt_tokens_details": {"cached_tokens": 768}, "completion_tokens": 12}
+
+def test_null_deltas_and_the_usage_chunk_are_skipped(asi1_stream):
+    asi1_stream([
+        choice(role="assistant"),
+        {"choices": [{"index": 0, "delta": None}]},
+        choice(content="Hold "),
+        choice(content="ICP."),
+        {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        {"choices": [], "usage": USAGE},
+    ])
+    usage = []
+
+    async def collect():
+        return [token async for token in asi1_client.stream_chat_completion(
+            {"model": "asi1-mini", "messages": []}, on_usage=usage.append)]
+
+    assert run(collect()) == ["Hold ", "ICP."]
+    assert usage == [{"choices": [], "usage": USAGE}]
+
+def test_streamed_tool_calls_are_assembled_and_usage_is_reported(asi1_stream):
+    sent = asi1_stream([
+        choice(tool_calls=[{"index": 0, "id": "call_1", "function": {"name": "get_vault_info", "arguments": ""}}]),
+        choice(tool_calls=[{"index": 0, "function": {"arguments": "{}"}}]),
+        {"choices": [], "usage": USAGE},
+    ])
+    usage = []
+
+    async def on_token(token):
+        raise AssertionError("a tool call has no content tokens")
+
+    template = RequestTemplate("asi1-mini", "system", stream=True)
+    message = run(asi1_client.stream_chat_message(template.build(), on_token, on_usage=usage.append))
+    assert message["tool_calls"] == [
+        {"id": "call_1", "type": "function", "function": {"name": "get_vault_info", "arguments": "{}"}}]
+    assert usage[0]["usage"] == USAGE
+    assert json.loads(sent[0]["data"])["stream_options"] == {"include_usage": True}
+
+def test_a_stream_without_usage_still_reports_the_request(asi1_stream):
+    sent = asi1_stream([choice(content="hi")])
+    usage = []
+
+    async def collect():
+        return [token async for token in asi1_client.stream_chat_completion(
+            {"model": "asi1-mini", "messages": []}, on_usage=usage.append)]
+
+    assert run(collect()) == ["hi"]
+    assert usage == [{}]
+    assert sent[0]["json"]["stream_options"] == {"include_usage": True}
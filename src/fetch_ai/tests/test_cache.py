@@ -0,0 +1,186 @@
+import asyncio
+import pytest
+from cache import SWRCache, TTLCache
+from conftest import run
+
+def counting_fetch(calls, value="v", gate: asyncio.Event = None):
+    async def fetch():
+        calls.append(value)
+        if gate is not None:
+            await gate.wait()
+        return value
+    return fetch
+
+# ---------- TTL cache with single-flight ----------
+
+def test_concurrent_misses_share_one_fetch():
+    async def scenario():
+        cache = TTLCache(default_ttl=60)
+        calls = []
+        gate = asyncio.Event()
+        waiters = [asyncio.create_task(cache.get_or_fetch("k", counting_fetch(calls, gate=gate))) for _ in range(5)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*waiters)
+        return calls, results, cache.stats()
+
+    calls, results, stats = run(scenario())
+    assert calls == ["v"]
+    assert results == ["v"] * 5
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+
+def test_values_are_served_until_their_ttl_expires():
+    async def scenario():
+        cache = TTLCache(default_ttl=60, ttls={"short": 0.01})
+        calls = []
+        await cache.get_or_fetch("long", counting_fetch(calls, "long"))
+        await cache.get_or_fetch("long", counting_fetch(calls, "long"))
+        await cache.get_or_fetch(("short", "arg"), counting_fetch(calls, "short"))
+        await asyncio.sleep(0.02)
+        await cache.get_or_fetch(("short", "arg"), counting_fetch(calls, "short"))
+        return calls, cache.stats()
+
+    calls, stats = run(scenario())
+    assert calls == ["long", "short", "short"]
+    assert stats["hits"] == 1
+
+def test_a_failed_fetch_is_not_cached_and_reaches_every_waiter():
+    async def scenario():
+        cache = TTLCache(default_ttl=60)
+        gate = asyncio.Event()
+
+        async def broken():
+            await gate.wait()
+            raise ConnectionError("down")
+
+        waiters = [asyncio.create_task(cache.get_or_fetch("k", broken)) for _ in range(2)]
+        await asyncio.sleep(0)
+        gate.set()
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        return results, cache.get("k"), await cache.get_or_fetch("k", counting_fetch([]))
+
+    results, cached, retried = run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+    assert cached is None
+    assert retried == "v"
+
+def test_a_waiter_timing_out_does_not_cancel_the_shared_fetch():
+    async def scenario():
+        cache = TTLCache(default_ttl=60)
+        calls = []
+        gate = asyncio.Event()
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(cache.get_or_fetch("k", counting_fetch(calls, gate=gate)), timeout=0.01)
+        gate.set()
+        await asyncio.sleep(0.01)
+        return calls, cache.get("k")
+
+    calls, cached = run(scenario())
+    assert calls == ["v"]
+    assert cached == "v"
+
+def test_a_fetch_started_before_an_invalidation_is_never_stored():
+    async def scenario():
+        cache = TTLCache(default_ttl=60)
+        calls = []
+        gate = asyncio.Event()
+        before = asyncio.create_task(cache.get_or_fetch("k", counting_fetch(calls, "old", gate)))
+        await asyncio.sleep(0)
+        cache.invalidate("k")
+        after = asyncio.create_task(cache.get_or_fetch("k", counting_fetch(calls, "new", gate)))
+        await asyncio.sleep(0)
+        gate.set()
+        return await before, await after, cache.get("k"), calls
+
+    before, after, cached, calls = run(scenario())
+    assert before == "old"
+    assert after == "new"
+    assert cached == "new"
+    assert calls == ["old", "new"]
+
+def test_invalidating_everything_drops_all_entries():
+    async def scenario():
+        cache = TTLCache(default_ttl=60)
+        await cache.get_or_fetch("a", counting_fetch([]))
+        await cache.get_or_fetch("b", counting_fetch([]))
+        cache.invalidate()
+        return cache.get("a"), cache.get("b"), cache.stats()["entries"]
+
+    assert run(scenario()) == (None, None, 0)
+
+# ---------- Stale-while-revalidate ----------
+
+def test_a_stale_value_is_served_while_one_refresh_runs():
+    async def scenario():
+        cache = SWRCache(default_ttl=0.01, stale_ttl=60)
+        calls = []
+        await cache.get_or_fetch("k", counting_fetch(calls, "old"))
+        await asyncio.sleep(0.02)
+        gate = asyncio.Event()
+        stale = [await cache.get_or_fetch("k", counting_fetch(calls, "new", gate), ttl=60) for _ in range(3)]
+        gate.set()
+        await asyncio.sleep(0.01)
+        return stale, calls, cache.get("k"), cache.stats()
+
+    stale, calls, refreshed, stats = run(scenario())
+    assert stale == ["old"] * 3
+    assert calls == ["old", "new"]
+    assert refreshed == "new"
+    assert stats["stale_hits"] == 3
+
+def test_a_failed_refresh_keeps_the_stale_value():
+    async def scenario():
+        cache = SWRCache(default_ttl=0.01, stale_ttl=60)
+        await cache.get_or_fetch("k", counting_fetch([], "old"))
+        await asyncio.sleep(0.02)
+
+        async def broken():
+            raise ConnectionError("down")
+
+        first = await cache.get_or_fetch("k", broken)
+        await asyncio.sleep(0.01)
+        return first, await cache.get_or_fetch("k", broken)
+
+    assert run(scenario()) == ("old", "old")
+
+def test_a_value_past_its_stale_window_is_fetched_again():
+    async def scenario():
+        cache = SWRCache(default_ttl=0.01, stale_ttl=0.01)
+        calls = []
+        await cache.get_or_fetch("k", counting_fetch(calls, "old"))
+        await asyncio.sleep(0.03)
+        return await cache.get_or_fetch("k", counting_fetch(calls, "new")), calls
+
+    value, calls = run(scenario())
+    assert value == "new"
+    assert calls == ["old", "new"]
+
+def test_least_recently_used_entries_are_evicted():
+    async def scenario():
+        cache = SWRCache(default_ttl=60, max_entries=2)
+        for key in ("a", "b"):
+            await cache.get_or_fetch(key, counting_fetch([], key))
+        await cache.get_or_fetch("a", counting_fetch([]))  # a is now most recently used
+        await cache.get_or_fetch("c", counting_fetch([], "c"))
+        return cache.get("a"), cache.get("b"), cache.get("c"), cache.stats()["evictions"]
+
+    assert run(scenario()) == ("a", None, "c", 1)
+
+def test_invalidate_where_drops_one_principal_and_detaches_its_refresh():
+    async def scenario():
+        cache = SWRCache(default_ttl=60)
+        calls = []
+        await cache.get_or_fetch(("get_user_balance", "alice"), counting_fetch(calls, "alice"))
+        await cache.get_or_fetch(("get_user_balance", "bob"), counting_fetch(calls, "bob"))
+        gate = asyncio.Event()
+        inflight = asyncio.create_task(
+            cache.get_or_fetch(("get_user_vault_entries", "alice"), counting_fetch(calls, "old entries", gate)))
+        await asyncio.sleep(0)
+        cache.invalidate_where(lambda key: key[1] == "alice")
+        gate.set()
+        await inflight
+        return (cache.get(("get_user_balance", "alice")), cache.get(("get_user_balance", "bob")),
+                cache.get(("get_user_vault_entries", "alice")))
+
+    assert run(scenario()) == (None, "bob", None)
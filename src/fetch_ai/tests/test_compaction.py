@@ -0,0 +1,34 @@
+import json
+from compaction import compact_result
+from context_builder import count_tokens
+
+def entries(n):
+    return [{"id": i, "amount": i * 100, "product_id": 1, "duration_minutes": 60, "unlock_time": 0,
+             "can_unlock": i % 2 == 0, "is_flexible": False, "created_at": 123, "internal": "x" * 50}
+            for i in range(n)]
+
+def test_list_results_are_aggregated_and_cut_to_the_top_items():
+    result = {"user": "aaaaa-bbbbb", "entries": entries(30)}
+    compacted = json.loads(compact_result("get_user_vault_entries", result))
+
+    assert "user" not in compacted
+    assert compacted["entries_summary"] == {
+        "count": 30, "total_amount": sum(i * 100 for i in range(30)), "can_unlock_count": 15, "is_flexible_count": 0}
+    assert [entry["id"] for entry in compacted["entries"]] == list(range(29, 19, -1))
+    assert "internal" not in compacted["entries"][0]
+    assert compacted["entries_note"] == "showing top 10 of 30"
+
+def test_results_are_shrunk_to_fit_the_token_cap():
+    compacted = compact_result("get_user_vault_entries", {"entries": entries(200)}, max_tokens=150)
+    assert count_tokens(compacted) <= 150
+    assert json.loads(compacted)["entries_summary"]["count"] == 200
+
+def test_results_without_a_projection_have_their_lists_capped():
+    compacted = json.loads(compact_result("get_coins_markets", {"coins": list(range(50))}))
+    assert compacted == {"coins": list(range(10)), "coins_total_count": 50}
+
+def test_errors_and_prose_pass_through():
+    error = {"error": "Canister call failed", "status": "failed"}
+    prose = {"response": "Consider the ninety day lock. " * 500}
+    assert json.loads(compact_result("get_user_vault_entries", error)) == error
+    assert compact_result("get_analysis_and_recommendation", prose) == json.dumps(prose)
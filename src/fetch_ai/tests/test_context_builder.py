@@ -0,0 +1,73 @@
+from context_builder import build_history_context, count_tokens, fold_trimmed_message
+from session_store import SessionStore
+from conftest import message
+
+def fill(store, turns):
+    for i in range(turns):
+        store.add_message("s", message("user" if i % 2 == 0 else "assistant", f"turn {i} " + "word " * 40, i))
+
+def test_recent_turns_fit_the_budget_and_older_ones_are_summarized():
+    store = SessionStore()
+    fill(store, 20)
+    messages = build_history_context(store, "s", budget=200, summary_budget=1000, query_stored=False)
+
+    summary, recent = messages[0], messages[1:]
+    assert summary["role"] == "system"
+    assert "turn 0" in summary["content"]
+    assert sum(count_tokens(msg["content"]) for msg in recent) <= 200
+    assert recent[-1]["content"].startswith("turn 19")
+    # Every turn appears once, either summarized or verbatim
+    first_recent = int(recent[0]["content"].split()[1])
+    assert f"turn {first_recent - 1} " in summary["content"]
+    assert f"turn {first_recent} " not in summary["content"]
+
+def test_turns_are_folded_into_the_summary_only_once():
+    store = SessionStore()
+    fill(store, 10)
+    build_history_context(store, "s", budget=200, summary_budget=10000, query_stored=False)
+    summary, until = store.get_summary("s")
+
+    build_history_context(store, "s", budget=200, summary_budget=10000, query_stored=False)
+    assert store.get_summary("s") == (summary, until)
+
+    store.add_message("s", message("user", "turn 10 " + "word " * 40, 10))
+    build_history_context(store, "s", budget=200, summary_budget=10000, query_stored=False)
+    new_summary, new_until = store.get_summary("s")
+    assert new_summary.startswith(summary)
+    assert new_until > until
+
+def test_the_summary_keeps_to_its_budget():
+    store = SessionStore(max_messages=200)
+    fill(store, 150)
+    messages = build_history_context(store, "s", budget=100, summary_budget=150, query_stored=False)
+    summary = store.get_summary("s")[0]
+    assert sum(count_tokens(line) for line in summary.splitlines()) <= 150
+    assert "turn 0 " not in messages[0]["content"]
+
+def test_the_stored_query_is_left_for_the_caller():
+    store = SessionStore()
+    store.add_message("s", message("user", "earlier question", 0))
+    store.add_message("s", message("user", "current question", 1))
+    messages = build_history_context(store, "s")
+    assert messages == [{"role": "user", "content": "earlier question"}]
+
+def test_turns_trimmed_by_the_store_still_reach_the_summary():
+    store = SessionStore(max_messages=5)
+    store.on_trim = lambda session_id, msg: fold_trimmed_message(store, session_id, msg, summary_budget=10000)
+    fill(store, 12)
+    # Every trimmed turn fits the window, but none of them may be lost
+    messages = build_history_context(store, "s", budget=10000, summary_budget=10000, query_stored=False)
+
+    summary = messages[0]["content"]
+    assert all(f"turn {i} " in summary for i in range(7))
+    assert [int(msg["content"].split()[1]) for msg in messages[1:]] == list(range(7, 12))
+
+def test_a_trimmed_turn_already_in_the_summary_is_not_folded_twice():
+    store = SessionStore(max_messages=5)
+    store.on_trim = lambda session_id, msg: fold_trimmed_message(store, session_id, msg, summary_budget=10000)
+    fill(store, 5)
+    build_history_context(store, "s", budget=100, summary_budget=10000, query_stored=False)
+    summary, _ = store.get_summary("s")
+
+    store.add_message("s", message("user", "turn 5 " + "word " * 40, 5))
+    assert store.get_summary("s")[0].count("turn 0 ") == summary.count("turn 0 ") == 1
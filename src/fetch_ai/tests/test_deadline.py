@@ -0,0 +1,30 @@
+import asyncio
+import pytest
+from deadline import FINAL_ANSWER_RESERVE, Deadline, DeadlineExceeded
+
+def test_a_stage_gets_its_cap_while_the_budget_allows():
+    deadline = Deadline(60)
+    assert deadline.timeout(10) == 10
+    assert 59 < deadline.timeout() <= 60
+
+def test_a_stage_is_limited_to_what_is_left():
+    deadline = Deadline(5)
+    assert 4.9 < deadline.timeout(30) <= 5
+
+def test_the_final_answer_reserve_is_kept_back_from_tools():
+    deadline = Deadline(FINAL_ANSWER_RESERVE + 10)
+    tool_timeout = deadline.timeout(60, reserve=FINAL_ANSWER_RESERVE)
+    assert 9.9 < tool_timeout <= 10
+    # The final answer itself may use the reserve
+    assert deadline.timeout(60) > FINAL_ANSWER_RESERVE
+
+def test_a_spent_budget_raises():
+    deadline = Deadline(FINAL_ANSWER_RESERVE / 2)
+    with pytest.raises(DeadlineExceeded):
+        deadline.timeout(60, reserve=FINAL_ANSWER_RESERVE)
+
+    expired = Deadline(0)
+    assert expired.expired
+    assert expired.remaining() == 0
+    with pytest.raises(asyncio.TimeoutError):  # Handled wherever stage timeouts are
+        expired.timeout(10)
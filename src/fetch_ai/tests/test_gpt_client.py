@@ -0,0 +1,79 @@
+import os
+from types import SimpleNamespace
+import pytest
+
+# The shared client is created at import time and needs a key, though no request is sent
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+import gpt_client
+from conftest import run
+
+class FakeStream:
+    def __init__(self, events):
+        self.events = events
+        self.closed = False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.closed = True
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for event in self.events:
+            yield event
+
+def delta(text):
+    return SimpleNamespace(type="response.output_text.delta", delta=text)
+
+@pytest.fixture
+def responses(monkeypatch):
+    calls = []
+
+    def install(result):
+        async def create(**kwargs):
+            calls.append(kwargs)
+            return result
+        monkeypatch.setattr(gpt_client.openai_client.responses, "create", create)
+        return calls
+
+    return install
+
+def test_streamed_output_reaches_on_delta_and_is_returned_whole(responses):
+    stream = FakeStream([
+        SimpleNamespace(type="response.reasoning_summary_text.delta", delta="thinking"),
+        delta("Buy "), delta("more "), delta("ICP."),
+        SimpleNamespace(type="response.completed"),
+    ])
+    calls = responses(stream)
+    received = []
+
+    async def on_delta(text):
+        received.append(text)
+
+    text = run(gpt_client.gpt_response([{"role": "user", "content": "hi"}], effort="low", on_delta=on_delta))
+    assert text == "Buy more ICP."
+    assert received == ["Buy ", "more ", "ICP."]
+    assert calls[0]["stream"] is True
+    assert calls[0]["reasoning"] == {"effort": "low"}
+    assert stream.closed
+
+def test_a_failed_stream_raises(responses):
+    responses(FakeStream([delta("partial"), SimpleNamespace(type="response.failed")]))
+
+    async def on_delta(text):
+        pass
+
+    with pytest.raises(RuntimeError):
+        run(gpt_client.gpt_response([], on_delta=on_delta))
+
+def test_without_on_delta_the_text_is_collected_from_message_items(responses):
+    message = SimpleNamespace(type="message", content=[
+        SimpleNamespace(type="output_text", text="Hold "),
+        SimpleNamespace(type="output_text", text="steady."),
+    ])
+    calls = responses(SimpleNamespace(output_text=None, output=[SimpleNamespace(type="reasoning"), message]))
+    assert run(gpt_client.gpt_response([])) == "Hold steady."
+    assert "stream" not in calls[0]
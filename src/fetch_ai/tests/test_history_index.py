@@ -0,0 +1,56 @@
+from history_index import HISTORY_INDEX_MAX_MESSAGES, HistoryIndex, SessionVectorIndex
+from session_store import MAX_MEMORY_MESSAGES, SessionStore
+from conftest import message
+
+FILLER = [
+    "What is the current APY on the flexible staking product?",
+    "The flexible product pays 4.2% APY and can be unlocked at any time.",
+    "Show me the vault's total locked tokens.",
+    "The vault currently holds 1,250,000 USDX across all products.",
+]
+
+def test_an_old_relevant_turn_is_brought_back_from_a_long_session():
+    store = SessionStore(max_messages=HISTORY_INDEX_MAX_MESSAGES)
+    index = HistoryIndex()
+    old_turn = "Remember that I want my dividends reinvested into the ninety day gold lock product."
+    store.add_message("s", message("user", old_turn, 0))
+    for i in range(1, 600):
+        store.add_message("s", message("user" if i % 2 else "assistant", FILLER[i % len(FILLER)], i))
+    query = "Which product did I say my dividends should be reinvested into?"
+    store.add_message("s", message("user", query, 600))
+
+    # The turn is far older than the recent-turns window would ever reach
+    assert 600 > MAX_MEMORY_MESSAGES
+    retrieved = index.retrieve(store, "s", query, budget=500)
+    assert {"role": "user", "content": old_turn} in retrieved
+    assert retrieved[-1]["content"] != query
+
+def test_messages_added_after_seeding_are_searchable():
+    store = SessionStore(max_messages=HISTORY_INDEX_MAX_MESSAGES)
+    index = HistoryIndex()
+    store.add_message("s", message("user", FILLER[0], 0))
+    index.retrieve(store, "s", FILLER[0], budget=500)
+
+    late = "My risk tolerance is low, so avoid the leveraged instruments."
+    for i, content in enumerate([late, *FILLER * 10], start=1):
+        msg = message("user", content, i)
+        store.add_message("s", msg)
+        index.add_message("s", msg)
+    retrieved = index.retrieve(store, "s", "what did I say about my risk tolerance", budget=500, query_stored=False)
+    assert {"role": "user", "content": late} in retrieved
+
+def test_a_full_index_drops_its_oldest_messages():
+    index = SessionVectorIndex(max_messages=20)
+    for i in range(45):
+        index.add(message("user", f"turn {i}", i))
+    assert len(index.messages) <= 20
+    assert index.messages[-1]["content"] == "turn 44"
+    assert len(index.vectors) <= 20
+
+def test_sessions_are_evicted_least_recently_used_first():
+    store = SessionStore()
+    index = HistoryIndex(max_sessions=2)
+    for session_id in ("a", "b", "c"):
+        store.add_message(session_id, message("user", "hello", 0))
+        index.retrieve(store, session_id, "hello", budget=100)
+    assert index.stats()["sessions"] == 2
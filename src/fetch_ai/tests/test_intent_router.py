@@ -0,0 +1,42 @@
+import json
+import pytest
+import intent_router
+from intent_router import format_template, match_intent
+
+PRINCIPAL = "aaaaa-bbbbb-ccccc"
+
+@pytest.mark.parametrize("query, expected", [
+    ("What's my balance?", ("get_user_balance", {"user_principal": PRINCIPAL})),
+    ("show my unclaimed dividends", ("get_unclaimed_dividends", {"user_principal": PRINCIPAL})),
+    ("Show me the active products", ("get_active_products", {})),
+    ("What is the vault TVL", ("get_vault_info", {})),
+])
+def test_simple_queries_are_routed_to_one_tool(query, expected):
+    assert match_intent(query, PRINCIPAL) == expected
+
+@pytest.mark.parametrize("query", [
+    "What was my balance last week?",  # Historical: the tools only report the current state
+    "Should I lock more tokens?",  # Needs reasoning
+    "my balance and my dividends",  # Needs two tools
+    "Tell me everything about how the vault works, what my balance is and which products exist today",
+    "hello there",
+])
+def test_complex_or_unmatched_queries_take_the_full_flow(query):
+    assert match_intent(query, PRINCIPAL) is None
+
+def test_personal_intents_need_a_principal():
+    assert match_intent("What's my balance?") is None
+    assert match_intent("What is the vault TVL") == ("get_vault_info", {})
+
+def test_templates_render_results_and_flag_partial_lists(monkeypatch):
+    monkeypatch.setattr(intent_router, "FAST_PATH_FORMAT", "template")
+    assert format_template("get_user_balance", json.dumps({"balance": 12_500_000})) == \
+        "💰 Your current balance is **12.50 USDX**."
+    products = {"products": [{"name": "Gold", "description": "90 days"}], "products_summary": {"count": 3}}
+    assert "_Showing 1 of 3 products._" in format_template("get_active_products", json.dumps(products))
+
+def test_failed_calls_and_untemplated_tools_fall_back_to_the_llm(monkeypatch):
+    monkeypatch.setattr(intent_router, "FAST_PATH_FORMAT", "template")
+    assert format_template("get_user_balance", json.dumps({"error": "down"})) is None
+    assert format_template("get_user_balance", "not json") is None
+    assert format_template("get_investment_instruments", json.dumps({"instruments": []})) is None
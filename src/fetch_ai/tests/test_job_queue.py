@@ -0,0 +1,148 @@
+import asyncio
+import time
+import pytest
+from job_queue import JobQueue, current_job
+from conftest import run
+
+async def wait_finished(job, timeout=1.0):
+    deadline = time.monotonic() + timeout
+    while not job.finished:
+        assert time.monotonic() < deadline, "job did not finish in time"
+        await asyncio.sleep(0.005)
+
+def returning(value):
+    async def job():
+        return value
+    return job
+
+def test_jobs_run_in_the_background_and_keep_their_result():
+    async def scenario():
+        queue = JobQueue(workers=1)
+        job, deduplicated = queue.submit("k", returning("answer"))
+        assert job.status == "queued"
+        await wait_finished(job)
+        fetched = queue.get(job.job_id)
+        await queue.close()
+        return deduplicated, fetched
+
+    deduplicated, job = run(scenario())
+    assert not deduplicated
+    assert job.status == "done"
+    assert job.result == "answer"
+    assert job.started_at <= job.finished_at
+
+def test_a_failing_or_slow_job_is_marked_failed():
+    async def scenario():
+        queue = JobQueue(workers=2, timeout=0.02)
+
+        async def broken():
+            raise ValueError("bad input")
+
+        async def slow():
+            await asyncio.sleep(60)
+
+        failed, _ = queue.submit("a", broken)
+        timed_out, _ = queue.submit("b", slow)
+        await wait_finished(failed)
+        await wait_finished(timed_out)
+        await queue.close()
+        return failed, timed_out
+
+    failed, timed_out = run(scenario())
+    assert (failed.status, failed.error) == ("failed", "bad input")
+    assert timed_out.status == "failed"
+    assert "timed out" in timed_out.error
+
+def test_duplicate_submissions_share_a_running_or_recent_job():
+    async def scenario():
+        queue = JobQueue(workers=1, dedupe_window=60)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+            return "done"
+
+        first, _ = queue.submit("k", held)
+        second, deduplicated_running = queue.submit("k", held)
+        release.set()
+        await wait_finished(first)
+        third, deduplicated_finished = queue.submit("k", held)
+        await queue.close()
+        return first, second, third, deduplicated_running, deduplicated_finished, queue.stats()
+
+    first, second, third, running, finished, stats = run(scenario())
+    assert first is second is third
+    assert running and finished
+    assert stats["submitted"] == 1
+    assert stats["deduplicated"] == 2
+
+def test_a_full_queue_rejects_new_jobs():
+    async def scenario():
+        queue = JobQueue(workers=1, max_pending=1)
+        release = asyncio.Event()
+
+        async def held():
+            await release.wait()
+
+        running, _ = queue.submit("running", held)
+        await asyncio.sleep(0)  # Let the worker take the first job
+        queued, _ = queue.submit("queued", held)
+        with pytest.raises(asyncio.QueueFull):
+            queue.submit("rejected", held)
+        release.set()
+        await wait_finished(running)
+        await wait_finished(queued)
+        await queue.close()
+        return queue.stats()
+
+    assert run(scenario())["rejected"] == 1
+
+def test_finished_jobs_expire_even_behind_a_long_running_job():
+    async def scenario():
+        queue = JobQueue(workers=2, result_ttl=0.02, dedupe_window=0)
+        release = asyncio.Event()
+
+        async def stuck():
+            await release.wait()
+
+        long_running, _ = queue.submit("stuck", stuck)
+        quick, _ = queue.submit("quick", returning("fast"))
+        await wait_finished(quick)
+        assert queue.get(quick.job_id) is quick
+        await asyncio.sleep(0.05)
+        expired = queue.get(quick.job_id)
+        still_running = queue.get(long_running.job_id)
+        release.set()
+        await wait_finished(long_running)
+        await queue.close()
+        return expired, still_running, long_running, queue
+
+    expired, still_running, long_running, queue = run(scenario())
+    assert expired is None
+    assert still_running is long_running
+    assert "quick" not in queue._by_key
+
+def test_a_running_job_can_publish_partial_output():
+    async def scenario():
+        queue = JobQueue(workers=1)
+        release = asyncio.Event()
+
+        async def drafting():
+            current_job().partial += "Consider "
+            await release.wait()
+            current_job().partial += "the gold lock."
+            return "final"
+
+        job, _ = queue.submit("k", drafting)
+        await asyncio.sleep(0.01)
+        running = job.to_dict()
+        release.set()
+        await wait_finished(job)
+        await queue.close()
+        return running, job.to_dict(), current_job()
+
+    running, finished, outside = run(scenario())
+    assert running["status"] == "running"
+    assert running["partial"] == "Consider "
+    assert finished["partial"] is None
+    assert outside is None
@@ -0,0 +1,58 @@
+import time
+import pytest
+from market_snapshot import DEFAULT_SNAPSHOT_TOOLS, MarketSnapshot, mentioned_markets
+from conftest import run
+
+async def no_fetch(name, arguments):
+    raise AssertionError("not expected to fetch")
+
+@pytest.mark.parametrize("query, coins, currencies", [
+    ("How is BTC doing in euros?", {"bitcoin"}, {"eur"}),
+    ("price of ether and Internet Computer", {"ethereum", "internet-computer"}, set()),
+    ("Is bitcoin cash worth more than $5?", {"bitcoin-cash"}, {"usd"}),
+    ("convert 10eur to sol", {"solana"}, {"eur"}),
+    ("bitcoin vs bitcoin cash", {"bitcoin", "bitcoin-cash"}, set()),
+    ("Should I link my wallet or dot my i's?", set(), set()),
+    ("usdc-like tokens and bitcoin-ish assets", set(), set()),
+])
+def test_names_and_symbols_map_to_coingecko_ids(query, coins, currencies):
+    assert mentioned_markets(query) == (coins, currencies)
+
+@pytest.mark.parametrize("query, covered", [
+    ("What's the market doing today?", True),
+    ("Price of ICP and SOL in dollars", True),
+    ("How much is XRP?", False),  # Not in the snapshot's ids
+    ("BTC price in yen", False),  # Not in its vs_currencies
+    ("Show me the bitcoin chart for the last month", False),  # Ad-hoc topic
+    ("Top NFT collections", False),
+    ("ETH price over 30 days", False),
+])
+def test_only_queries_within_the_snapshot_are_covered(query, covered):
+    assert MarketSnapshot(no_fetch, DEFAULT_SNAPSHOT_TOOLS).covers(query) is covered
+
+def test_the_snapshot_is_fresh_only_when_every_tool_is():
+    async def scenario():
+        async def fetch(name, arguments):
+            if name == "get_global":
+                raise ConnectionError("down")
+            return {"tool": name}
+
+        snapshot = MarketSnapshot(fetch, DEFAULT_SNAPSHOT_TOOLS, max_age=60)
+        await snapshot.refresh()
+        partial = snapshot.get()
+
+        snapshot._entries["get_global"] = (time.time(), {"tool": "get_global"})
+        complete = snapshot.get()
+
+        fetched_at, result = snapshot._entries["get_search_trending"]
+        snapshot._entries["get_search_trending"] = (fetched_at - 120, result)
+        return partial, complete, snapshot.get(), snapshot.stats()
+
+    partial, complete, expired, stats = run(scenario())
+    assert partial is None
+    assert set(complete) == set(DEFAULT_SNAPSHOT_TOOLS)
+    arguments, fetched_at, result = complete["get_simple_price"]
+    assert arguments == DEFAULT_SNAPSHOT_TOOLS["get_simple_price"]
+    assert result == {"tool": "get_simple_price"}
+    assert expired is None
+    assert (stats["refreshes"], stats["failures"], stats["served"]) == (2, 1, 1)
@@ -0,0 +1,92 @@
+import asyncio
+import pytest
+from mcp_pool import MCPSessionPool
+from conftest import run
+
+class FakeConnection:
+    def __init__(self, number):
+        self.session = f"session-{number}"
+        self.alive = True
+        self.closed = False
+        self.last_verified = 0.0
+
+    async def verify(self):
+        return self.alive
+
+    async def close(self):
+        self.closed = True
+        self.alive = False
+
+def fake_pool(size=2):
+    pool = MCPSessionPool("http://mcp.test/sse", {}, size=size)
+    created = []
+
+    async def connect():
+        created.append(FakeConnection(len(created)))
+        return created[-1]
+
+    pool._connect = connect
+    return pool, created
+
+def test_a_returned_session_is_reused():
+    async def scenario():
+        pool, created = fake_pool()
+        async with pool.session() as first:
+            pass
+        async with pool.session() as second:
+            pass
+        return first, second, created, pool.status()
+
+    first, second, created, status = run(scenario())
+    assert first == second
+    assert len(created) == 1
+    assert status["reused"] == 1
+
+def test_checkouts_beyond_the_pool_size_wait_for_a_slot():
+    async def scenario():
+        pool, created = fake_pool(size=1)
+        held = await pool.checkout()
+        waiter = asyncio.create_task(pool.checkout())
+        await asyncio.sleep(0.01)
+        blocked = not waiter.done()
+        await pool.checkin(held)
+        second = await asyncio.wait_for(waiter, timeout=1)
+        return blocked, held, second
+
+    blocked, held, second = run(scenario())
+    assert blocked
+    assert second is held
+
+def test_a_session_that_failed_is_discarded_on_cancellation():
+    async def scenario():
+        pool, created = fake_pool()
+        with pytest.raises(asyncio.CancelledError):
+            async with pool.session():
+                raise asyncio.CancelledError()
+        return created, pool.status()
+
+    created, status = run(scenario())
+    assert created[0].closed
+    assert status["idle"] == 0
+    assert status["discarded"] == 1
+
+def test_closing_with_sessions_checked_out_keeps_the_pool_bounded():
+    async def scenario():
+        pool, created = fake_pool(size=2)
+        idle = await pool.checkout()
+        out = await pool.checkout()
+        await pool.checkin(idle)
+        await pool.close()
+        await pool.checkin(out)
+        # Every slot is free again, but no more than the pool size
+        conns = [await pool.checkout() for _ in range(2)]
+        extra = asyncio.create_task(pool.checkout())
+        await asyncio.sleep(0.01)
+        over_limit = extra.done()
+        extra.cancel()
+        return created, idle, out, conns, over_limit
+
+    created, idle, out, conns, over_limit = run(scenario())
+    assert idle.closed and out.closed
+    assert not over_limit
+    assert not any(conn in (idle, out) for conn in conns)
@@ -0,0 +1,42 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+import pytest
+
+# The shared OpenAI client is created at import time and needs a key, though no request is sent
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+import mcp_setup
+from resilience import CircuitBreaker
+from conftest import run
+
+class HangingSession:
+    async def list_tools(self):
+        await asyncio.sleep(3600)
+
+@pytest.fixture
+def hanging_pool(monkeypatch):
+    @asynccontextmanager
+    async def session():
+        yield HangingSession()
+
+    monkeypatch.setattr(mcp_setup.coingecko_pool, "session", session)
+    monkeypatch.setattr(mcp_setup, "coingecko_breaker", CircuitBreaker("CoinGecko"))
+    monkeypatch.setattr(mcp_setup, "MCP_TOOLS_REFRESH_TIMEOUT", 0.05)
+    monkeypatch.setattr(mcp_setup, "_save_tools_cache", lambda tools, fetched_at: None)
+    monkeypatch.setattr(mcp_setup, "_tools_refresh_task", None)
+
+def test_a_hanging_list_tools_times_out(hanging_pool):
+    with pytest.raises(asyncio.TimeoutError):
+        run(asyncio.wait_for(mcp_setup.refresh_coingecko_mcp_tools(), timeout=1))
+
+def test_a_hung_background_refresh_does_not_block_the_next_one(hanging_pool):
+    async def scenario():
+        mcp_setup.schedule_tools_refresh()
+        first = mcp_setup._tools_refresh_task
+        await asyncio.wait_for(first, timeout=1)
+        mcp_setup.schedule_tools_refresh()
+        return first, mcp_setup._tools_refresh_task
+
+    first, second = run(scenario())
+    assert first.done()
+    assert second is not first
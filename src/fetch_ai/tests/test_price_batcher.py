@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from price_batcher import PriceBatcher
+from conftest import run
+
+PRICES = {
+    "bitcoin": {"usd": 60000, "eur": 55000, "usd_market_cap": 1.2e12, "last_updated_at": 1},
+    "ethereum": {"usd": 3000, "eur": 2800, "usd_market_cap": 3.6e11, "last_updated_at": 1},
+}
+
+def recording_fetch(calls, result=PRICES, delay=0):
+    async def fetch(arguments, timeout):
+        calls.append((arguments, timeout))
+        await asyncio.sleep(delay)
+        return result
+    return fetch
+
+def test_concurrent_calls_share_one_upstream_call_and_get_their_own_slice():
+    async def scenario():
+        calls = []
+        batcher = PriceBatcher(recording_fetch(calls), window=0.01)
+        results = await asyncio.gather(
+            batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd"}),
+            batcher.get_simple_price({"ids": ["ethereum", "bitcoin"], "vs_currencies": ["eur"]}),
+        )
+        return calls, results, batcher.stats()
+
+    calls, (btc_usd, both_eur), stats = run(scenario())
+    assert len(calls) == 1
+    assert calls[0][0] == {"ids": "bitcoin,ethereum", "vs_currencies": "eur,usd"}
+    assert btc_usd == {"bitcoin": {"usd": 60000, "usd_market_cap": 1.2e12, "last_updated_at": 1}}
+    assert both_eur == {
+        "bitcoin": {"eur": 55000, "last_updated_at": 1},
+        "ethereum": {"eur": 2800, "last_updated_at": 1},
+    }
+    assert stats == {"requests": 2, "upstream_calls": 1, "pending_batches": 0}
+
+def test_calls_with_different_extra_arguments_are_batched_separately():
+    async def scenario():
+        calls = []
+        batcher = PriceBatcher(recording_fetch(calls), window=0.01)
+        await asyncio.gather(
+            batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd"}),
+            batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd", "include_market_cap": True}),
+        )
+        return calls
+
+    assert len(run(scenario())) == 2
+
+def test_a_full_batch_is_flushed_before_the_window_ends():
+    async def scenario():
+        calls = []
+        batcher = PriceBatcher(recording_fetch(calls), window=60, max_ids=2)
+        return await asyncio.wait_for(
+            batcher.get_simple_price({"ids": "bitcoin,ethereum", "vs_currencies": "usd"}), timeout=1)
+
+    assert set(run(scenario())) == {"bitcoin", "ethereum"}
+
+def test_an_upstream_error_reaches_every_waiter():
+    async def scenario():
+        async def fetch(arguments, timeout):
+            raise ConnectionError("down")
+
+        batcher = PriceBatcher(fetch, window=0.01)
+        return await asyncio.gather(
+            batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd"}),
+            batcher.get_simple_price({"ids": "ethereum", "vs_currencies": "usd"}),
+            return_exceptions=True)
+
+    results = run(scenario())
+    assert all(isinstance(result, ConnectionError) for result in results)
+
+def test_the_upstream_call_is_bounded_by_the_latest_waiter_deadline():
+    async def scenario():
+        calls = []
+        batcher = PriceBatcher(recording_fetch(calls, delay=60), window=0.01, max_timeout=30)
+        results = await asyncio.gather(
+            batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd"}, timeout=0.05),
+            batcher.get_simple_price({"ids": "ethereum", "vs_currencies": "usd"}, timeout=0.1),
+            return_exceptions=True)
+        return calls, results
+
+    calls, results = run(scenario())
+    assert 0.05 < calls[0][1] <= 0.1
+    assert all(isinstance(result, asyncio.TimeoutError) for result in results)
+
+def test_a_cancelled_flush_cancels_its_waiters():
+    async def scenario():
+        started = asyncio.Event()
+
+        async def fetch(arguments, timeout):
+            started.set()
+            await asyncio.sleep(60)
+
+        batcher = PriceBatcher(fetch, window=0.01)
+        waiter = asyncio.create_task(batcher.get_simple_price({"ids": "bitcoin", "vs_currencies": "usd"}))
+        await started.wait()
+        for task in list(batcher._flushes):
+            task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await asyncio.wait_for(waiter, timeout=1)
+
+    run(scenario())
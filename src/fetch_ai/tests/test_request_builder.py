@@ -0,0 +1,56 @@
+import json
+import pytest
+import request_builder
+from request_builder import RequestTemplate, encode_messages, get_prompt_cache_stats, record_usage
+
+TOOLS = [{"type": "function", "function": {"name": "get_vault_info", "description": "Vault état 📈",
+                                           "parameters": {"type": "object", "properties": {}}}}]
+MESSAGES = [
+    {"role": "system", "content": "The user's principal ID is: aaaaa-bbbbb."},
+    {"role": "user", "content": "Quel est mon solde ? \"quoted\" \n 💰"},
+    {"role": "assistant", "content": None, "tool_calls": [
+        {"id": "call_1", "type": "function", "function": {"name": "get_vault_info", "arguments": "{}"}}]},
+    {"role": "tool", "tool_call_id": "call_1", "content": "{\"tvl\": 1250000}"},
+]
+
+def plain_json(request: dict) -> bytes:
+    return json.dumps(request, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+@pytest.mark.parametrize("tools, stream", [(TOOLS, False), (None, False), (TOOLS, True)])
+def test_spliced_body_matches_plain_serialization(tools, stream):
+    template = RequestTemplate("asi1-mini", "You are a vault assistant.", tools, temperature=0.2,
+                               max_tokens=512, stream=stream)
+    body = template.build(encode_messages(MESSAGES[:2]), encode_messages(MESSAGES[2:]))
+
+    expected = {"model": "asi1-mini", "temperature": 0.2, "max_tokens": 512}
+    if stream:
+        expected.update({"stream": True, "stream_options": {"include_usage": True}})
+    if tools:
+        expected["tools"] = tools
+    expected["messages"] = [{"role": "system", "content": "You are a vault assistant."}, *MESSAGES]
+    assert body == plain_json(expected)
+    assert body.startswith(template.build()[:template.prefix_bytes])
+
+def test_the_prefix_is_identical_across_users():
+    template = RequestTemplate("asi1-mini", "You are a vault assistant.", TOOLS)
+    first = template.build(encode_messages([{"role": "user", "content": "balance?"}]))
+    second = template.build(encode_messages([{"role": "user", "content": "products?"}]))
+    assert first[:template.prefix_bytes] == second[:template.prefix_bytes]
+
+def test_usage_reports_feed_the_cache_hit_stats(monkeypatch):
+    monkeypatch.setattr(request_builder, "prompt_cache_stats", {
+        "requests": 0, "requests_with_usage": 0, "prompt_tokens": 0, "cached_tokens": 0, "cache_hits": 0})
+    record_usage({"usage": {"prompt_tokens": 1000, "prompt_tokens_details": {"cached_tokens": 768}}})
+    record_usage({"usage": {"prompt_tokens": 1000, "prompt_tokens_details": None}})
+    record_usage({"usage": None})
+    record_usage({})
+
+    assert get_prompt_cache_stats() == {
+        "requests": 4,
+        "requests_with_usage": 2,
+        "prompt_tokens": 2000,
+        "cached_tokens": 768,
+        "cache_hits": 1,
+        "hit_rate": 0.5,
+        "cached_token_rate": 0.384,
+    }
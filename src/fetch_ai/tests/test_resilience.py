@@ -0,0 +1,140 @@
+import asyncio
+import pytest
+from resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen
+from conftest import run
+
+class Transient(Exception):
+    status = 503
+
+class Throttled(Exception):
+    status = 429
+    retry_after = 60
+
+class BadRequest(Exception):
+    status = 400
+
+def failing(exc, calls):
+    async def fn(attempt_timeout):
+        calls.append(attempt_timeout)
+        raise exc
+    return fn
+
+async def succeed(attempt_timeout):
+    return "ok"
+
+def test_breaker_opens_after_consecutive_transient_failures_and_fails_fast():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=60, attempts=1)
+        calls = []
+        for _ in range(3):
+            with pytest.raises(Transient):
+                await breaker.call(failing(Transient(), calls))
+        with pytest.raises(CircuitOpen):
+            await breaker.call(failing(Transient(), calls))
+        return breaker, calls
+
+    breaker, calls = run(scenario())
+    assert breaker.state == OPEN
+    assert not breaker.available
+    assert len(calls) == 3
+    assert breaker.stats()["short_circuited"] == 1
+    assert breaker.stats()["opened"] == 1
+
+def test_half_open_lets_one_probe_through_and_closes_on_success():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02, attempts=1)
+        with pytest.raises(Transient):
+            await breaker.call(failing(Transient(), []))
+        assert breaker.state == OPEN
+        await asyncio.sleep(0.03)
+        assert breaker.available
+
+        probe_started = asyncio.Event()
+        finish_probe = asyncio.Event()
+
+        async def slow_probe(attempt_timeout):
+            probe_started.set()
+            await finish_probe.wait()
+            return "ok"
+
+        probe = asyncio.create_task(breaker.call(slow_probe))
+        await probe_started.wait()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpen):
+            await breaker.call(succeed)
+        finish_probe.set()
+        return await probe, breaker
+
+    result, breaker = run(scenario())
+    assert result == "ok"
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+def test_failed_probe_opens_the_breaker_again():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.02, attempts=3, base_delay=0)
+        calls = []
+        with pytest.raises(Transient):
+            await breaker.call(failing(Transient(), calls))
+        await asyncio.sleep(0.03)
+        with pytest.raises(Transient):
+            await breaker.call(failing(Transient(), calls))
+        return breaker, calls
+
+    breaker, calls = run(scenario())
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+    # An open breaker stops retrying: one call before opening, one probe
+    assert len(calls) == 2
+
+def test_non_transient_errors_are_not_retried_and_reset_the_count():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=2, attempts=3, base_delay=0)
+        calls = []
+        with pytest.raises(Transient):
+            await breaker.call(failing(Transient(), calls), retry=False)
+        assert breaker.failures == 1
+        with pytest.raises(BadRequest):
+            await breaker.call(failing(BadRequest(), calls))
+        return breaker, calls
+
+    breaker, calls = run(scenario())
+    assert len(calls) == 2
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+
+def test_transient_failures_are_retried_until_success():
+    async def scenario():
+        breaker = CircuitBreaker("test", failure_threshold=5, attempts=3, base_delay=0)
+        calls = []
+
+        async def flaky(attempt_timeout):
+            calls.append(attempt_timeout)
+            if len(calls) < 3:
+                raise Transient()
+            return "ok"
+
+        return await breaker.call(flaky), breaker, calls
+
+    result, breaker, calls = run(scenario())
+    assert result == "ok"
+    assert len(calls) == 3
+    assert breaker.state == CLOSED
+    assert breaker.stats()["retries"] == 2
+
+def test_retry_after_is_capped_at_the_max_delay():
+    breaker = CircuitBreaker("test", max_delay=2)
+    assert breaker._backoff(0, Throttled()) == 2
+    assert 0 <= breaker._backoff(5, Transient()) <= 2
+
+def test_retry_that_would_not_fit_the_timeout_is_skipped():
+    async def scenario():
+        breaker = CircuitBreaker("test", attempts=3, max_delay=5)
+        calls = []
+        with pytest.raises(Throttled):
+            await breaker.call(failing(Throttled(), calls), timeout=1)
+        return breaker, calls
+
+    breaker, calls = run(scenario())
+    assert len(calls) == 1
+    assert breaker.stats()["retries"] == 0
@@ -0,0 +1,76 @@
+import time
+from session_store import SessionStore
+from conftest import message
+
+def test_the_least_recently_used_session_is_evicted_first():
+    evicted = []
+    store = SessionStore(max_sessions=2, on_evict=evicted.append)
+    store.add_message("a", message("user", "hi", 0))
+    store.add_message("b", message("user", "hi", 0))
+    store.get_history("a")  # a is now more recent than b
+    store.add_message("c", message("user", "hi", 0))
+
+    assert evicted == ["b"]
+    assert store.get("b") is None
+    assert store.get_history("a")
+    assert store.stats()["evicted_lru"] == 1
+
+def test_idle_sessions_expire():
+    evicted = []
+    store = SessionStore(idle_ttl=0.02, on_evict=evicted.append)
+    store.set_principal("idle", "aaaaa-bbbbb")
+    time.sleep(0.05)
+    store.set_principal("active", "ccccc-ddddd")
+
+    assert evicted == ["idle"]
+    assert store.get_principal("idle") is None
+    assert store.stats()["evicted_idle"] == 1
+
+def test_a_retained_session_survives_eviction_until_released():
+    pending = {"a"}
+    evicted = []
+    store = SessionStore(max_sessions=1, on_evict=evicted.append, retain=lambda session_id: session_id in pending)
+    store.add_message("a", message("user", "unsaved", 0))
+    store.add_message("b", message("user", "hi", 0))
+    assert store.get_history("a")  # Kept over the limit while retained
+    assert evicted == ["b"]
+
+    pending.clear()
+    store.add_message("c", message("user", "hi", 0))
+    assert "a" in evicted
+
+def test_discarding_a_session_is_not_an_eviction():
+    evicted = []
+    store = SessionStore(on_evict=evicted.append)
+    store.add_message("a", message("user", "hi", 0))
+    store.discard("a")
+    assert store.get("a") is None
+    assert evicted == []
+
+def test_a_full_session_drops_its_oldest_message():
+    trimmed = []
+    store = SessionStore(max_messages=3, on_trim=lambda session_id, msg: trimmed.append((session_id, msg["content"])))
+    for i in range(5):
+        store.add_message("s", message("user", f"turn {i}", i))
+
+    assert [msg["content"] for msg in store.get_history("s")] == ["turn 2", "turn 3", "turn 4"]
+    assert [msg["content"] for msg in store.get_history("s", limit=2)] == ["turn 3", "turn 4"]
+    assert trimmed == [("s", "turn 0"), ("s", "turn 1")]
+
+def test_stats_track_sessions_messages_and_bytes():
+    store = SessionStore(max_sessions=5, max_messages=2)
+    store.add_message("a", message("user", "abcd", 0))
+    store.add_message("a", message("assistant", "ef", 1))
+    store.add_message("a", message("user", "ghijkl", 2))  # Drops "abcd"
+    store.add_message("b", message("user", "xyz", 0))
+    store.clear_history("b")
+
+    assert store.stats() == {
+        "backend": "memory",
+        "sessions": 2,
+        "max_sessions": 5,
+        "messages": 2,
+        "content_bytes": len("ef") + len("ghijkl"),
+        "evicted_lru": 0,
+        "evicted_idle": 0,
+    }
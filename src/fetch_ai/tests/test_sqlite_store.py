@@ -0,0 +1,121 @@
+import sqlite3
+import time
+import pytest
+import sqlite_store
+from sqlite_store import SQLiteSessionStore
+from conftest import message
+
+def flush(store, timeout=5.0):
+    """Wait until the background writer has persisted every queued write."""
+    deadline = time.monotonic() + timeout
+    while store._writes.qsize() or store._pending:
+        assert time.monotonic() < deadline, "writes were not persisted in time"
+        time.sleep(0.01)
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "memory.sqlite3")
+
+@pytest.fixture
+def stores():
+    opened = []
+
+    def open_store(path, **kwargs):
+        store = SQLiteSessionStore(path, **kwargs)
+        opened.append(store)
+        return store
+
+    yield open_store
+    for store in opened:
+        store.close()
+
+def test_history_and_principal_survive_a_restart(db_path, stores):
+    first = stores(db_path)
+    first.set_principal("s", "aaaaa-bbbbb")
+    first.add_message("s", message("user", "hello"))
+    first.add_message("s", message("assistant", "hi"))
+    first.set_summary("s", "greeted", "t1")
+    first.close()
+
+    second = stores(db_path)
+    assert [m["content"] for m in second.get_history("s")] == ["hello", "hi"]
+    assert second.get_principal("s") == "aaaaa-bbbbb"
+    assert second.get_summary("s") == ("greeted", "t1")
+
+def test_a_worker_reloads_a_session_another_worker_wrote(db_path, stores, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "MEMORY_REVALIDATE_INTERVAL", 0)
+    evicted = []
+    a = stores(db_path)
+    b = stores(db_path, on_evict=evicted.append)
+
+    a.add_message("s", message("user", "from a"))
+    flush(a)
+    assert [m["content"] for m in b.get_history("s")] == ["from a"]
+
+    a.add_message("s", message("assistant", "also from a"))
+    flush(a)
+    assert [m["content"] for m in b.get_history("s")] == ["from a", "also from a"]
+    assert b.reloads == 1
+    assert evicted == ["s"]
+
+def test_own_writes_do_not_trigger_a_reload(db_path, stores, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "MEMORY_REVALIDATE_INTERVAL", 0)
+    store = stores(db_path)
+    for i in range(3):
+        store.add_message("s", message("user", f"m{i}"))
+        flush(store)
+        store.get_history("s")
+    assert store.reloads == 0
+
+def test_revalidation_waits_for_the_interval(db_path, stores, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "MEMORY_REVALIDATE_INTERVAL", 60)
+    a = stores(db_path)
+    b = stores(db_path)
+    b.get_history("s")
+    a.add_message("s", message("user", "late"))
+    flush(a)
+    # Still within the interval, so b serves its hot tier without checking
+    assert b.get_history("s") == []
+    assert b.reloads == 0
+
+def test_queued_writes_are_served_before_they_are_persisted(db_path, stores, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "MEMORY_REVALIDATE_INTERVAL", 0)
+    store = stores(db_path)
+    # A write the background writer has not persisted yet
+    store.hot.add_message("s", message("user", "queued"))
+    with store._state_lock:
+        store._pending["s"] = 1
+    assert [m["content"] for m in store.get_history("s")] == ["queued"]
+    assert store.reloads == 0
+
+def test_a_locked_database_skips_revalidation_instead_of_blocking(db_path, stores, monkeypatch):
+    monkeypatch.setattr(sqlite_store, "MEMORY_REVALIDATE_INTERVAL", 0)
+    store = stores(db_path)
+    store.add_message("s", message("user", "cached"))
+    flush(store)
+
+    def locked(session_id):
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(store, "_db_version", locked)
+    assert [m["content"] for m in store.get_history("s")] == ["cached"]
+
+def test_persisted_history_is_trimmed_to_max_messages(db_path, stores):
+    store = stores(db_path, max_messages=3)
+    for i in range(5):
+        store.add_message("s", message("user", f"m{i}"))
+    flush(store)
+    rows = store._read_conn.execute(
+        "SELECT content FROM messages WHERE session_id = ? ORDER BY id", ("s",)).fetchall()
+    assert [row[0] for row in rows] == ["m2", "m3", "m4"]
+
+def test_clear_history_is_persisted(db_path, stores):
+    first = stores(db_path)
+    first.add_message("s", message("user", "forget me"))
+    first.set_summary("s", "summary", "t")
+    assert first.clear_history("s")
+    first.close()
+
+    second = stores(db_path)
+    assert second.get_history("s") == []
+    assert second.get_summary("s") == ("", "")
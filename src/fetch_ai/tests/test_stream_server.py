@@ -0,0 +1,62 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from aiohttp.test_utils import TestClient, TestServer
+from admission import AdmissionRejected
+from deadline import CHAT_DEADLINE
+from stream_server import create_stream_app
+from conftest import run
+
+async def post_stream(process, admit=None, body=None):
+    app = create_stream_app(process, logging.getLogger("test"), admit)
+    async with TestClient(TestServer(app)) as client:
+        response = await client.post("/api/chat/stream", json=body or {"message": "hi", "session_id": "s"})
+        return response.status, await response.text()
+
+def test_events_and_the_final_answer_are_streamed():
+    async def process(message, session_id, user_principal, on_event, deadline):
+        await on_event("progress", {"stage": "thinking"})
+        await on_event("token", {"token": "Hel"})
+        await on_event("token", {"token": "lo"})
+        return "Hello"
+
+    status, text = run(post_stream(process))
+    assert status == 200
+    assert text.index("event: progress") < text.index("event: token") < text.index("event: done")
+    assert '"response": "Hello"' in text
+
+def test_time_spent_waiting_for_admission_comes_out_of_the_deadline():
+    seen = {}
+
+    @asynccontextmanager
+    async def slow_admit(message, session_id, user_principal):
+        await asyncio.sleep(0.2)
+        yield
+
+    async def process(message, session_id, user_principal, on_event, deadline):
+        seen["remaining"] = deadline.remaining()
+        return "ok"
+
+    status, _ = run(post_stream(process, slow_admit))
+    assert status == 200
+    assert seen["remaining"] <= CHAT_DEADLINE - 0.2
+
+def test_a_shed_request_gets_a_429_before_the_stream_starts():
+    @asynccontextmanager
+    async def reject(message, session_id, user_principal):
+        raise AdmissionRejected("queue_full", retry_after=3)
+        yield
+
+    async def process(message, session_id, user_principal, on_event, deadline):
+        raise AssertionError("a shed request must not run")
+
+    status, text = run(post_stream(process, reject))
+    assert status == 429
+    assert "queue_full" in text
+
+def test_a_body_without_a_message_is_rejected():
+    async def process(message, session_id, user_principal, on_event, deadline):
+        return "unused"
+
+    status, _ = run(post_stream(process, body={"session_id": "s"}))
+    assert status == 400
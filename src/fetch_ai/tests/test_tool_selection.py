@@ -0,0 +1,51 @@
+import pytest
+import tool_selection
+from tool_selection import (
+    ADMIN_GROUPS, PUBLIC_GROUPS, TOOL_GROUPS, USER_GROUPS, classify_intent, select_tool_groups, tools_for_groups)
+
+def tool(name):
+    return {"type": "function", "function": {"name": name}}
+
+ALL_TOOLS = [tool(name) for group in TOOL_GROUPS.values() for name in group]
+
+def names(groups):
+    return [t["function"]["name"] for t in tools_for_groups(ALL_TOOLS, groups)]
+
+def test_every_user_can_check_their_admin_status_but_only_admins_get_admin_reports():
+    assert "check_admin_status" not in names(PUBLIC_GROUPS)
+    assert "check_admin_status" in names(USER_GROUPS)
+    assert "get_admin_investment_report" not in names(USER_GROUPS)
+    assert "get_admin_investment_report" in names(ADMIN_GROUPS)
+
+def test_each_tool_belongs_to_exactly_one_group():
+    all_names = [name for group in TOOL_GROUPS.values() for name in group]
+    assert len(all_names) == len(set(all_names))
+
+@pytest.mark.parametrize("has_principal, is_admin, expected", [
+    (False, False, PUBLIC_GROUPS),
+    (True, False, USER_GROUPS),
+    (True, True, ADMIN_GROUPS),
+])
+def test_groups_follow_session_state(monkeypatch, has_principal, is_admin, expected):
+    monkeypatch.setattr(tool_selection, "TOOL_INTENT_FILTER", False)
+    assert select_tool_groups(has_principal, is_admin, "show my balance") == expected
+
+@pytest.mark.parametrize("query, is_admin, expected", [
+    ("What is my balance?", False, ("portfolio",)),
+    ("Am I an admin?", False, ("account",)),
+    ("Show the admin overview of the platform", True, ("account", "admin")),
+    ("Which products have the best APY, and should I invest?", False, ("vault", "portfolio", "recommendation")),
+])
+def test_intent_narrows_the_allowed_groups(monkeypatch, query, is_admin, expected):
+    monkeypatch.setattr(tool_selection, "TOOL_INTENT_FILTER", True)
+    assert select_tool_groups(True, is_admin, query) == expected
+
+def test_intent_never_widens_past_what_the_session_may_use(monkeypatch):
+    monkeypatch.setattr(tool_selection, "TOOL_INTENT_FILTER", True)
+    assert "admin" in classify_intent("show the admin overview for all users")
+    assert select_tool_groups(True, False, "show the admin overview for all users") == ("account",)
+    assert select_tool_groups(False, False, "what is my balance") == PUBLIC_GROUPS
+
+def test_an_unclassified_query_gets_every_allowed_group(monkeypatch):
+    monkeypatch.setattr(tool_selection, "TOOL_INTENT_FILTER", True)
+    assert select_tool_groups(True, False, "hello there") == USER_GROUPS
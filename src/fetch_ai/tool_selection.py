@@ -0,0 +1,72 @@
+import os
+import re
+
+# Narrow the tool list further with the local intent classifier
+TOOL_INTENT_FILTER = os.getenv("TOOL_INTENT_FILTER", "false").lower() == "true"
+
+# Tool groups, in the order they appear in the tools list
+TOOL_GROUPS = {
+    "vault": ["get_vault_info", "get_active_products", "get_investment_instruments"],
+    "portfolio": ["get_user_balance", "get_user_vault_entries", "get_user_investment_report",
+                  "get_unclaimed_dividends"],
+    "recommendation": ["get_analysis_and_recommendation"],
+    "account": ["check_admin_status"],
+    "admin": ["get_admin_investment_report"],
+}
+
+# Groups usable without a principal, with one, and with a verified admin principal.
+# Any user may ask whether they are an admin, which is how admin tools get unlocked
+PUBLIC_GROUPS = ("vault",)
+USER_GROUPS = ("vault", "portfolio", "recommendation", "account")
+ADMIN_GROUPS = ("vault", "portfolio", "recommendation", "account", "admin")
+
+# Cheap keyword classifier mapping a query to the tool groups it may need
+INTENT_PATTERNS = {
+    "vault": re.compile(r"\b(vault|products?|instruments?|apy|yield|lock|options?|tvl)\b", re.I),
+    "portfolio": re.compile(
+        r"\b(my|balance|portfolio|entries|entry|holdings?|dividends?|rewards?|claim\w*|report|invest\w*)\b", re.I),
+    "recommendation": re.compile(
+        r"\b(recommend\w*|analy[sz]\w*|advice|advise|suggest\w*|market|trend\w*|should i|strateg\w*)\b", re.I),
+    "account": re.compile(r"\b(admin\w*|administrator|role|permissions?|privileges?)\b", re.I),
+    "admin": re.compile(r"\b(admin\w*|platform|all users|administrator)\b", re.I),
+}
+
+# Counters for how many tool definitions each request carried
+tool_selection_stats = {"requests": 0, "tools_sent": 0, "narrowed": 0}
+
+def classify_intent(query: str) -> set:
+    """Return the tool groups a query looks like it needs (empty if unclear)."""
+    return {group for group, pattern in INTENT_PATTERNS.items() if pattern.search(query)}
+
+def select_tool_groups(has_principal: bool, is_admin: bool, query: str = None) -> tuple:
+    """Pick the tool groups to offer for a request from session state.
+
+    User-scoped tools need a principal and admin tools need a cached positive
+    admin check. With TOOL_INTENT_FILTER the allowed groups are intersected
+    with the classified intent, falling back to all allowed groups when the
+    classifier finds nothing.
+    """
+    allowed = ADMIN_GROUPS if is_admin else USER_GROUPS if has_principal else PUBLIC_GROUPS
+    selected = allowed
+    if TOOL_INTENT_FILTER and query:
+        intents = classify_intent(query)
+        narrowed = tuple(group for group in allowed if group in intents)
+        if narrowed:
+            selected = narrowed
+            tool_selection_stats["narrowed"] += 1
+
+    tool_selection_stats["requests"] += 1
+    tool_selection_stats["tools_sent"] += sum(len(TOOL_GROUPS[group]) for group in selected)
+    return selected
+
+def tools_for_groups(tools: list, groups: tuple) -> list:
+    """Filter the full tools list down to the given groups, keeping its order."""
+    names = {name for group in groups for name in TOOL_GROUPS[group]}
+    return [tool for tool in tools if tool["function"]["name"] in names]
+
+def get_tool_selection_stats() -> dict:
+    requests = tool_selection_stats["requests"]
+    return {
+        **tool_selection_stats,
+        "avg_tools_per_request": round(tool_selection_stats["tools_sent"] / requests, 2) if requests else 0.0,
+    }
@@ -3,6 +3,7 @@ import { useAuth } from '../contexts/AuthContext';
 import { Principal } from '@dfinity/principal';
 import toast from 'react-hot-toast';
 import { formatDuration } from '../utils/utils';
+import aiChatService from '../services/aiChatService';
 
 const AdminPanel = ({ onRefresh }) => {
   const { actor } = useAuth();
@@ -114,6 +115,7 @@ const AdminPanel = ({ onRefresh }) => {
         const distributionId = Number(result.ok);
         toast.success(`Successfully distributed dividend! Distribution ID: ${distributionId}`);
         setDividendAmount('');
+        aiChatService.invalidateVault();
         onRefresh();
       } else {
         toast.error(result.err);
@@ -142,6 +144,7 @@ const AdminPanel = ({ onRefresh }) => {
       if ('ok' in result) {
         toast.success(`Successfully set default lock period to ${lockPeriod} minutes!`);
         setLockPeriod('');
+        aiChatService.invalidateVault();
         onRefresh();
       } else {
         toast.error(result.err);
@@ -223,6 +226,7 @@ const AdminPanel = ({ onRefresh }) => {
         setProductDescription('');
         setSelectedDurations([]);
         setCustomDuration('');
+        aiChatService.invalidateVault();
         loadProducts();
         onRefresh();
       } else {
@@ -249,6 +253,7 @@ const AdminPanel = ({ onRefresh }) => {
       
       if ('ok' in result) {
         toast.success(`Product ${!currentStatus ? 'activated' : 'deactivated'} successfully!`);
+        aiChatService.invalidateVault();
         loadProducts();
         onRefresh();
       } else {
@@ -271,6 +276,7 @@ const AdminPanel = ({ onRefresh }) => {
       
       if ('ok' in result) {
         toast.success('Product deleted successfully!');
+        aiChatService.invalidateVault();
         loadProducts();
         onRefresh();
       } else {
@@ -9,6 +9,19 @@ import toast from 'react-hot-toast';
 import aiChatService from '../services/aiChatService';
 import { useAuth } from '../contexts/AuthContext';
 
+const progressLabel = (event) => {
+  switch (event.stage) {
+    case 'tool_start':
+      return `Fetching ${event.tool.replace(/_/g, ' ')}…`;
+    case 'tool_done':
+      return 'Processing results…';
+    case 'answering':
+      return 'Writing answer…';
+    default:
+      return 'Thinking…';
+  }
+};
+
 const AiChatInterface = ({ isOpen, onClose }) => {
   const { principal, isAuthenticated } = useAuth();
   const [messages, setMessages] = useState([
@@ -58,16 +71,41 @@ const AiChatInterface = ({ isOpen, onClose }) => {
     try {
       // Call the AI chat service with user principal if authenticated
       const userPrincipal = isAuthenticated && principal ? principal.toString() : null;
-      const response = await aiChatService.sendMessage(currentMessage, userPrincipal);
-      
-      const aiMessage = {
-        id: Date.now() + 1,
+      const aiMessageId = Date.now() + 1;
+      const updateAiMessage = (update) => {
+        setMessages(prev => prev.map(msg => msg.id === aiMessageId ? { ...msg, ...update(msg) } : msg));
+      };
+      setMessages(prev => [...prev, {
+        id: aiMessageId,
         type: 'ai',
-        content: response || 'I received your message, but I\'m having trouble processing it right now. Please try again.',
+        content: '',
+        status: 'Thinking…',
         timestamp: new Date()
-      };
+      }]);
+
+      // Analyses and recommendations run as background jobs; everything else streams
+      const response = aiChatService.isLongRunning(currentMessage, userPrincipal)
+        ? await aiChatService.runJob(currentMessage, userPrincipal, {
+          onStatus: (status, partial) => updateAiMessage(() => ({
+            content: partial || '',
+            status: status === 'running' ? 'Analyzing the market and your portfolio…' : 'Waiting in the queue…'
+          }))
+        })
+        : await aiChatService.streamMessage(currentMessage, userPrincipal, {
+          onProgress: (event) => updateAiMessage(() => ({ status: progressLabel(event) })),
+          // A recommendation draft is shown until the final answer starts replacing it
+          onDraft: (token) => updateAiMessage(msg => ({ content: msg.content + token, drafting: true })),
+          onToken: (token) => updateAiMessage(msg => ({
+            content: (msg.drafting ? '' : msg.content) + token,
+            drafting: false,
+            status: null
+          }))
+        });
 
-      setMessages(prev => [...prev, aiMessage]);
+      updateAiMessage(() => ({
+        content: response || 'I received your message, but I\'m having trouble processing it right now. Please try again.',
+        status: null
+      }));
     } catch (error) {
       console.error('Error sending message:', error);
       
@@ -78,7 +116,7 @@ const AiChatInterface = ({ isOpen, onClose }) => {
         timestamp: new Date()
       };
 
-      setMessages(prev => [...prev, errorMessage]);
+      setMessages(prev => [...prev.filter(msg => !msg.status), errorMessage]);
       toast.error('Failed to send message to AI assistant');
     } finally {
       setIsLoading(false);
@@ -193,7 +231,9 @@ const AiChatInterface = ({ isOpen, onClose }) => {
                     : 'bg-gray-800 text-gray-100 border border-gray-700'
                 }`}
               >
-                <p className="text-sm whitespace-pre-wrap">{message.content}</p>
+                <p className="text-sm whitespace-pre-wrap">
+                  {message.content || (message.status && <span className="text-gray-400 italic">{message.status}</span>)}
+                </p>
                 <p className={`text-xs mt-1 ${
                   message.type === 'user' ? 'text-blue-200' : 'text-gray-500'
                 }`}>
@@ -203,7 +243,7 @@ const AiChatInterface = ({ isOpen, onClose }) => {
             </div>
           ))}
           
-          {isLoading && (
+          {isLoading && !messages.some(msg => msg.status) && (
             <div className="flex justify-start">
               <div className="bg-gray-800 border border-gray-700 p-3 rounded-lg">
                 <div className="flex items-center space-x-2">
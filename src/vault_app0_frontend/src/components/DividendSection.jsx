@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useAuth } from '../contexts/AuthContext';
 import toast from 'react-hot-toast';
+import aiChatService from '../services/aiChatService';
 
 const DividendSection = ({ onRefresh }) => {
   const { actor, principal } = useAuth();
@@ -42,6 +43,7 @@ const DividendSection = ({ onRefresh }) => {
       if ('ok' in result) {
         const claimedAmount = Number(result.ok) / 1000000;
         toast.success(`Successfully claimed ${claimedAmount.toFixed(6)} USDX dividend!`);
+        aiChatService.invalidatePortfolio(principal?.toString());
         loadDividendData();
         onRefresh();
       } else {
@@ -3,9 +3,10 @@ import { useAuth } from '../contexts/AuthContext';
 import toast from 'react-hot-toast';
 import ProductSelector from './ProductSelector';
 import { formatDuration } from '../utils/utils';
+import aiChatService from '../services/aiChatService';
 
 const VaultSection = ({ userVaultEntries, onRefresh }) => {
-  const { actor } = useAuth();
+  const { actor, principal } = useAuth();
   const [lockAmount, setLockAmount] = useState('');
   const [selectedProduct, setSelectedProduct] = useState(null);
   const [selectedDuration, setSelectedDuration] = useState(null);
@@ -43,6 +44,7 @@ const VaultSection = ({ userVaultEntries, onRefresh }) => {
         setLockAmount('');
         setSelectedProduct(null);
         setSelectedDuration(null);
+        aiChatService.invalidatePortfolio(principal?.toString());
         onRefresh();
       } else {
         toast.error(result.err);
@@ -63,6 +65,7 @@ const VaultSection = ({ userVaultEntries, onRefresh }) => {
       if ('ok' in result) {
         const unlockedAmount = Number(result.ok) / 1000000;
         toast.success(`Successfully unlocked ${unlockedAmount.toFixed(2)} USDX from entry ${entryId}!`);
+        aiChatService.invalidatePortfolio(principal?.toString());
         onRefresh();
       } else {
         toast.error(result.err);
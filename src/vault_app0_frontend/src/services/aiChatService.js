@@ -1,4 +1,9 @@
 // AI Chat Service - handles communication with Fetch.AI agent
+
+// Requests that trigger a market analysis and recommendation, which can take minutes;
+// mirrors INTENT_PATTERNS["recommendation"] in the agent's tool_selection.py
+const LONG_RUNNING_PATTERN = /\b(recommend\w*|analy[sz]\w*|advice|advise|suggest\w*|market|trend\w*|should i|strateg\w*)\b/i;
+
 class AiChatService {
   constructor() {
     // Since the Fetch.AI agent uses uagents protocol, we'll simulate the communication
@@ -10,6 +15,28 @@ class AiChatService {
       : (import.meta && import.meta.env && import.meta.env.VITE_AGENT_URL)
         ? import.meta.env.VITE_AGENT_URL
         : 'http://localhost:8001';
+    this.STREAM_URL = (import.meta && import.meta.env && import.meta.env.VITE_AGENT_STREAM_URL)
+      ? import.meta.env.VITE_AGENT_STREAM_URL
+      : this.deriveStreamUrl(this.AGENT_URL);
+  }
+
+  /**
+   * Derive the streaming endpoint's base URL from the agent URL
+   * @param {string} agentUrl - Base URL of the agent's REST endpoints
+   * @returns {string} - Base URL of the streaming chat server
+   */
+  deriveStreamUrl(agentUrl) {
+    try {
+      const url = new URL(agentUrl);
+      // Locally the streaming server listens next to the REST port (8001 -> 8002);
+      // deployments serve /api/chat/stream from the agent's origin via the reverse proxy
+      if (url.port === '8001') {
+        url.port = '8002';
+      }
+      return url.origin;
+    } catch {
+      return agentUrl;
+    }
   }
 
   /**
@@ -73,6 +100,163 @@ class AiChatService {
     }
   }
 
+  /**
+   * Send a message and receive the answer incrementally over Server-Sent Events
+   * @param {string} message - The user's message
+   * @param {string|null} userPrincipal - The user's principal (optional)
+   * @param {Object} handlers - Optional onProgress(event), onDraft(token) and onToken(token) callbacks;
+   *   onDraft receives a recommendation's text as it is written, before the final answer's tokens
+   * @returns {Promise<string>} - The AI's full response
+   */
+  async streamMessage(message, userPrincipal = null, { onProgress, onDraft, onToken } = {}) {
+    if (this.mockMode) {
+      const response = await this.makeMockRequest(message);
+      onToken?.(response);
+      return response;
+    }
+
+    let response;
+    try {
+      response = await fetch(`${this.STREAM_URL}/api/chat/stream`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          message: message,
+          session_id: this.sessionId,
+          user_principal: userPrincipal
+        })
+      });
+      if (response.status === 429) {
+        // Shed by admission control; falling back to /api/chat would only add load
+        const busy = await response.json();
+        onToken?.(busy.error);
+        return busy.error;
+      }
+      if (!response.ok || !response.body) {
+        throw new Error(`Streaming endpoint error: ${response.status}`);
+      }
+    } catch (error) {
+      console.warn('Streaming endpoint not available, falling back to /api/chat:', error);
+      const fullResponse = await this.sendMessage(message, userPrincipal);
+      onToken?.(fullResponse);
+      return fullResponse;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let streamed = '';
+    let finalResponse = null;
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      // SSE events are separated by a blank line
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+        const rawEvent = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let eventName = 'message';
+        let data = '';
+        for (const line of rawEvent.split('\n')) {
+          if (line.startsWith('event:')) eventName = line.slice(6).trim();
+          else if (line.startsWith('data:')) data += line.slice(5).trim();
+        }
+        if (!data) continue;
+        const payload = JSON.parse(data);
+
+        if (eventName === 'progress') {
+          onProgress?.(payload);
+        } else if (eventName === 'draft') {
+          onDraft?.(payload.token);
+        } else if (eventName === 'token') {
+          streamed += payload.token;
+          onToken?.(payload.token);
+        } else if (eventName === 'done') {
+          finalResponse = payload.response;
+        } else if (eventName === 'error') {
+          throw new Error(payload.error);
+        }
+      }
+    }
+
+    // Replies that were not streamed token by token (commands, errors) arrive only with "done"
+    if (finalResponse && !streamed) {
+      onToken?.(finalResponse);
+    }
+    return finalResponse ?? streamed;
+  }
+
+  /**
+   * Whether a message should run as a background job instead of holding a chat request open
+   * @param {string} message - The user's message
+   * @param {string|null} userPrincipal - The user's principal (optional)
+   * @returns {boolean} - True for analysis and recommendation requests
+   */
+  isLongRunning(message, userPrincipal = null) {
+    // Recommendations need the user's portfolio, so they are only offered with a principal
+    return Boolean(userPrincipal) && !message.trim().startsWith('/') && LONG_RUNNING_PATTERN.test(message);
+  }
+
+  /**
+   * Run a long request (e.g. an analysis and recommendation) as a background job and poll for its result
+   * @param {string} message - The user's message
+   * @param {string|null} userPrincipal - The user's principal (optional)
+   * @param {Object} options - onStatus(status, partial) is called with "queued" or "running" while polling,
+   *   and with the recommendation text written so far once the job is running
+   * @param {number} pollIntervalMs - Delay between status polls
+   * @returns {Promise<string>} - The AI's response
+   */
+  async runJob(message, userPrincipal = null, { onStatus } = {}, pollIntervalMs = 3000) {
+    if (this.mockMode) {
+      return await this.makeMockRequest(message);
+    }
+
+    const postJson = async (path, body) => {
+      const response = await fetch(`${this.AGENT_URL}${path}`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(body)
+      });
+      if (!response.ok) {
+        throw new Error(`Job API error: ${response.status}`);
+      }
+      return await response.json();
+    };
+
+    const submitted = await postJson('/api/jobs', {
+      message: message,
+      session_id: this.sessionId,
+      user_principal: userPrincipal
+    });
+    if (!submitted.success) {
+      return submitted.message;
+    }
+    onStatus?.(submitted.status);
+
+    while (true) {
+      await new Promise(resolve => setTimeout(resolve, pollIntervalMs));
+      const { status, partial } = await postJson('/api/jobs/status', { job_id: submitted.job_id });
+      if (status === 'done' || status === 'failed' || status === 'not_found') {
+        break;
+      }
+      onStatus?.(status, partial);
+    }
+
+    const result = await postJson('/api/jobs/result', { job_id: submitted.job_id });
+    if (result.status !== 'done') {
+      throw new Error(result.error || `Job ${result.status}`);
+    }
+    return result.response;
+  }
+
   /**
    * Clear conversation memory
    * @returns {Promise<boolean>} - Success status
@@ -111,6 +295,72 @@ class AiChatService {
     }
   }
 
+  /**
+   * Drop the agent's cached portfolio data after the user's vault changes.
+   * The agent only accepts this from the chat session bound to the principal.
+   * @param {string|null} userPrincipal - The user's principal
+   * @returns {Promise<boolean>} - Success status
+   */
+  async invalidatePortfolio(userPrincipal) {
+    if (this.mockMode || !userPrincipal) {
+      return true;
+    }
+    try {
+      const response = await fetch(`${this.AGENT_URL}/api/invalidate-portfolio`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          session_id: this.sessionId,
+          user_principal: userPrincipal
+        })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Invalidate portfolio error: ${response.status}`);
+      }
+
+      const data = await response.json();
+      return data.success;
+    } catch (error) {
+      console.warn('Could not invalidate agent portfolio cache:', error);
+      return false;
+    }
+  }
+
+  /**
+   * Drop the agent's cached vault-wide data after an admin change.
+   * The agent only accepts this from a chat session bound to an admin principal.
+   * @returns {Promise<boolean>} - Success status
+   */
+  async invalidateVault() {
+    if (this.mockMode) {
+      return true;
+    }
+    try {
+      const response = await fetch(`${this.AGENT_URL}/api/invalidate-vault`, {
+        method: 'POST',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+          session_id: this.sessionId
+        })
+      });
+
+      if (!response.ok) {
+        throw new Error(`Invalidate vault error: ${response.status}`);
+      }
+
+      const data = await response.json();
+      return data.success;
+    } catch (error) {
+      console.warn('Could not invalidate agent vault cache:', error);
+      return false;
+    }
+  }
+
   async makeMockRequest(message) {
     // Simulate processing time
     await new Promise(resolve => setTimeout(resolve, 1000 + Math.random() * 2000));